@@ -0,0 +1,133 @@
+"""
+Admission control for LLM-backed requests.
+
+Before a request is allowed to call the LLM, the controller looks at how
+much LLM work is already outstanding: admitted requests still in flight
+(including those waiting in the rate limiter) and the rate limiter's queue
+depth. Past
+either threshold the request is shed. It gets a recently cached answer or
+the local (non-LLM) result immediately instead of joining a backlog it
+would likely time out in. When neither exists the caller answers
+503 with Retry-After.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+# How a shed request was answered
+SHED_CACHED = 'cached'
+SHED_LOCAL = 'local'
+SHED_REJECTED = 'rejected'
+
+
+class Overloaded(Exception):
+    """Request shed with no fallback answer; respond 503 with ``retry_after`` seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Admit or shed LLM work based on in-flight calls and the limiter queue"""
+
+    def __init__(self, queue_depth: Callable[[], int], max_in_flight: int = 12, max_queued: int = 8,
+                 retry_after: int = 5):
+        self.queue_depth = queue_depth
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.retry_after = retry_after
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._counters = {'admitted': 0, SHED_CACHED: 0, SHED_LOCAL: 0, SHED_REJECTED: 0}
+
+    @classmethod
+    def from_env(cls, queue_depth: Callable[[], int]) -> 'AdmissionController':
+        """Controller configured from CSSA_ADMIT_MAX_IN_FLIGHT / _MAX_QUEUED / _RETRY_AFTER"""
+        return cls(
+            queue_depth,
+            max_in_flight=int(os.getenv('CSSA_ADMIT_MAX_IN_FLIGHT', 12)),
+            max_queued=int(os.getenv('CSSA_ADMIT_MAX_QUEUED', 8)),
+            retry_after=int(os.getenv('CSSA_ADMIT_RETRY_AFTER', 5)),
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def admit(self) -> bool:
+        """
+        True if one more LLM-backed request may go ahead. An admitted request
+        holds an in-flight slot from this check on; the caller must
+        ``release()`` it (in a ``finally``) when the request is done.
+        """
+        queued = self.queue_depth()
+        with self._lock:
+            # Check and reserve together, so a burst cannot all pass before any counts
+            if self._in_flight >= self.max_in_flight or queued >= self.max_queued:
+                return False
+            self._in_flight += 1
+            self._counters['admitted'] += 1
+        return True
+
+    def release(self):
+        """Free the in-flight slot of a request ``admit()`` let through"""
+        with self._lock:
+            self._in_flight -= 1
+
+    def record_shed(self, outcome: str):
+        """Count a shed request by how it was answered (SHED_CACHED / SHED_LOCAL / SHED_REJECTED)"""
+        with self._lock:
+            self._counters[outcome] += 1
+
+    def stats(self) -> Dict:
+        """Thresholds, current load and shed counters, for /api/status and metrics"""
+        with self._lock:
+            counters = dict(self._counters)
+        return dict(
+            in_flight=self._in_flight,
+            queued=self.queue_depth(),
+            max_in_flight=self.max_in_flight,
+            max_queued=self.max_queued,
+            **counters
+        )
+
+
+class ResultCache:
+    """Small thread-safe LRU of recent results, each valid for ``ttl`` seconds"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'ResultCache':
+        """Cache sized from CSSA_RESULT_CACHE_SIZE / CSSA_RESULT_CACHE_TTL"""
+        return cls(int(os.getenv('CSSA_RESULT_CACHE_SIZE', 1024)), float(os.getenv('CSSA_RESULT_CACHE_TTL', 300)))
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""
+Throughput benchmark for the offline cross-sell scoring stage.
+
+Scores a synthetic catalog with 1..N worker processes and prints pairs per
+second as JSON, one line per run:
+    python benchmarks/bench_cross_sell_scoring.py --products 20000 --workers 1 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cross_sell_scoring import CatalogArrays, score_catalog
+from synthetic import make_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--chunk-size', type=int, default=256)
+    parser.add_argument('--top-k', type=int, default=15)
+    args = parser.parse_args()
+
+    arrays = CatalogArrays(make_catalog(args.products))
+    for workers in args.workers:
+        start = time.perf_counter()
+        _, pairs = score_catalog(arrays, args.top_k, workers, args.chunk_size)
+        elapsed = time.perf_counter() - start
+        print(json.dumps({
+            "benchmark": "cross_sell_scoring",
+            "products": args.products,
+            "workers": workers,
+            "pairs": pairs,
+            "seconds": round(elapsed, 3),
+            "pairs_per_second": round(pairs / elapsed) if elapsed else None,
+        }))
+
+
+if __name__ == '__main__':
+    main()
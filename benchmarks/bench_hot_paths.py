@@ -0,0 +1,101 @@
+"""
+Microbenchmarks for the pure-Python hot paths (pytest-benchmark).
+
+Covers the model-output cleanup chain over a corpus of malformed outputs,
+basic_search_products, generate_cross_sell_mappings, and the Gemini
+engine's _build_gemini_prompt / _parse_gemini_response, on synthetic
+catalogs of 1k, 100k and 1M products:
+    pytest benchmarks/bench_hot_paths.py --benchmark-json bench.json
+    pytest benchmarks/bench_hot_paths.py --benchmark-compare   # against the last saved run
+
+CSSA_BENCH_SIZES picks the catalog sizes (default 1000,100000,1000000).
+"""
+
+import json
+import logging
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Keep log I/O out of the measurements (set before cssa_agent configures logging)
+os.environ.setdefault('CSSA_LOG_FILE', '')
+os.environ.setdefault('CSSA_LOG_LEVEL', 'ERROR')
+
+import cssa_agent
+from data_loader import generate_cross_sell_mappings
+from gemini_ai import GeminiRecommendationEngine
+from malformed_outputs import corpus
+from model_output import parse_model_json
+from synthetic import make_catalog
+
+SIZES = [int(size) for size in os.getenv('CSSA_BENCH_SIZES', '1000,100000,1000000').split(',')]
+# generate_cross_sell_mappings compares every pair of products
+MAX_MAPPING_SIZE = 1000
+
+
+@pytest.fixture(scope='module', params=SIZES, ids=lambda size: f"{size}_products")
+def catalog(request):
+    return make_catalog(request.param)
+
+
+@pytest.fixture(scope='module')
+def engine(catalog):
+    engine = GeminiRecommendationEngine()
+    engine.build_indexes(catalog, catalog_version=1)
+    return engine
+
+
+@pytest.fixture(autouse=True)
+def quiet_logging():
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+@pytest.mark.parametrize('defect, text', corpus('object'), ids=[defect for defect, _ in corpus('object')])
+def test_parse_recommend_output(benchmark, defect, text):
+    data, _ = benchmark(parse_model_json, text, '{')
+    assert data['recommendations']
+
+
+@pytest.mark.parametrize('defect, text', corpus('array'), ids=[defect for defect, _ in corpus('array')])
+def test_parse_search_output(benchmark, defect, text):
+    product_ids, _ = benchmark(parse_model_json, text, '[')
+    assert product_ids
+
+
+@pytest.mark.parametrize('query', ['backpack', 'wireless lamp', 'no such product'])
+def test_basic_search_products(benchmark, catalog, query):
+    benchmark(cssa_agent.basic_search_products, query, catalog, 10)
+
+
+def test_generate_cross_sell_mappings(benchmark, catalog):
+    if len(catalog) > MAX_MAPPING_SIZE:
+        pytest.skip(f"quadratic in catalog size; measured up to {MAX_MAPPING_SIZE} products")
+    benchmark.pedantic(generate_cross_sell_mappings, args=(catalog,), rounds=3)
+
+
+def test_build_gemini_prompt_cached_catalog(benchmark, catalog, engine):
+    product = next(iter(catalog.values()))
+    engine._build_gemini_prompt(product, engine._prompt_candidates, 5, None)  # Renders the cached prefix
+    benchmark(engine._build_gemini_prompt, product, engine._prompt_candidates, 5, 'u_1')
+
+
+def test_build_gemini_prompt_uncached_catalog(benchmark, catalog, engine):
+    product = next(iter(catalog.values()))
+    candidates = list(engine._prompt_candidates)  # Not the engine's list, so rendered every call
+    benchmark(engine._build_gemini_prompt, product, candidates, 5, None)
+
+
+def test_parse_gemini_response(benchmark, catalog, engine):
+    keys = list(catalog)[:5] + ['unknown_1']
+    response_text = "```json\n" + json.dumps([
+        {"product_id": key, "reason": "Complements the main product", "confidence_score": 0.8} for key in keys
+    ], indent=2) + "\n```"
+    recommendations = benchmark(engine._parse_gemini_response, response_text, catalog)
+    assert len(recommendations) == 5
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Serialization cost of a /api/search response page.
+
+Builds a search payload shaped like the endpoint's (OrderedDicts, full
+descriptions) and times each JSON provider's response() call, printing one
+JSON line per provider:
+    python benchmarks/bench_json_serialization.py --results 20 --iterations 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from json_provider import ORJSON_AVAILABLE, OrderedJSONProvider, OrjsonProvider
+from synthetic import make_catalog
+
+
+def search_payload(results):
+    """Payload with the same fields and order as /api/search"""
+    catalog = make_catalog(results)
+    rows = [OrderedDict([
+        ("product_id", pid),
+        ("name", product['name']),
+        ("category", product['category']),
+        ("price", product['price']),
+        ("description", product['description'] * 3),
+        ("rating", product['rating']),
+    ]) for pid, product in catalog.items()]
+    return OrderedDict([
+        ("status", "success"),
+        ("query", "wireless"),
+        ("count", len(rows)),
+        ("results", rows),
+        ("timestamp", datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--results', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    payload = search_payload(args.results)
+    providers = [("flask_default_sorted", DefaultJSONProvider), ("stdlib_ordered", OrderedJSONProvider)]
+    if ORJSON_AVAILABLE:
+        providers.append(("orjson", OrjsonProvider))
+
+    app = Flask(__name__)
+    with app.app_context():
+        for name, provider_class in providers:
+            provider = provider_class(app)
+            size = len(provider.response(payload).get_data())
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                provider.response(payload)
+            elapsed = time.perf_counter() - start
+            print(json.dumps({
+                "benchmark": "json_serialization",
+                "provider": name,
+                "results": args.results,
+                "bytes": size,
+                "us_per_response": round(elapsed / args.iterations * 1e6, 2),
+            }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+"""
+End-to-end load test of cssa_agent against the stub LLM backend.
+
+Starts the app (gunicorn with gunicorn.conf.py, or the Flask dev server)
+on a synthetic catalog with CSSA_LLM_BACKEND=stub, waits for /api/ready,
+then drives /api/recommend and/or /api/search:
+  * closed loop: N clients each send the next request when the last returns
+  * open loop: requests arrive at a fixed rate whether or not earlier ones
+    finished; latency counts from the scheduled send time, so a stalled
+    server shows up as latency instead of as a lower send rate
+
+Prints one JSON line per run (throughput, p50/p95/p99, error rate, status
+codes, backends used), tagged with the git commit, e.g.:
+    python benchmarks/bench_load.py --mode closed --concurrency 1 8 32 --duration 20
+    python benchmarks/bench_load.py --mode open --rate 10 50 --latency lognormal:800,2500
+    python benchmarks/bench_load.py --url http://127.0.0.1:5000 --mode open --rate 20
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import requests
+
+from cross_sell_scoring import score_cross_sell_mappings
+from data_loader import save_to_file
+from synthetic import make_catalog
+
+# Terms for search queries (nouns/adjectives used by synthetic names)
+SEARCH_TERMS = ["backpack", "laptop", "wireless", "lamp", "organic", "watch", "smart", "serum", "sofa", "cable"]
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an ascending list (0 if empty)"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Server:
+    """cssa_agent in a subprocess, configured for the stub backend"""
+
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.url = f"http://127.0.0.1:{args.port}"
+        self.process = None
+
+    def env(self, products_file):
+        env = dict(os.environ)
+        env.update({
+            'CSSA_LLM_BACKEND': 'stub',
+            'CSSA_STUB_LATENCY': self.args.latency,
+            'CSSA_STUB_MALFORMED_RATE': str(self.args.malformed_rate),
+            'CSSA_STUB_TRUNCATE_RATE': str(self.args.truncate_rate),
+            'CSSA_STUB_ERROR_RATE': str(self.args.error_rate),
+            'CSSA_STUB_SEED': str(self.args.seed),
+            # The stub has no quota; keep the limiter from being the bottleneck
+            'CSSA_LLM_RPM': '1000000',
+            'CSSA_LLM_TPM': '1000000000',
+            'CSSA_PRODUCTS_FILE': products_file,
+            'CSSA_LOG_FILE': os.path.join(self.workdir, 'server.log'),
+            'CSSA_LOG_LEVEL': 'WARNING',
+            'PORT': str(self.args.port),
+        })
+        for item in self.args.env:
+            key, _, value = item.partition('=')
+            env[key] = value
+        return env
+
+    def start(self):
+        products_file = os.path.join(self.workdir, 'products.json')
+        save_to_file(score_cross_sell_mappings(make_catalog(self.args.products, self.args.seed)), products_file)
+        if self.args.server == 'gunicorn':
+            command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'cssa_agent:app']
+        else:
+            command = [sys.executable, '-c',
+                       f"import cssa_agent; cssa_agent.app.run(host='127.0.0.1', port={self.args.port}, threaded=True)"]
+        self.process = subprocess.Popen(command, cwd=ROOT, env=self.env(products_file),
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.time() + self.args.startup_timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {self.process.returncode}")
+            try:
+                if requests.get(self.url + '/api/ready', timeout=5).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"Server not ready after {self.args.startup_timeout}s")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class LoadDriver:
+    """Issues requests and collects per-request outcomes"""
+
+    def __init__(self, url, endpoint, queries, timeout):
+        self.url = url
+        self.endpoint = endpoint
+        self.queries = queries
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.latencies = []
+        self.status_codes = Counter()
+        self.backends = Counter()
+        self.errors = 0
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def send(self, i, scheduled=None):
+        """Send request ``i``; latency counts from ``scheduled`` (perf_counter) if given"""
+        started = scheduled if scheduled is not None else time.perf_counter()
+        endpoint = self.endpoint if self.endpoint != 'mix' else ('recommend', 'search')[i % 2]
+        if endpoint == 'recommend':
+            params = {'product_id': self.queries[i % len(self.queries)], 'limit': 3}
+        else:
+            params = {'query': SEARCH_TERMS[i % len(SEARCH_TERMS)], 'limit': 10}
+        try:
+            response = self._session().get(f"{self.url}/api/{endpoint}", params=params, timeout=self.timeout)
+            status, backend = str(response.status_code), response.headers.get('X-CSSA-Backend', 'none')
+        except requests.RequestException as e:
+            status, backend = type(e).__name__, 'none'
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.status_codes[status] += 1
+            self.backends[backend] += 1
+            if status == '200':
+                self.latencies.append(elapsed_ms)
+            else:
+                self.errors += 1
+
+    def closed_loop(self, concurrency, duration):
+        stop_at = time.perf_counter() + duration
+        counter = iter(range(10 ** 12))
+
+        def client():
+            while time.perf_counter() < stop_at:
+                self.send(next(counter))
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def open_loop(self, rate, duration, poisson, max_outstanding, seed):
+        rng = random.Random(seed)
+        with ThreadPoolExecutor(max_workers=max_outstanding) as pool:
+            start = time.perf_counter()
+            next_at, i = start, 0
+            while next_at < start + duration:
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.send, i, next_at)
+                i += 1
+                next_at += rng.expovariate(rate) if poisson else 1.0 / rate
+
+    def result(self, elapsed):
+        latencies = sorted(self.latencies)
+        total = len(latencies) + self.errors
+        return {
+            "requests": total,
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 0.50), 1),
+            "p95_ms": round(percentile(latencies, 0.95), 1),
+            "p99_ms": round(percentile(latencies, 0.99), 1),
+            "error_rate": round(self.errors / total, 4) if total else 0.0,
+            "status_codes": dict(self.status_codes),
+            "backends": dict(self.backends),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32], help="closed-loop clients")
+    parser.add_argument('--rate', type=float, nargs='+', default=[5, 20], help="open-loop requests per second")
+    parser.add_argument('--arrivals', choices=['uniform', 'poisson'], default='poisson')
+    parser.add_argument('--max-outstanding', type=int, default=256, help="open-loop client threads")
+    parser.add_argument('--endpoint', choices=['recommend', 'search', 'mix'], default='recommend')
+    parser.add_argument('--duration', type=float, default=20, help="seconds per run")
+    parser.add_argument('--warmup', type=float, default=3, help="seconds of unrecorded load first")
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--url', help="drive an already running server instead of starting one")
+    parser.add_argument('--server', choices=['gunicorn', 'flask'], default='gunicorn')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--products', type=int, default=2000, help="synthetic catalog size")
+    parser.add_argument('--latency', default='lognormal:800,2500', help="stub latency spec")
+    parser.add_argument('--malformed-rate', type=float, default=0.05)
+    parser.add_argument('--truncate-rate', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help="extra server environment (e.g. CSSA_ADMIT_MAX_IN_FLIGHT=32)")
+    parser.add_argument('--startup-timeout', type=float, default=60)
+    args = parser.parse_args()
+
+    catalog = make_catalog(args.products, args.seed)
+    queries = [product['name'] for product in list(catalog.values())[:500]]
+    commit = git_commit()
+
+    with tempfile.TemporaryDirectory(prefix='cssa_load_') as workdir:
+        server = None if args.url else Server(args, workdir)
+        try:
+            if server is not None:
+                server.start()
+            driver = LoadDriver(args.url or server.url, args.endpoint, queries, args.timeout)
+            if args.warmup > 0:
+                driver.closed_loop(min(args.concurrency), args.warmup)
+
+            levels = args.concurrency if args.mode == 'closed' else args.rate
+            for level in levels:
+                driver.reset()
+                started = time.perf_counter()
+                if args.mode == 'closed':
+                    driver.closed_loop(level, args.duration)
+                else:
+                    driver.open_loop(level, args.duration, args.arrivals == 'poisson', args.max_outstanding, args.seed)
+                result = {
+                    "benchmark": "load",
+                    "commit": commit,
+                    "mode": args.mode,
+                    "endpoint": args.endpoint,
+                    "server": 'external' if args.url else args.server,
+                    "concurrency" if args.mode == 'closed' else "rate_rps": level,
+                    "duration_s": args.duration,
+                    "stub_latency": None if args.url else args.latency,
+                }
+                result.update(driver.result(time.perf_counter() - started))
+                print(json.dumps(result), flush=True)
+        finally:
+            if server is not None:
+                server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Corpus of realistic (mostly malformed) model outputs for the JSON cleanup
+benchmarks.
+
+Each entry is (defect name, raw text). The defects are the ones seen from
+Gemini in practice: markdown fences, prose around the JSON, single quotes,
+trailing commas, output cut off mid-object, and the ones only json-repair
+fixes (missing commas, unquoted keys, Python literals).
+"""
+
+import json
+import random
+
+_REASONS = ["Pairs well for everyday use", "Protects your purchase", "Completes the setup",
+            "Frequently bought together", "Popular upgrade for this item"]
+
+
+def recommendation_payload(count=5, seed=0):
+    """Well-formed recommend response text as the prompt asks for it"""
+    rng = random.Random(seed)
+    return json.dumps({"recommendations": [{
+        "product_id": f"prod_UK{rng.randint(10000, 99999)}",
+        "name": f"Accessory {i}",
+        "category": rng.choice(["electronics", "accessories", "bags"]),
+        "price": round(rng.uniform(5, 200), 2),
+        "reason": rng.choice(_REASONS),
+        "source": rng.choice(["ml_model", "collaborative_filtering"]),
+    } for i in range(count)]}, indent=2)
+
+
+def search_payload(count=10, seed=0):
+    """Well-formed search response text (array of product ids)"""
+    rng = random.Random(seed)
+    return json.dumps([f"fakestore_{rng.randint(1, 1000)}" for _ in range(count)])
+
+
+def apply_defect(text, defect):
+    if defect == 'clean':
+        return text
+    if defect == 'fenced':
+        return f"```json\n{text}\n```"
+    if defect == 'prose':
+        return f"Here are the results:\n{text}\nLet me know if you need more."
+    if defect == 'single_quotes':
+        return text.replace('"', "'")
+    if defect == 'trailing_commas':
+        return text.replace('}\n  ]', '},\n  ]').replace('"]', '",]')
+    if defect == 'truncated':
+        return text[:int(len(text) * 0.8)]
+    if defect == 'missing_commas':
+        return text.replace('",\n', '"\n', 3).replace('", "', '" "', 1)
+    if defect == 'unquoted_keys':
+        return text.replace('"product_id":', 'product_id:').replace('"price":', 'price:')
+    if defect == 'python_literals':
+        return text.replace('"', "'").replace("'source': 'ml_model'", "'source': None")
+    raise ValueError(f"Unknown defect: {defect}")
+
+
+# Defects the string cleanup handles, then those that need json-repair
+CLEANUP_DEFECTS = ('clean', 'fenced', 'prose', 'single_quotes', 'trailing_commas', 'truncated')
+REPAIR_DEFECTS = ('missing_commas', 'unquoted_keys', 'python_literals')
+DEFECTS = CLEANUP_DEFECTS + REPAIR_DEFECTS
+# Search output is a flat array of ids: no keys or literals to break
+ARRAY_DEFECTS = CLEANUP_DEFECTS + ('missing_commas',)
+
+
+def corpus(shape='object', seed=0):
+    """[(defect, text)] for every defect, for recommend ('object') or search ('array') output"""
+    if shape == 'object':
+        text, defects = recommendation_payload(seed=seed), DEFECTS
+    else:
+        text, defects = search_payload(seed=seed), ARRAY_DEFECTS
+    return [(defect, apply_defect(text, defect)) for defect in defects]
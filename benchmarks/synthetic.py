@@ -0,0 +1,38 @@
+"""
+Synthetic CSSA catalogs for benchmarks.
+
+Products use the same record layout as data_loader's mappers and the real
+category names, so category buckets and cross-sell candidates are realistic.
+"""
+
+import random
+
+from cross_sell_scoring import CATEGORY_MAP
+
+CATEGORIES = sorted(CATEGORY_MAP)
+
+_ADJECTIVES = ["Premium", "Classic", "Slim", "Wireless", "Organic", "Portable", "Deluxe", "Compact",
+               "Vintage", "Smart", "Ultra", "Casual", "Rechargeable", "Handmade", "Waterproof"]
+_NOUNS = ["Backpack", "Jacket", "Ring", "Monitor", "Lamp", "Serum", "Perfume", "Sofa", "Phone",
+          "Laptop", "Bracelet", "Shirt", "Cable", "Mascara", "Chair", "Speaker", "Watch", "Candle"]
+
+
+def make_catalog(size, seed=42):
+    """Build a deterministic catalog dict of ``size`` products"""
+    rng = random.Random(seed)
+    catalog = {}
+    for i in range(1, size + 1):
+        source = "fakestore" if i % 2 else "dummyjson"
+        name = f"{rng.choice(_ADJECTIVES)} {rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} {i % 97}"
+        catalog[f"{source}_{i}"] = {
+            "id": i,
+            "name": name,
+            "category": rng.choice(CATEGORIES),
+            "price": round(rng.uniform(2, 900), 2),
+            "description": f"{name} for everyday use, model {rng.randint(100, 999)}",
+            "image": "",
+            "rating": round(rng.uniform(1, 5), 1),
+            "source": source,
+            "cross_sell": [],
+        }
+    return catalog
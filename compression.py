@@ -0,0 +1,101 @@
+"""
+Response compression (gzip, and brotli when the ``brotli`` package is installed).
+
+Dynamic responses of a compressible type above ``min_bytes`` are encoded
+with the best encoding the client accepts. File responses are left alone;
+static UI assets are precompressed at build time instead (ui_assets.py).
+
+Tunables (environment):
+    CSSA_COMPRESS_MIN_BYTES   smallest body worth compressing (default 1024)
+    CSSA_GZIP_LEVEL           gzip level for dynamic responses (default 6)
+    CSSA_BROTLI_QUALITY       brotli quality for dynamic responses (default 5)
+"""
+
+import gzip
+import os
+from typing import Iterable, Optional
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESSIBLE_MIMETYPES = frozenset([
+    'application/json', 'application/javascript', 'text/html', 'text/css', 'text/plain', 'text/javascript',
+])
+
+
+def supported_encodings() -> tuple:
+    """Encodings this process can produce, preferred first"""
+    return ('br', 'gzip') if BROTLI_AVAILABLE else ('gzip',)
+
+
+def negotiate_encoding(accept_encodings, available: Optional[Iterable[str]] = None) -> Optional[str]:
+    """
+    Best of ``available`` by the client's Accept-Encoding q-values (ties go to
+    the earlier entry), or None if the client accepts none of them.
+
+    Args:
+        accept_encodings: werkzeug Accept object (``request.accept_encodings``)
+        available: Candidate encodings, preferred first (default: supported_encodings())
+    """
+    best, best_quality = None, 0
+    for encoding in (available if available is not None else supported_encodings()):
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """Encode ``data`` as gzip or br (level None = the encoding's maximum)"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if level is None else level)
+    if encoding == 'gzip':
+        # mtime=0 keeps the output byte-identical for identical input
+        return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def add_vary(response, header: str = 'Accept-Encoding'):
+    """Add ``header`` to the response's Vary header (once)"""
+    if header.lower() not in {h.strip().lower() for h in response.headers.get('Vary', '').split(',') if h.strip()}:
+        response.headers['Vary'] = ', '.join(filter(None, [response.headers.get('Vary'), header]))
+
+
+class ResponseCompressor:
+    """after_request hook that compresses eligible responses in place"""
+
+    def __init__(self, min_bytes: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.min_bytes = min_bytes
+        self.levels = {'gzip': gzip_level, 'br': brotli_quality}
+
+    @classmethod
+    def from_env(cls) -> 'ResponseCompressor':
+        return cls(
+            min_bytes=int(os.getenv('CSSA_COMPRESS_MIN_BYTES', 1024)),
+            gzip_level=int(os.getenv('CSSA_GZIP_LEVEL', 6)),
+            brotli_quality=int(os.getenv('CSSA_BROTLI_QUALITY', 5)),
+        )
+
+    def __call__(self, response, accept_encodings):
+        if (response.direct_passthrough or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or 'Content-Encoding' in response.headers):
+            return response
+        # The body may differ by Accept-Encoding from here on, so caches must key on it
+        add_vary(response)
+        if not 200 <= response.status_code < 300 or response.status_code == 204:
+            return response
+        if response.content_length is not None and response.content_length < self.min_bytes:
+            return response
+
+        encoding = negotiate_encoding(accept_encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_bytes:
+            return response
+        response.set_data(compress(data, encoding, self.levels[encoding]))
+        response.headers['Content-Encoding'] = encoding
+        return response
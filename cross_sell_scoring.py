@@ -0,0 +1,362 @@
+"""
+Offline cross-sell affinity scoring.
+
+Scores candidate pairs on category relation, price ratio, title/description
+similarity and rating, keeping only the top-k per product. Candidates come
+from category buckets (same and related categories), topped up from a small
+pool of well-rated products. Buckets are scanned best-rated first and capped
+at ``max_candidates`` (shared evenly between the buckets), so each product
+scores a bounded candidate set.
+Large catalogs are scored in chunks across a multiprocessing pool that
+reads one shared, read-only columnar copy of the catalog.
+"""
+
+import heapq
+import logging
+import multiprocessing
+import os
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from dedup import normalize_title
+
+logger = logging.getLogger(__name__)
+
+# Complementary category relationships used to pick cross-sell candidates
+CATEGORY_MAP = {
+    "men's clothing": ["women's clothing", "jewelery", "accessories"],
+    "women's clothing": ["men's clothing", "jewelery", "accessories"],
+    "electronics": ["accessories", "laptops", "smartphones"],
+    "jewelery": ["men's clothing", "women's clothing", "accessories"],
+    "accessories": ["electronics", "men's clothing", "women's clothing"],
+    "laptops": ["electronics", "accessories"],
+    "smartphones": ["electronics", "accessories"],
+    "furniture": ["home-decoration", "lighting"],
+    "home-decoration": ["furniture", "lighting"],
+    "fragrances": ["beauty", "skincare"],
+    "beauty": ["fragrances", "skincare"],
+    "skincare": ["beauty", "fragrances"],
+    "groceries": ["fragrances"],
+    "general": []  # Will match any category
+}
+
+# Category relation strengths and feature weights for the affinity score
+SAME_CATEGORY = 1.0
+RELATED_CATEGORY = 0.6
+OTHER_CATEGORY = 0.0
+
+WEIGHTS = {
+    'category': 0.45,
+    'price': 0.20,
+    'text': 0.20,
+    'rating': 0.15,
+}
+
+# Feature weights for the confidence shown with a recommendation, and the
+# range it is mapped into (rank = position in the model's or list's order)
+CONFIDENCE_WEIGHTS = {
+    'category': 0.35,
+    'price': 0.20,
+    'rating': 0.15,
+    'rank': 0.30,
+}
+CONFIDENCE_RANGE = (0.65, 0.95)
+
+# Feature value used when the anchor product or a candidate field is unknown
+NEUTRAL_FEATURE = 0.5
+
+_STOPWORDS = frozenset(['and', 'for', 'the', 'with', 'of', 'in', 'to', 'a', 'an'])
+
+
+def tokenize(text: str) -> frozenset:
+    """Normalized word tokens used for text similarity"""
+    return frozenset(t for t in normalize_title(text).split() if len(t) > 1 and t not in _STOPWORDS)
+
+
+def category_relation(category: str, other_category: str) -> float:
+    """Strength of the relation between two categories (case-insensitive)"""
+    category, other_category = (category or '').lower(), (other_category or '').lower()
+    if category == other_category:
+        return SAME_CATEGORY
+    if other_category in CATEGORY_MAP.get(category, ()):
+        return RELATED_CATEGORY
+    return OTHER_CATEGORY
+
+
+def price_ratio(price: float, other_price: float) -> float:
+    """Ratio of the smaller to the larger price, 0.0 if either is missing"""
+    if price <= 0 or other_price <= 0:
+        return 0.0
+    return min(price, other_price) / max(price, other_price)
+
+
+def jaccard(tokens: frozenset, other_tokens: frozenset) -> float:
+    """Jaccard similarity of two token sets"""
+    if not tokens or not other_tokens:
+        return 0.0
+    return len(tokens & other_tokens) / len(tokens | other_tokens)
+
+
+def _as_float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def product_tokens(product: Dict) -> frozenset:
+    """Tokens of a product record as used by the affinity score"""
+    return tokenize(f"{product.get('name', '')} {(product.get('description') or '')[:80]}")
+
+
+def affinity(product: Dict, other: Dict,
+             tokens: Optional[frozenset] = None,
+             other_tokens: Optional[frozenset] = None) -> float:
+    """Affinity of ``other`` as a cross-sell for ``product`` (same weights as score_product)"""
+    if tokens is None:
+        tokens = product_tokens(product)
+    if other_tokens is None:
+        other_tokens = product_tokens(other)
+    return (WEIGHTS['category'] * category_relation(product.get('category'), other.get('category'))
+            + WEIGHTS['price'] * price_ratio(_as_float(product.get('price')), _as_float(other.get('price')))
+            + WEIGHTS['text'] * jaccard(tokens, other_tokens)
+            + WEIGHTS['rating'] * min(_as_float(other.get('rating')), 5.0) / 5.0)
+
+
+def confidence_scores(anchor: Optional[Dict], candidates: List[Dict]) -> List[float]:
+    """
+    Deterministic confidence for each candidate, best-ranked first.
+
+    Features are computed column-wise over the whole list (category relation
+    to ``anchor``, price ratio, rating, rank position), weighted by
+    CONFIDENCE_WEIGHTS and mapped into CONFIDENCE_RANGE, rounded to 2 places.
+    Identical inputs always give identical scores.
+
+    Args:
+        anchor: Product the recommendations are for, or None if not in the catalog
+        candidates: Recommended products in ranked order (name/category/price/rating)
+    """
+    n = len(candidates)
+    if not n:
+        return []
+
+    if anchor is not None:
+        anchor_category = anchor.get('category')
+        anchor_price = _as_float(anchor.get('price'))
+        relation = array('d', (category_relation(anchor_category, c.get('category')) for c in candidates))
+        prices = array('d', (price_ratio(anchor_price, _as_float(c.get('price'))) for c in candidates))
+    else:
+        relation = prices = array('d', [NEUTRAL_FEATURE]) * n
+    ratings = array('d', (min(_as_float(c['rating']), 5.0) / 5.0 if c.get('rating') else NEUTRAL_FEATURE
+                          for c in candidates))
+    ranks = array('d', (1.0 - position / n for position in range(n)))
+
+    low, high = CONFIDENCE_RANGE
+    w_cat, w_price, w_rating, w_rank = (CONFIDENCE_WEIGHTS[k] for k in ('category', 'price', 'rating', 'rank'))
+    return [
+        round(low + (high - low) * (w_cat * c + w_price * p + w_rating * r + w_rank * k), 2)
+        for c, p, r, k in zip(relation, prices, ratings, ranks)
+    ]
+
+
+class CatalogArrays:
+    """Columnar, read-only view of the catalog shared by scoring workers"""
+
+    def __init__(self, products: Dict[str, Dict], fill_pool_size: int = 60):
+        self.keys = list(products.keys())
+        self.category_names = []
+        category_ids = {}
+        self.categories = array('i')
+        self.prices = array('d')
+        self.ratings = array('d')
+        self.tokens = []
+        by_category = {}
+
+        for idx, key in enumerate(self.keys):
+            product = products[key]
+            name = (product.get('category') or 'general').lower()
+            cat_id = category_ids.get(name)
+            if cat_id is None:
+                cat_id = category_ids[name] = len(self.category_names)
+                self.category_names.append(name)
+                by_category[cat_id] = array('i')
+            self.categories.append(cat_id)
+            by_category[cat_id].append(idx)
+            self.prices.append(_as_float(product.get('price')))
+            self.ratings.append(min(_as_float(product.get('rating')), 5.0))
+            self.tokens.append(product_tokens(product))
+
+        # Best-rated first, so a capped scan sees the strongest candidates
+        self.by_category = {
+            cat_id: array('i', sorted(members, key=lambda i: (-self.ratings[i], i)))
+            for cat_id, members in by_category.items()
+        }
+        # Related category ids per category id, from CATEGORY_MAP
+        self.related = [
+            tuple(category_ids[r] for r in CATEGORY_MAP.get(name, ()) if r in category_ids)
+            for name in self.category_names
+        ]
+        # Best-rated products, used to top up products with few related candidates
+        self.fill_pool = array('i', heapq.nlargest(
+            fill_pool_size, range(len(self.keys)), key=lambda i: (self.ratings[i], -i)
+        ))
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def score_product(arrays: CatalogArrays, idx: int, top_k: int = 15,
+                  max_candidates: int = 2000) -> Tuple[List[Tuple[float, int]], int]:
+    """
+    Score the candidates of one product.
+
+    Returns:
+        (top-k list of (score, candidate index) best first, number of pairs scored)
+    """
+    cat_id = arrays.categories[idx]
+    price = arrays.prices[idx]
+    tokens = arrays.tokens[idx]
+    prices, ratings, all_tokens = arrays.prices, arrays.ratings, arrays.tokens
+    w_cat, w_price, w_text, w_rating = WEIGHTS['category'], WEIGHTS['price'], WEIGHTS['text'], WEIGHTS['rating']
+
+    groups = [(arrays.by_category[cat_id], SAME_CATEGORY)]
+    groups.extend((arrays.by_category[r], RELATED_CATEGORY) for r in arrays.related[cat_id])
+    candidate_count = sum(len(members) for members, _ in groups)
+    if candidate_count - 1 < top_k:
+        groups.append((arrays.fill_pool, None))
+
+    heap = []
+    seen = {idx}
+    pairs = 0
+    group_budget = max(1, max_candidates // len(groups))
+    for members, relation in groups:
+        group_pairs = 0
+        for j in members:
+            if group_pairs >= group_budget:
+                break
+            if j in seen:
+                continue
+            seen.add(j)
+            rel = relation
+            if rel is None:
+                # Fill-pool candidates can come from any category
+                other_cat = arrays.categories[j]
+                rel = (SAME_CATEGORY if other_cat == cat_id
+                       else RELATED_CATEGORY if other_cat in arrays.related[cat_id]
+                       else OTHER_CATEGORY)
+            score = (w_cat * rel
+                     + w_price * price_ratio(price, prices[j])
+                     + w_text * jaccard(tokens, all_tokens[j])
+                     + w_rating * ratings[j] / 5.0)
+            pairs += 1
+            group_pairs += 1
+            # Ties go to the earlier product in catalog order
+            item = (score, -j)
+            if len(heap) < top_k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    ranked = sorted(heap, reverse=True)
+    return [(score, -neg_j) for score, neg_j in ranked], pairs
+
+
+# Set in the parent before forking (or by the pool initializer) so workers share one copy
+_SHARED_ARRAYS: Optional[CatalogArrays] = None
+
+
+def _init_worker(arrays: Optional[CatalogArrays] = None):
+    global _SHARED_ARRAYS
+    if arrays is not None:
+        _SHARED_ARRAYS = arrays
+
+
+def _score_chunk(args):
+    start, stop, top_k, max_candidates = args
+    arrays = _SHARED_ARRAYS
+    results = []
+    pairs = 0
+    for idx in range(start, stop):
+        ranked, scored = score_product(arrays, idx, top_k, max_candidates)
+        results.append((idx, ranked))
+        pairs += scored
+    return results, pairs
+
+
+def score_catalog(arrays: CatalogArrays,
+                  top_k: int = 15,
+                  workers: Optional[int] = None,
+                  chunk_size: int = 256,
+                  max_candidates: int = 2000) -> Tuple[List[List[Tuple[float, int]]], int]:
+    """
+    Score every product in ``arrays``.
+
+    Args:
+        arrays: Columnar catalog view
+        top_k: Candidates kept per product
+        workers: Pool size (None = CPU count, 1 = score in-process)
+        chunk_size: Products per pool task
+        max_candidates: Pairs scored per product at most
+
+    Returns:
+        (per-product ranked lists indexed like ``arrays.keys``, total pairs scored)
+    """
+    global _SHARED_ARRAYS
+    n = len(arrays)
+    workers = workers or os.cpu_count() or 1
+    tasks = [(start, min(start + chunk_size, n), top_k, max_candidates) for start in range(0, n, chunk_size)]
+    rankings = [None] * n
+    total_pairs = 0
+
+    _SHARED_ARRAYS = arrays
+    try:
+        if workers <= 1 or len(tasks) <= 1:
+            chunks = map(_score_chunk, tasks)
+            pool = None
+        else:
+            # With fork the workers inherit _SHARED_ARRAYS copy-on-write;
+            # other start methods get it once per worker via the initializer.
+            forked = multiprocessing.get_start_method() == 'fork'
+            pool = multiprocessing.Pool(workers, initializer=_init_worker,
+                                        initargs=(() if forked else (arrays,)))
+            chunks = pool.imap_unordered(_score_chunk, tasks)
+        try:
+            for results, pairs in chunks:
+                total_pairs += pairs
+                for idx, ranked in results:
+                    rankings[idx] = ranked
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+    finally:
+        _SHARED_ARRAYS = None
+
+    return rankings, total_pairs
+
+
+def score_cross_sell_mappings(all_products: Dict[str, Dict],
+                              top_k: int = 15,
+                              workers: Optional[int] = None,
+                              chunk_size: int = 256,
+                              min_parallel_products: int = 2000) -> Dict[str, Dict]:
+    """
+    Fill each product's cross_sell list with its top-k candidates by affinity.
+
+    Catalogs smaller than ``min_parallel_products`` are scored in-process,
+    since pool start-up would cost more than the scoring itself.
+    """
+    if not all_products:
+        return all_products
+
+    arrays = CatalogArrays(all_products)
+    if len(arrays) < min_parallel_products:
+        workers = 1
+    rankings, pairs = score_catalog(arrays, top_k, workers, chunk_size)
+
+    keys = arrays.keys
+    for idx, key in enumerate(keys):
+        all_products[key]['cross_sell'] = [keys[j] for _, j in rankings[idx]]
+
+    logger.info(f"Scored {pairs} cross-sell pairs for {len(keys)} products (top {top_k} kept)")
+    return all_products
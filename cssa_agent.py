@@ -7,102 +7,460 @@ Simplified Gemini 2.5 Flash Integration
 from dotenv import load_dotenv
 load_dotenv()
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, g, request, jsonify, send_from_directory
 import os
 from datetime import datetime
+import hmac
 import json
 import logging
 import uuid
-import random
+import threading
+import time
 from collections import OrderedDict
-from typing import Dict, List, Optional
-from json_repair import repair_json
-
-# Import Gemini AI
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('cssa_agent.log'),
-        logging.StreamHandler()
-    ]
-)
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from admission import SHED_CACHED, SHED_LOCAL, SHED_REJECTED, AdmissionController, Overloaded, ResultCache
+from compression import ResponseCompressor, add_vary
+from cross_sell_scoring import confidence_scores
+from data_loader import CatalogCache, CrossSellIndex, catalog_lock, make_product_record, save_to_file
+from http_cache import CachePolicy, payload_etag, policies_from_env
+from json_provider import json_provider_class
+from llm_backend import backend_kind, llm_registry
+from log_config import configure_logging, log_payload
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, metrics
+from model_output import parse_model_json
+from model_router import LOCAL_BACKEND, SLO, router_from_env
+from profiling import PROFILE_HEADER, PROFILE_PARAM, RequestTrace, current_trace, parse_modes, record_span
+from rate_limiter import PRIORITY_INTERACTIVE, RateLimitExceeded, estimate_tokens, gemini_limiter
+from ui_assets import load_manifest, resolve_asset
+from user_history import MAX_USER_ID_LENGTH, PURCHASED, VIEWED, user_history
+
+# Configure logging: JSON lines written by a background thread (CSSA_LOG_*)
+configure_logging()  # Replaces the plain root handler data_loader configures on import
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-app.config['JSON_SORT_KEYS'] = False  # Preserve key order in JSON responses
+# Preserve key order in JSON responses (orjson when installed; Flask 3 ignores JSON_SORT_KEYS)
+app.json = json_provider_class()(app)
 
 # ============================================================================
-# GEMINI 2.5 FLASH INITIALIZATION
+# METRICS (Prometheus text at /api/metrics; per-thread counters, no locks per request)
 # ============================================================================
-gemini_model = None
+HTTP_REQUESTS = metrics.counter('cssa_http_requests_total', 'HTTP requests by endpoint, method and status',
+                                ('endpoint', 'method', 'status'))
+HTTP_LATENCY = metrics.histogram('cssa_http_request_duration_seconds', 'HTTP request latency', ('endpoint',))
+# Stages: prompt_build, llm_call, json_clean, json_repair, serialization
+STAGE_LATENCY = metrics.histogram('cssa_stage_duration_seconds', 'Request pipeline stage latency', ('stage',))
+CACHE_LOOKUPS = metrics.counter('cssa_cache_lookups_total', 'Cache lookups by cache and result (hit/miss)',
+                                ('cache', 'result'))
+LLM_TOKENS = metrics.counter('cssa_llm_tokens_total', 'Estimated LLM tokens by model and kind (prompt/completion)',
+                             ('model', 'kind'))
+ADMISSION_OUTCOMES = ('admitted', SHED_CACHED, SHED_LOCAL, SHED_REJECTED)
+metrics.callback('cssa_admission_requests_total', 'LLM-backed requests admitted or shed, by outcome', 'counter',
+                 ('outcome',), lambda: {(outcome,): count for outcome, count in admission.stats().items()
+                                        if outcome in ADMISSION_OUTCOMES})
 
-def initialize_gemini():
-    """Initialize Gemini 2.5 Flash model"""
-    global gemini_model
-    
-    if not GEMINI_AVAILABLE:
-        logger.error("google-generativeai not installed. Run: pip install google-generativeai")
+def record_stage(stage: str, started: float):
+    """Record a pipeline stage that began at ``started`` (perf_counter) in metrics and any active trace"""
+    elapsed = time.perf_counter() - started
+    STAGE_LATENCY.labels(stage).observe(elapsed)
+    record_span(stage, started, elapsed)
+
+@contextmanager
+def timed_stage(stage: str):
+    """Time the enclosed block as one pipeline stage (see record_stage)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, started)
+
+metrics.callback('cssa_llm_in_flight', 'LLM calls outstanding (including queued)', 'gauge',
+                 (), lambda: {(): admission.in_flight})
+metrics.callback('cssa_llm_queue_depth', 'Callers waiting for the outbound rate limiter', 'gauge',
+                 (), lambda: {(): gemini_limiter.queue_depth()})
+
+@app.before_request
+def start_request_timer():
+    g.metrics_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unmatched'
+    HTTP_REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    started = g.get('metrics_started')
+    if started is not None:
+        HTTP_LATENCY.labels(endpoint).observe(time.perf_counter() - started)
+    return response
+
+# ============================================================================
+# GEMINI INITIALIZATION (routed across models)
+# ============================================================================
+# Models the router may use as "name:cost"; cheapest healthy model wins. The stable model is
+# the default; add others (e.g. the experimental gemini-2.0-flash-exp) with CSSA_MODELS
+DEFAULT_MODELS = 'gemini-2.5-flash:1'
+
+# Per-endpoint latency/error budgets (override with CSSA_SLO_<ENDPOINT>_P95_MS / _ERROR_RATE)
+DEFAULT_SLOS = {
+    'recommend': SLO(p95_ms=8000, max_error_rate=0.2),
+    'search': SLO(p95_ms=5000, max_error_rate=0.2),
+}
+
+model_router, ROUTER_MODELS = router_from_env(DEFAULT_MODELS, DEFAULT_SLOS)
+
+def initialize_gemini() -> bool:
+    """
+    Register every model the router can use with the shared LLM registry.
+    Clients are built lazily (first call or /api/ready), so this stays cheap.
+    """
+    for model_name, _ in ROUTER_MODELS:
+        llm_registry.register(model_name)
+    if not llm_registry.available():
+        logger.error("GEMINI_API_KEY not set or google-generativeai not installed; using local recommendations")
         return False
+    logger.info(f"{backend_kind()} backends registered: {', '.join(model_router.backends)}")
+    return True
+
+def call_model(backend: str, prompt: str, priority: int = PRIORITY_INTERACTIVE):
+    """
+    Call one routed model backend through the shared outbound rate limiter.
+    Each attempt's latency and outcome (not time spent queued) feeds the router.
+    """
+    model = llm_registry.get(backend)
     
-    api_key = os.getenv('GEMINI_API_KEY')
-    if not api_key:
-        logger.error("GEMINI_API_KEY not found in environment variables")
-        return False
+    def attempt():
+        started = time.perf_counter()
+        try:
+            response = model.generate_content(prompt)
+        except Exception:
+            model_router.record(backend, (time.perf_counter() - started) * 1000, False)
+            record_span(f'llm_attempt:{backend}:error', started, time.perf_counter() - started)
+            raise
+        model_router.record(backend, (time.perf_counter() - started) * 1000, True)
+        record_span(f'llm_attempt:{backend}', started, time.perf_counter() - started)
+        return response
     
-    try:
-        genai.configure(api_key=api_key)
-        # Use Gemini 2.5 Flash (latest stable model)
-        model_name = 'gemini-2.5-flash'
-        gemini_model = genai.GenerativeModel(
-            model_name,
-            generation_config={
-                'temperature': 0.7,
-                'top_p': 0.95,
-                'max_output_tokens': 2048
-            }
-        )
-        logger.info(f"[OK] Gemini model initialized: {model_name}")
-        logger.info(f"[OK] API Key: {api_key[:15]}...")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to initialize Gemini: {e}")
-        return False
+    tokens = estimate_tokens(prompt)
+    with timed_stage('llm_call'):
+        response = gemini_limiter.call(attempt, tokens=tokens, priority=priority)
+    LLM_TOKENS.labels(backend, 'prompt').inc(tokens)
+    LLM_TOKENS.labels(backend, 'completion').inc(estimate_tokens(response.text))
+    return response
+
+# Shed LLM work past these in-flight/queued thresholds (CSSA_ADMIT_*)
+admission = AdmissionController.from_env(gemini_limiter.queue_depth)
+# Recent LLM recommendations, served to requests shed under load
+recent_recommendations = ResultCache.from_env()
 
-# Initialize Gemini on startup
+# Register models on startup (no SDK import or client construction yet)
 gemini_initialized = initialize_gemini()
 
+# ============================================================================
+# PRODUCT CATALOG (shared in-memory copy for admin edits)
+# ============================================================================
+PRODUCTS_FILE = os.getenv('CSSA_PRODUCTS_FILE', os.path.join(os.path.dirname(__file__), 'products.json'))
+
+# Readers share one parsed copy per catalog version instead of re-reading per request
+catalog_cache = CatalogCache(PRODUCTS_FILE)
+
+_catalog_lock = threading.Lock()
+_catalog_index = None
+_catalog_index_version = None
+
+def get_catalog_index():
+    """Wrap the current catalog version in an incremental cross-sell index (rebuilt when the version changes)"""
+    global _catalog_index, _catalog_index_version
+    version, products = catalog_cache.get()
+    with _catalog_lock:
+        if _catalog_index is None or _catalog_index_version != version:
+            # Admin edits work on their own dict (and copy records on write) so readers never see a change
+            _catalog_index = CrossSellIndex(dict(products or {}))
+            _catalog_index_version = version
+        return _catalog_index
+
+def preload_catalog() -> int:
+    """
+    Parse the catalog now (e.g. in the gunicorn master before forking, so
+    workers share it copy-on-write). Returns the number of products loaded.
+    """
+    version, products = catalog_cache.get()
+    logger.info(f"Preloaded catalog version {version}: {len(products or {})} products")
+    return len(products or {})
+
+@contextmanager
+def catalog_edit():
+    """
+    Yield the index of the latest catalog version with the catalog locked
+    against other threads and workers. If the block fails, the edited index
+    is dropped so the next edit rebuilds it from the last published catalog.
+    """
+    global _catalog_index
+    with catalog_lock(PRODUCTS_FILE):
+        # Under the file lock the on-disk version is current, so a stale index is rebuilt here
+        index = get_catalog_index()
+        with _catalog_lock:
+            try:
+                yield index
+            except BaseException:
+                _catalog_index = None
+                raise
+
+def _save_catalog_edit(index):
+    """Persist an edited catalog atomically and publish it to readers (call inside catalog_edit)"""
+    global _catalog_index_version
+    version = save_to_file(index.products, PRODUCTS_FILE)
+    if version is None:
+        raise Exception("Failed to save product catalog")
+    _catalog_index_version = version
+    catalog_cache.publish(dict(index.products), version)
+    return version
+
+def _is_admin() -> bool:
+    """Whether the request carries the admin token (constant-time comparison)"""
+    admin_token = os.getenv('CSSA_ADMIN_TOKEN')
+    if not admin_token:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), admin_token.encode())
+
+def _admin_error():
+    """Return an error response unless the request carries the admin token"""
+    if not os.getenv('CSSA_ADMIN_TOKEN'):
+        return jsonify({
+            "status": "error",
+            "message": "Admin API disabled. Set CSSA_ADMIN_TOKEN to enable it.",
+            "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+        }), 403
+    if not _is_admin():
+        return jsonify({
+            "status": "error",
+            "message": "Invalid or missing X-Admin-Token header",
+            "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+        }), 401
+    return None
+
+# ============================================================================
+# HTTP CACHING (ETag / Cache-Control) AND COMPRESSION
+# ============================================================================
+# Per-endpoint lifetimes in seconds (override with CSSA_CACHE_<ENDPOINT>_MAX_AGE / _SWR)
+CACHE_POLICIES = policies_from_env({
+    'recommend': CachePolicy(max_age=60, stale_while_revalidate=300),
+    'search': CachePolicy(max_age=300, stale_while_revalidate=600),
+})
+
+def request_params() -> Optional[dict]:
+    """Request parameters: the JSON body for POST, the query string for GET"""
+    if request.method == 'GET':
+        params = request.args.to_dict()
+        if 'limit' in params:
+            try:
+                params['limit'] = int(params['limit'])
+            except ValueError:
+                pass  # Left as a string so the endpoint's validation rejects it
+        return params
+    return request.get_json(silent=True)
+
+def cacheable_response(payload: OrderedDict, endpoint: str, headers: Optional[dict] = None, private: bool = False):
+    """
+    JSON response with a weak ETag over the payload minus its per-request
+    fields, and the endpoint's Cache-Control. A matching If-None-Match on a
+    GET/HEAD gets an empty 304 instead of the body; other methods ignore it
+    (RFC 9110 allows 304 only for GET and HEAD).
+    """
+    etag = payload_etag(payload)
+    headers = dict(headers or {})
+    headers['ETag'] = f'W/"{etag}"'
+    headers['Cache-Control'] = CACHE_POLICIES[endpoint].header(private)
+    if request.method in ('GET', 'HEAD'):
+        # A profiled request always gets the body its debug field is attached to
+        if request.if_none_match.contains_weak(etag) and current_trace.get() is None:
+            CACHE_LOOKUPS.labels('http_etag', 'hit').inc()
+            return '', 304, headers
+        CACHE_LOOKUPS.labels('http_etag', 'miss').inc()
+    with timed_stage('serialization'):
+        response = jsonify(payload)
+    return response, 200, headers
+
+# gzip/brotli for API responses above CSSA_COMPRESS_MIN_BYTES
+response_compressor = ResponseCompressor.from_env()
+
+@app.after_request
+def compress_response(response):
+    return response_compressor(response, request.accept_encodings)
+
+# ============================================================================
+# REQUEST PROFILING (admin opt-in: X-CSSA-Profile: trace[,cprofile] or ?profile=)
+# ============================================================================
+# Also write each profiled request's trace (and .prof stats) here, if set
+PROFILE_DIR = os.getenv('CSSA_PROFILE_DIR')
+
+@app.before_request
+def start_profile():
+    modes = parse_modes(request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_PARAM))
+    if modes and _is_admin():
+        g.profile_trace = RequestTrace(modes, request.endpoint or 'unmatched')
+        g.profile_trace.start()
+
+# Registered after compress_response so it runs first, on the uncompressed body
+@app.after_request
+def attach_profile(response):
+    trace = g.get('profile_trace')
+    if trace is None:
+        return response
+    trace.stop()
+    debug = trace.to_dict()
+    if PROFILE_DIR:
+        debug['profile_file'] = trace.dump(PROFILE_DIR)
+    body = response.get_json(silent=True) if response.is_json and not response.direct_passthrough else None
+    if isinstance(body, dict):
+        body['debug'] = debug
+        response.set_data(app.json.dumps(body))
+    response.headers.pop('ETag', None)
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-CSSA-Trace-Id'] = trace.trace_id
+    return response
+
+@app.teardown_request
+def stop_profile(exc):
+    # Also runs when a view raised and after_request was skipped
+    trace = g.get('profile_trace')
+    if trace is not None:
+        trace.stop()
+
+# Built UI (python ui_assets.py); None serves the plain ui/ sources
+ui_manifest = load_manifest()
+
 # ============================================================================
 # CROSS-SELL RECOMMENDATION ENGINE
 # ============================================================================
-def generate_cross_sell_recommendations(product_name: str, limit: int = 3) -> dict:
+def generate_cross_sell_recommendations(product_name: str, limit: int = 3, user_id: Optional[str] = None) -> dict:
     """
-    Generate cross-sell recommendations using Gemini 2.5 Flash
+    Generate cross-sell recommendations on the cheapest Gemini model that
+    meets the recommend SLO, degrading to the local cross-sell recommender
+    when no model does (or the chosen one fails).
     
     Args:
         product_name: Product name/type (e.g., 'laptop', 'mouse')
         limit: Number of recommendations (0-5)
+        user_id: Optional user whose recent history personalizes local results
         
     Returns:
-        dict with recommendations list
+        dict with recommendations list and the backend that produced it
     """
-    if not gemini_initialized or not gemini_model:
-        raise Exception("Gemini AI not initialized. Check GEMINI_API_KEY environment variable.")
-    
     # Enforce limit between 0 and 5
     limit = max(0, min(limit, 5))
     
     if limit == 0:
-        return {"recommendations": []}
+        return {"recommendations": [], "backend": LOCAL_BACKEND}
+    
+    backend = model_router.choose('recommend') if gemini_initialized else LOCAL_BACKEND
+    llm_error = None
+    shed = False
+    cache_key = (product_name.strip().lower(), limit)
+    
+    if backend != LOCAL_BACKEND and not admission.admit():
+        # Overloaded: answer now from a recent LLM result or the local recommender
+        shed = True
+        cached = recent_recommendations.get(cache_key)
+        CACHE_LOOKUPS.labels('recent_recommendations', 'miss' if cached is None else 'hit').inc()
+        if cached is not None:
+            admission.record_shed(SHED_CACHED)
+            return {"recommendations": cached, "backend": "cache"}
+        backend = LOCAL_BACKEND
+    
+    # One catalog snapshot and one anchor search per request, shared by the LLM and local paths
+    _, catalog = catalog_cache.get()
+    anchor_key = find_anchor_key(product_name, catalog)
     
+    if backend != LOCAL_BACKEND:
+        try:
+            anchor = catalog[anchor_key] if anchor_key else None
+            result = generate_llm_recommendations(backend, product_name, limit, anchor)
+            result['backend'] = backend
+            recent_recommendations.put(cache_key, result['recommendations'])
+            return result
+        except RateLimitExceeded as e:
+            logger.warning(f"Rate limited ({e}), degrading to local recommender")
+            llm_error = e
+        except Exception as e:
+            logger.warning(f"{backend} failed ({e}), degrading to local recommender")
+            llm_error = e
+        finally:
+            admission.release()
+    
+    recommendations = local_cross_sell_recommendations(product_name, limit, catalog, anchor_key, user_id)
+    if shed:
+        admission.record_shed(SHED_LOCAL if recommendations else SHED_REJECTED)
+        if not recommendations:
+            raise Overloaded("Recommendation service is overloaded, retry later", admission.retry_after)
+    if recommendations:
+        return {"recommendations": recommendations, "backend": LOCAL_BACKEND}
+    if llm_error is not None:
+        raise llm_error
+    if not gemini_initialized:
+        raise Exception("Gemini AI not initialized. Check GEMINI_API_KEY environment variable.")
+    return {"recommendations": [], "backend": LOCAL_BACKEND}
+
+def find_anchor_key(product_name: str, catalog: Optional[dict]) -> Optional[str]:
+    """Key of the best match for a product name in ``catalog`` (a linear search), or None"""
+    if not catalog:
+        return None
+    matches = basic_search_products(product_name, catalog, 1)
+    return matches[0]['product_id'] if matches else None
+
+def local_cross_sell_recommendations(product_name: str, limit: int, catalog: Optional[dict],
+                                     anchor_key: Optional[str], user_id: Optional[str] = None) -> list:
+    """
+    Non-LLM recommendations: the anchor product's precomputed cross_sell list.
+    With a user_id, the view is recorded, purchased products are dropped and
+    recently viewed ones move to the front.
+    
+    Args:
+        catalog: Catalog snapshot ``anchor_key`` was resolved in
+        anchor_key: Best catalog match for ``product_name`` (see find_anchor_key), or None
+    """
+    if anchor_key is None:
+        return []
+    anchor = catalog[anchor_key]
+    
+    pids = [pid for pid in anchor.get('cross_sell', []) if pid in catalog]
+    if user_id:
+        user_history.record(user_id, anchor_key, VIEWED)
+        purchased = set(user_history.recent(user_id, PURCHASED))
+        viewed = {pid: pos for pos, pid in enumerate(user_history.recent(user_id, VIEWED))}
+        pids = [pid for pid in pids if pid not in purchased]
+        pids.sort(key=lambda pid: viewed.get(pid, len(viewed)))  # Stable: list order otherwise
+    pids = pids[:limit]
+    products = [catalog[pid] for pid in pids]
+    recommendations = []
+    for pid, product, confidence in zip(pids, products, confidence_scores(anchor, products)):
+        recommendations.append(OrderedDict([
+            ("product_id", pid),
+            ("name", product.get('name', '')),
+            ("category", product.get('category', '')),
+            ("price", product.get('price', 0.0)),
+            ("confidence_score", confidence),
+            ("reason", f"Frequently bought with {anchor.get('name', product_name)}"),
+            ("source", "local_cross_sell")
+        ]))
+    return recommendations
+
+def generate_llm_recommendations(backend: str, product_name: str, limit: int,
+                                 anchor: Optional[dict] = None) -> dict:
+    """
+    Generate cross-sell recommendations with one Gemini model
+    
+    Args:
+        backend: Name of the routed Gemini model to query
+        product_name: Product name/type (e.g., 'laptop', 'mouse')
+        limit: Number of recommendations (1-5)
+        anchor: Catalog product matching product_name, used for confidence scores
+        
+    Returns:
+        dict with recommendations list
+    """
     # Create prompt for Gemini with very strict JSON formatting instructions
+    prompt_started = time.perf_counter()
     prompt = f"""Generate {limit} product recommendations for someone buying: "{product_name}"
 
 Return ONLY valid JSON in this EXACT format (no markdown, no explanations, pure JSON only):
@@ -124,74 +482,22 @@ CRITICAL RULES:
 7. Add comma after each recommendation EXCEPT the last one
 8. Keep reasons under 20 words
 9. Return exactly {limit} recommendations"""
+    record_stage('prompt_build', prompt_started)
     
     try:
-        logger.info(f"Requesting {limit} recommendations for: {product_name}")
-        response = gemini_model.generate_content(prompt)
-        
-        # Parse JSON response
-        response_text = response.text.strip()
-        logger.info(f"Raw response length: {len(response_text)} chars")
-        
-        # Clean up response - remove markdown code blocks
-        if response_text.startswith('```json'):
-            response_text = response_text.split('```json', 1)[1].split('```', 1)[0].strip()
-        elif response_text.startswith('```'):
-            response_text = response_text.split('```', 1)[1].split('```', 1)[0].strip()
-        
-        # Remove any trailing text after the JSON
-        if '```' in response_text:
-            response_text = response_text.split('```')[0].strip()
-        
-        # Find JSON object boundaries
-        start_idx = response_text.find('{')
-        end_idx = response_text.rfind('}')
-        if start_idx != -1 and end_idx != -1:
-            response_text = response_text[start_idx:end_idx+1]
-        elif start_idx != -1:
-            # Incomplete JSON - find where it was cut off and close it
-            response_text = response_text[start_idx:]
-            logger.warning("Detected incomplete JSON response - attempting auto-completion")
-            
-            # Remove trailing comma if present
-            response_text = response_text.rstrip().rstrip(',')
-            
-            # Count open braces/brackets to close them properly
-            open_braces = response_text.count('{') - response_text.count('}')
-            open_brackets = response_text.count('[') - response_text.count(']')
-            
-            # Close any open structures
-            for _ in range(open_brackets):
-                response_text += ']'
-            for _ in range(open_braces):
-                response_text += '}'
-        
-        logger.info(f"Cleaned response (first 300 chars): {response_text[:300]}...")
-        
-        # Use json-repair library for robust JSON fixing
+        logger.info(f"Requesting {limit} recommendations for: {product_name} from {backend}")
+        response = call_model(backend, prompt)
+        
+        # Parse JSON response (cleanup first; json-repair only if still invalid)
+        logger.info(f"Raw response length: {len(response.text)} chars")
+        log_payload(logger, "Model response", response.text, max_chars=300, backend=backend)
         try:
-            import re
-            # Quick pre-fix: replace single quotes with double quotes
-            response_text = response_text.replace("'", '"')
-            # Remove trailing commas
-            response_text = re.sub(r',(\s*[}\]])', r'\1', response_text)
-            
-            # Try standard parsing first
-            try:
-                recommendations_data = json.loads(response_text)
-                logger.info("JSON parsed successfully")
-            except json.JSONDecodeError as e:
-                # Use json-repair as fallback
-                logger.warning(f"Standard JSON parse failed: {e.msg} at position {e.pos}")
-                logger.info("Attempting repair with json-repair library...")
-                repaired_json_str = repair_json(response_text)
-                recommendations_data = json.loads(repaired_json_str)
-                logger.info("Successfully repaired and parsed JSON!")
-                
+            recommendations_data, repaired = parse_model_json(response.text, '{', timed_stage)
         except Exception as parse_error:
             logger.error(f"JSON repair failed completely: {parse_error}")
-            logger.error(f"Full response: {response_text}")
+            log_payload(logger, "Unparseable model response", response.text, logging.ERROR, backend=backend)
             raise Exception(f"Unable to parse Gemini response as JSON. Error: {str(parse_error)}")
+        logger.info("Successfully repaired and parsed JSON!" if repaired else "JSON parsed successfully")
         
         # Validate structure
         if 'recommendations' not in recommendations_data:
@@ -200,15 +506,16 @@ CRITICAL RULES:
         # Trim to exact limit
         recommendations_data['recommendations'] = recommendations_data['recommendations'][:limit]
         
-        # Rebuild each recommendation with correct field order and add confidence_score
+        # Rebuild each recommendation with correct field order and a deterministic confidence_score
+        confidences = confidence_scores(anchor, recommendations_data['recommendations'])
         reordered_recommendations = []
-        for rec in recommendations_data['recommendations']:
+        for rec, confidence in zip(recommendations_data['recommendations'], confidences):
             reordered_rec = OrderedDict([
                 ("product_id", rec.get("product_id", "")),
                 ("name", rec.get("name", "")),
                 ("category", rec.get("category", "")),
                 ("price", rec.get("price", 0.0)),
-                ("confidence_score", round(random.uniform(0.65, 0.95), 2)),
+                ("confidence_score", confidence),
                 ("reason", rec.get("reason", "")),
                 ("source", rec.get("source", "ml_model"))
             ])
@@ -221,7 +528,7 @@ CRITICAL RULES:
         
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse JSON response: {e}")
-        logger.error(f"Response text: {response.text[:1000]}")
+        log_payload(logger, "Invalid model response", response.text, logging.ERROR, max_chars=1000, backend=backend)
         raise Exception(f"Gemini returned invalid JSON: {str(e)}")
     except Exception as e:
         logger.error(f"Error generating recommendations: {e}")
@@ -231,22 +538,40 @@ CRITICAL RULES:
 # API ENDPOINTS
 # ============================================================================
 
+def send_ui_asset(filename: str):
+    """
+    Serve a UI file: the built, precompressed copy from ui/dist when
+    ui_assets.py has been run (fingerprinted names cached for a year),
+    the plain ui/ source otherwise.
+    """
+    directory, served, encoding, cache_control, mimetype = resolve_asset(
+        filename, request.accept_encodings, ui_manifest
+    )
+    response = send_from_directory(directory, served, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+        response.headers.pop('Content-Disposition', None)  # Would name the .gz/.br file
+    if ui_manifest is not None:
+        add_vary(response)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
 @app.route('/')
 def index():
     """Serve the main UI"""
-    return send_from_directory('ui', 'index.html')
+    return send_ui_asset('index.html')
 
 @app.route('/ui/<path:filename>')
 def serve_ui(filename):
     """Serve UI static files"""
-    return send_from_directory('ui', filename)
+    return send_ui_asset(filename)
 
-@app.route('/api/recommend', methods=['POST'])
+@app.route('/api/recommend', methods=['GET', 'POST'])
 def recommend():
     """
     Main recommendation endpoint
     
-    Expected JSON format:
+    Expected JSON format (or the same fields as GET query parameters):
     {
         "product_id": "laptop",
         "limit": 3,
@@ -254,8 +579,8 @@ def recommend():
     }
     """
     try:
-        # Parse JSON input
-        data = request.get_json()
+        # Parse JSON input (query string for GET)
+        data = request_params()
         
         if not data:
             return jsonify({
@@ -275,6 +600,14 @@ def recommend():
         
         limit = data.get('limit', 3)
         session_id = data.get('session_id', 'default')
+        user_id = data.get('user_id')
+        
+        if not isinstance(product_id, str) or not (user_id is None or isinstance(user_id, str)):
+            return jsonify({
+                "status": "error",
+                "message": "product_id and user_id must be strings",
+                "timestamp": datetime.now().isoformat()
+            }), 400
         
         # Validate limit
         if not isinstance(limit, int) or limit < 0 or limit > 5:
@@ -287,7 +620,7 @@ def recommend():
         logger.info(f"Recommendation request for product: {product_id}, limit: {limit}")
         
         # Generate recommendations
-        result = generate_cross_sell_recommendations(product_id, limit)
+        result = generate_cross_sell_recommendations(product_id, limit, user_id)
         
         # Build response with exact field sequence using OrderedDict
         response = OrderedDict([
@@ -302,9 +635,18 @@ def recommend():
             ("timestamp", datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'))
         ])
         
-        logger.info(f"Successfully returned {len(result['recommendations'])} recommendations")
-        return jsonify(response), 200
+        logger.info(f"Successfully returned {len(result['recommendations'])} recommendations via {result['backend']}")
+        # Personalized results may only be cached by the user's own client
+        return cacheable_response(response, 'recommend', {'X-CSSA-Backend': result['backend']},
+                                  private=bool(user_id))
         
+    except Overloaded as e:
+        logger.warning(f"Shed recommend request for {product_id}: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e),
+            "timestamp": datetime.now().isoformat()
+        }), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         logger.error(f"Error in recommend endpoint: {e}")
         return jsonify({
@@ -319,25 +661,112 @@ def status():
     return jsonify({
         "status": "active",
         "agent": "Cross-Sell Suggestion Agent",
-        "model": "gemini-2.5-flash",
+        "model": model_router.choose('recommend') if gemini_initialized else LOCAL_BACKEND,
         "gemini_initialized": gemini_initialized,
+        "router": model_router.stats(),
+        "rate_limiter": gemini_limiter.stats(),
+        "admission": admission.stats(),
+        "llm_backends": llm_registry.stats(),
+        "user_history": user_history.stats(),
         "version": "2.0-simplified",
         "timestamp": datetime.now().isoformat()
     }), 200
 
-@app.route('/api/search', methods=['POST'])
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return metrics.render(), 200, {'Content-Type': METRICS_CONTENT_TYPE}
+
+@app.route('/api/history', methods=['POST'])
+def record_history():
+    """
+    Record a product view or purchase for a user
+    
+    Expected JSON format:
+    {
+        "user_id": "u_123",
+        "product_id": "fakestore_1",
+        "event": "purchased"  (optional, "viewed" or "purchased", default "viewed")
+    }
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            data = {}
+        user_id, product_id = data.get('user_id'), data.get('product_id')
+        event = data.get('event', VIEWED)
+        if (not isinstance(user_id, str) or not user_id or len(user_id) > MAX_USER_ID_LENGTH
+                or not isinstance(product_id, str) or not product_id or event not in (VIEWED, PURCHASED)):
+            return jsonify({
+                "status": "error",
+                "message": (f"user_id (at most {MAX_USER_ID_LENGTH} characters) and product_id must be "
+                            "non-empty strings; event must be 'viewed' or 'purchased'"),
+                "timestamp": datetime.now().isoformat()
+            }), 400
+        
+        # Only catalog products are interned, so unauthenticated callers cannot grow the table at will
+        _, products = catalog_cache.get()
+        if not products or product_id not in products:
+            return jsonify({
+                "status": "error",
+                "message": f"Product not found: {product_id}",
+                "timestamp": datetime.now().isoformat()
+            }), 404
+        
+        recorded = user_history.record(user_id, product_id, event)
+        if not recorded:
+            logger.warning(f"History table full; dropped {event} event for {product_id}")
+        # Acknowledge with counts only: the endpoint is unauthenticated, so it must not reveal a user's history
+        return jsonify(OrderedDict([
+            ("status", "success"),
+            ("user_id", user_id),
+            ("event", event),
+            ("recorded", recorded),
+            ("viewed_count", len(user_history.recent(user_id, VIEWED))),
+            ("purchased_count", len(user_history.recent(user_id, PURCHASED))),
+            ("timestamp", datetime.now().isoformat())
+        ])), 200
+        
+    except Exception as e:
+        logger.error(f"Error in history endpoint: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e),
+            "timestamp": datetime.now().isoformat()
+        }), 500
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """
+    Readiness probe: loads the catalog and builds the LLM clients so the
+    first real request does not pay for either. 503 until a catalog loads;
+    LLM failures only degrade (requests fall back to local results).
+    """
+    started = time.perf_counter()
+    _, products = catalog_cache.get()
+    models = llm_registry.warm_up() if gemini_initialized else {}
+    is_ready = bool(products)
+    return jsonify(OrderedDict([
+        ("status", "ready" if is_ready else "not_ready"),
+        ("catalog_products", len(products or {})),
+        ("llm_models", models),
+        ("warmup_ms", round((time.perf_counter() - started) * 1000, 1)),
+        ("timestamp", datetime.now().isoformat())
+    ])), 200 if is_ready else 503
+
+@app.route('/api/search', methods=['GET', 'POST'])
 def search():
     """
     AI-powered product search using Gemini
     
-    Expected JSON format:
+    Expected JSON format (or the same fields as GET query parameters):
     {
         "query": "backpack",
         "limit": 10  (optional, default 10, max 20)
     }
     """
     try:
-        data = request.get_json()
+        data = request_params()
         
         if not data:
             return jsonify({
@@ -346,8 +775,17 @@ def search():
                 "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
             }), 400
         
-        query = data.get('query', '').strip()
+        query = data.get('query', '')
+        query = query.strip() if isinstance(query, str) else ''
         limit = data.get('limit', 10)
+        
+        # Validate limit (integers are clamped to 1-20)
+        if not isinstance(limit, int) or isinstance(limit, bool):
+            return jsonify({
+                "status": "error",
+                "message": "Limit must be an integer between 1 and 20",
+                "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+            }), 400
         limit = max(1, min(limit, 20))  # Limit between 1-20
         
         if not query:
@@ -359,22 +797,27 @@ def search():
         
         logger.info(f"AI search request: '{query}', limit: {limit}")
         
-        # Load products from products.json
-        products_file = os.path.join(os.path.dirname(__file__), 'products.json')
+        # Products from products.json, re-parsed only when the catalog version changes
+        _, all_products = catalog_cache.get()
         
-        if not os.path.exists(products_file):
+        if all_products is None:
             return jsonify({
                 "status": "error",
                 "message": "Products catalog not found",
                 "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
             }), 500
         
-        with open(products_file, 'r', encoding='utf-8') as f:
-            all_products = json.load(f)
-        
-        # Use Gemini AI for intelligent search
-        if gemini_initialized and gemini_model:
-            search_results = ai_search_products(query, all_products, limit)
+        # Use Gemini AI for intelligent search on the cheapest model meeting the search SLO
+        backend = model_router.choose('search') if gemini_initialized else LOCAL_BACKEND
+        if backend != LOCAL_BACKEND and not admission.admit():
+            # Overloaded: basic search answers immediately instead of queueing for the LLM
+            admission.record_shed(SHED_LOCAL)
+            backend = LOCAL_BACKEND
+        if backend != LOCAL_BACKEND:
+            try:
+                search_results = ai_search_products(query, all_products, limit, backend)
+            finally:
+                admission.release()
         else:
             # Fallback to basic search
             search_results = basic_search_products(query, all_products, limit)
@@ -389,7 +832,7 @@ def search():
         ])
         
         logger.info(f"Search for '{query}' returned {len(search_results)} results")
-        return jsonify(response), 200
+        return cacheable_response(response, 'search', {'X-CSSA-Backend': backend})
         
     except Exception as e:
         logger.error(f"Error in search endpoint: {e}")
@@ -399,10 +842,111 @@ def search():
             "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
         }), 500
 
-def ai_search_products(query: str, all_products: dict, limit: int) -> list:
+@app.route('/api/admin/products/<product_key>', methods=['PUT'])
+def admin_upsert_product(product_key):
+    """
+    Add or replace a single catalog product (admin only)
+    
+    Expected JSON format:
+    {
+        "name": "Desk Lamp",
+        "category": "lighting",
+        "price": 19.99,
+        "description": "optional", "image": "optional", "rating": 4.5
+    }
+    """
+    error = _admin_error()
+    if error:
+        return error
+    
+    try:
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({
+                "status": "error",
+                "message": "Request body must be valid JSON",
+                "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+            }), 400
+        
+        try:
+            record = make_product_record(product_key, data)
+        except ValueError as e:
+            return jsonify({
+                "status": "error",
+                "message": str(e),
+                "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+            }), 400
+        
+        with catalog_edit() as index:
+            started = time.perf_counter()
+            changed = index.upsert(product_key, record)
+            version = _save_catalog_edit(index)
+            # Includes rewriting the catalog file, not just the index update
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        logger.info(f"Admin upsert {product_key}: {len(changed)} cross-sell lists updated and saved in {elapsed_ms:.1f}ms")
+        return jsonify(OrderedDict([
+            ("status", "success"),
+            ("product_id", product_key),
+            ("cross_sell", index.products[product_key]['cross_sell']),
+            ("updated_lists", len(changed)),
+            ("elapsed_ms", round(elapsed_ms, 2)),
+            ("catalog_version", version),
+            ("timestamp", datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'))
+        ])), 200
+        
+    except Exception as e:
+        logger.error(f"Error in admin upsert endpoint: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e),
+            "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+        }), 500
+
+@app.route('/api/admin/products/<product_key>', methods=['DELETE'])
+def admin_delete_product(product_key):
+    """Remove a single catalog product and repair the lists that referenced it (admin only)"""
+    error = _admin_error()
+    if error:
+        return error
+    
+    try:
+        with catalog_edit() as index:
+            if product_key not in index.products:
+                return jsonify({
+                    "status": "error",
+                    "message": f"Product not found: {product_key}",
+                    "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+                }), 404
+            started = time.perf_counter()
+            changed = index.delete(product_key)
+            version = _save_catalog_edit(index)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        logger.info(f"Admin delete {product_key}: {len(changed)} cross-sell lists updated and saved in {elapsed_ms:.1f}ms")
+        return jsonify(OrderedDict([
+            ("status", "success"),
+            ("product_id", product_key),
+            ("updated_lists", len(changed)),
+            ("elapsed_ms", round(elapsed_ms, 2)),
+            ("catalog_version", version),
+            ("timestamp", datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'))
+        ])), 200
+        
+    except Exception as e:
+        logger.error(f"Error in admin delete endpoint: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e),
+            "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+        }), 500
+
+def ai_search_products(query: str, all_products: dict, limit: int, backend: Optional[str] = None) -> list:
     """Use Gemini AI to intelligently search and rank products"""
+    backend = backend or model_router.backends[0]
     
     # Build product catalog for Gemini
+    prompt_started = time.perf_counter()
     catalog_items = []
     for pid, product in list(all_products.items())[:100]:  # Limit to first 100 to avoid token limits
         catalog_items.append({
@@ -437,34 +981,12 @@ Return ONLY a JSON array with product_id values, ordered by relevance (most rele
 ["product_id_1", "product_id_2", "product_id_3"]
 
 Return exactly {limit} product IDs or fewer if less matches found. Output ONLY the JSON array, no explanations."""
+    record_stage('prompt_build', prompt_started)
     
     try:
-        logger.info(f"Querying Gemini for search: '{query}'")
-        response = gemini_model.generate_content(prompt)
-        response_text = response.text.strip()
-        
-        # Clean response
-        if response_text.startswith('```'):
-            lines = response_text.split('\n')
-            for i, line in enumerate(lines):
-                if line.strip().startswith('['):
-                    response_text = '\n'.join(lines[i:])
-                    break
-            if response_text.endswith('```'):
-                response_text = response_text[:-3].strip()
-        
-        # Parse JSON
-        import re
-        response_text = response_text.replace("'", '"')
-        response_text = re.sub(r',(\s*])', r'\1', response_text)
-        
-        try:
-            product_ids = json.loads(response_text)
-        except json.JSONDecodeError:
-            # Use json-repair
-            from json_repair import repair_json
-            repaired = repair_json(response_text)
-            product_ids = json.loads(repaired)
+        logger.info(f"Querying {backend} for search: '{query}'")
+        response = call_model(backend, prompt)
+        product_ids, _ = parse_model_json(response.text, '[', timed_stage)
         
         if not isinstance(product_ids, list):
             raise ValueError("Gemini did not return a list")
@@ -535,7 +1057,7 @@ if __name__ == '__main__':
         print("\n" + "="*60)
         print("Cross-Sell Suggestion Agent")
         print("="*60)
-        print("[OK] Gemini 2.5 Flash initialized")
+        print(f"[OK] Gemini models initialized: {', '.join(model_router.backends)}")
         print("[OK] Server starting on http://127.0.0.1:5000")
         print("[OK] Open http://127.0.0.1:5000 in your browser")
         print("="*60 + "\n")
@@ -4,9 +4,25 @@ Fetches from https://fakestoreapi.com/products and stores in PostgreSQL (or in-m
 """
 
 import requests
+import csv
 import json
 import os
 import logging
+import heapq
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+from cross_sell_scoring import CATEGORY_MAP, affinity, product_tokens, score_cross_sell_mappings
+from dedup import deduplicate_products
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -42,6 +58,21 @@ def load_from_dummyjson():
         logger.error(f"Failed to fetch from DummyJSON: {e}")
         return None
 
+def map_fake_store_item(p):
+    """Map a single Fake Store row to a (product_key, CSSA record) pair"""
+    rating = p.get('rating', {})
+    return f"fakestore_{p['id']}", {  # e.g., fakestore_1, fakestore_2
+        "id": p['id'],
+        "name": p['title'],
+        "category": p['category'],
+        "price": p['price'],
+        "description": (p.get('description') or '')[:150],  # Increased for better context
+        "image": p.get('image', ''),
+        "rating": rating.get('rate', 0) if isinstance(rating, dict) else rating,
+        "source": "fakestore",
+        "cross_sell": []  # Will be populated by recommendation logic
+    }
+
 def map_fake_store_to_cssa(products):
     """
     Transform Fake Store products into CSSA product format.
@@ -54,21 +85,25 @@ def map_fake_store_to_cssa(products):
         return mapped
     
     for p in products:
-        product_id = f"fakestore_{p['id']}"  # e.g., fakestore_1, fakestore_2
-        mapped[product_id] = {
-            "id": p['id'],
-            "name": p['title'],
-            "category": p['category'],
-            "price": p['price'],
-            "description": p.get('description', '')[:150],  # Increased for better context
-            "image": p.get('image', ''),
-            "rating": p.get('rating', {}).get('rate', 0),
-            "source": "fakestore",
-            "cross_sell": []  # Will be populated by recommendation logic
-        }
+        product_id, record = map_fake_store_item(p)
+        mapped[product_id] = record
     
     return mapped
 
+def map_dummyjson_item(p):
+    """Map a single DummyJSON row to a (product_key, CSSA record) pair"""
+    return f"dummyjson_{p['id']}", {
+        "id": p['id'],
+        "name": p.get('title', p.get('name', 'Unknown Product')),
+        "category": p.get('category', 'general'),
+        "price": p.get('price', 0),
+        "description": (p.get('description') or '')[:150],
+        "image": p.get('thumbnail', p.get('images', [''])[0] if p.get('images') else ''),
+        "rating": p.get('rating', 0),
+        "source": "dummyjson",
+        "cross_sell": []
+    }
+
 def map_dummyjson_to_cssa(products):
     """
     Transform DummyJSON products into CSSA product format.
@@ -80,41 +115,19 @@ def map_dummyjson_to_cssa(products):
         return mapped
     
     for p in products:
-        product_id = f"dummyjson_{p['id']}"
-        mapped[product_id] = {
-            "id": p['id'],
-            "name": p.get('title', p.get('name', 'Unknown Product')),
-            "category": p.get('category', 'general'),
-            "price": p.get('price', 0),
-            "description": p.get('description', '')[:150],
-            "image": p.get('thumbnail', p.get('images', [''])[0] if p.get('images') else ''),
-            "rating": p.get('rating', 0),
-            "source": "dummyjson",
-            "cross_sell": []
-        }
+        product_id, record = map_dummyjson_item(p)
+        mapped[product_id] = record
     
     return mapped
 
+# Row mappers used by the streaming ingestion path, keyed by source name
+ROW_MAPPERS = {
+    "fakestore": map_fake_store_item,
+    "dummyjson": map_dummyjson_item,
+}
+
 def generate_cross_sell_mappings(all_products):
     """Generate intelligent cross-sell mappings for all products"""
-    # Enhanced cross-sell logic with more category relationships
-    category_map = {
-        "men's clothing": ["women's clothing", "jewelery", "accessories"],
-        "women's clothing": ["men's clothing", "jewelery", "accessories"],
-        "electronics": ["accessories", "laptops", "smartphones"],
-        "jewelery": ["men's clothing", "women's clothing", "accessories"],
-        "accessories": ["electronics", "men's clothing", "women's clothing"],
-        "laptops": ["electronics", "accessories"],
-        "smartphones": ["electronics", "accessories"],
-        "furniture": ["home-decoration", "lighting"],
-        "home-decoration": ["furniture", "lighting"],
-        "fragrances": ["beauty", "skincare"],
-        "beauty": ["fragrances", "skincare"],
-        "skincare": ["beauty", "fragrances"],
-        "groceries": ["fragrances"],
-        "general": []  # Will match any category
-    }
-    
     for pid, product in all_products.items():
         cat = product['category'].lower()
         
@@ -125,7 +138,7 @@ def generate_cross_sell_mappings(all_products):
         ]
         
         # Second: related category products
-        related_cats = category_map.get(cat, [])
+        related_cats = CATEGORY_MAP.get(cat, [])
         related = [
             other_pid for other_pid, other in all_products.items()
             if other['category'].lower() in related_cats and other_pid != pid
@@ -157,14 +170,482 @@ def load_from_file(filepath='products.json'):
         logger.error(f"Failed to load from file: {e}")
     return None
 
+def version_file_path(filepath='products.json'):
+    """Path of the metadata file that records a catalog file's version"""
+    return f"{filepath}.version"
+
+def read_catalog_version(filepath='products.json'):
+    """Current version of a catalog file (0 if it has never been saved with a version)"""
+    try:
+        with open(version_file_path(filepath), 'r') as f:
+            return int(json.load(f).get('version', 0))
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def _fsync_directory(path):
+    """Flush a directory entry so a rename survives a crash (no-op where unsupported)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+@contextmanager
+def atomic_write(filepath, mode='w', encoding='utf-8'):
+    """
+    Write a file via a temp file in the same directory that is fsynced and
+    renamed over ``filepath`` only if the block completes. Readers see
+    either the old file or the new one, never a truncated one.
+    """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(filepath)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+        _fsync_directory(directory)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def write_catalog_entries(out, entries, chunk_size=1000):
+    """
+    Stream (product_key, record) pairs to ``out`` as one JSON object,
+    one product per line, buffering at most ``chunk_size`` entries.
+    
+    Returns:
+        Number of entries written
+    """
+    chunk_size = max(1, chunk_size)
+    count = 0
+    out.write('{')
+    chunk = []
+    for product_id, record in entries:
+        chunk.append(f"{json.dumps(product_id)}: {json.dumps(record)}")
+        if len(chunk) >= chunk_size:
+            out.write(('\n' if count == 0 else ',\n') + ',\n'.join(chunk))
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        out.write(('\n' if count == 0 else ',\n') + ',\n'.join(chunk))
+        count += len(chunk)
+    out.write('\n}\n')
+    return count
+
+_catalog_file_lock = threading.RLock()
+_held_lock_files = {}  # absolute catalog path -> [open lock file, re-entry depth]
+
+def lock_file_path(filepath='products.json'):
+    """Path of the file locked while a catalog file is read-modify-written"""
+    return f"{filepath}.lock"
+
+@contextmanager
+def catalog_lock(filepath='products.json'):
+    """
+    Hold an exclusive lock on a catalog file across threads and, where
+    fcntl is available, across processes (e.g. gunicorn workers). The lock
+    is re-entrant within a thread, so a holder can call save_to_file.
+    """
+    key = os.path.abspath(filepath)
+    with _catalog_file_lock:
+        held = _held_lock_files.get(key)
+        if held is None:
+            lock_file = open(lock_file_path(filepath), 'a')
+            if FCNTL_AVAILABLE:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            held = _held_lock_files[key] = [lock_file, 0]
+        held[1] += 1
+        try:
+            yield
+        finally:
+            held[1] -= 1
+            if held[1] == 0:
+                del _held_lock_files[key]
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(held[0].fileno(), fcntl.LOCK_UN)
+                held[0].close()
+
+def _bump_catalog_version(filepath, count):
+    """Record a new, strictly higher version for ``filepath`` and return it"""
+    with catalog_lock(filepath):
+        version = read_catalog_version(filepath) + 1
+        with atomic_write(version_file_path(filepath)) as f:
+            json.dump({
+                "version": version,
+                "count": count,
+                "updated_at": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+            }, f)
+    return version
+
 def save_to_file(products, filepath='products.json'):
-    """Save products to local JSON file"""
+    """
+    Atomically save products to a local JSON file and bump its version.
+    
+    Returns:
+        The new catalog version, or None if the save failed
+    """
     try:
-        with open(filepath, 'w') as f:
-            json.dump(products, f, indent=2)
-        logger.info(f"Saved {len(products)} products to {filepath}")
+        with catalog_lock(filepath):
+            with atomic_write(filepath) as f:
+                write_catalog_entries(f, products.items())
+            version = _bump_catalog_version(filepath, len(products))
+        logger.info(f"Saved {len(products)} products to {filepath} (version {version})")
+        return version
     except Exception as e:
         logger.error(f"Failed to save to file: {e}")
+        return None
+
+class CatalogCache:
+    """
+    In-memory copy of a catalog file keyed on its version, so readers only
+    re-parse the file when a writer has published a new version.
+    """
+    
+    def __init__(self, filepath='products.json'):
+        self.filepath = filepath
+        self.version = None
+        self.products = None
+        self._lock = threading.Lock()
+    
+    def get(self):
+        """Return (version, products), reloading only if the on-disk version changed"""
+        version = read_catalog_version(self.filepath)
+        if version == self.version and self.products is not None:
+            return self.version, self.products
+        with self._lock:
+            if version != self.version or self.products is None:
+                # Version is read before the data, so a racing writer can only
+                # make us re-parse once more, never serve stale data forever
+                products = load_from_file(self.filepath)
+                if products is None:
+                    return version, None
+                self.version, self.products = version, products
+            return self.version, self.products
+    
+    def publish(self, products, version):
+        """Install a catalog this process just saved, skipping the re-parse"""
+        with self._lock:
+            if self.version is None or version is None or version >= self.version:
+                self.version, self.products = version, products
+
+# ============================================================================
+# STREAMING INGESTION (large local catalog dumps)
+# ============================================================================
+
+def _coerce_csv_value(value):
+    """Turn a CSV cell into an int/float where it looks numeric"""
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+def _normalize_csv_row(row):
+    """
+    Normalize a flat CSV row into the nested shape the API mappers expect.
+    Numeric-looking cells become numbers, empty cells are dropped and dotted
+    columns such as "rating.rate" are folded into nested dicts.
+    """
+    normalized = {}
+    for column, value in row.items():
+        if column is None:
+            continue  # Extra cells without a header
+        value = value if column in ('title', 'name', 'description', 'category') else _coerce_csv_value(value)
+        if value is None or value == '':
+            continue
+        if '.' in column:
+            parent, child = column.split('.', 1)
+            normalized.setdefault(parent, {})[child] = value
+        else:
+            normalized[column] = value
+    return normalized
+
+def iter_ndjson(filepath):
+    """Yield one product dict per line of an NDJSON file, skipping bad lines"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping malformed NDJSON line {line_no} in {filepath}: {e}")
+
+def iter_csv(filepath):
+    """Yield one product dict per CSV row"""
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            yield _normalize_csv_row(row)
+
+def iter_catalog_dump(filepath, fmt=None):
+    """Yield raw product rows from an NDJSON or CSV dump (format from extension if not given)"""
+    if fmt is None:
+        ext = os.path.splitext(filepath)[1].lower()
+        fmt = 'csv' if ext == '.csv' else 'ndjson'
+    if fmt == 'csv':
+        return iter_csv(filepath)
+    if fmt in ('ndjson', 'jsonl'):
+        return iter_ndjson(filepath)
+    raise ValueError(f"Unsupported catalog dump format: {fmt}")
+
+def iter_mapped_products(rows, source='fakestore'):
+    """Map raw rows through the source's row mapper, skipping rows that don't fit"""
+    mapper = ROW_MAPPERS.get(source)
+    if mapper is None:
+        raise ValueError(f"Unknown product source: {source}")
+    
+    for row in rows:
+        try:
+            yield mapper(row)
+        except (KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Skipping {source} row that could not be mapped: {e!r}")
+
+def stream_ingest(input_path, output_path='products.json', source='fakestore', fmt=None, chunk_size=1000):
+    """
+    Stream a local NDJSON/CSV catalog dump into a CSSA products file.
+    
+    Rows are read, mapped and written in chunks of ``chunk_size`` entries, so
+    peak memory is bounded by the chunk size rather than the size of the dump.
+    The output is the same JSON object layout as products.json and replaces
+    it atomically; cross_sell lists are left empty for an offline stage to
+    fill in.
+    
+    Returns:
+        Number of products written
+    """
+    rows = iter_catalog_dump(input_path, fmt)
+    
+    with atomic_write(output_path) as out:
+        count = write_catalog_entries(out, iter_mapped_products(rows, source), chunk_size)
+    _bump_catalog_version(output_path, count)
+    
+    logger.info(f"Streamed {count} {source} products from {input_path} to {output_path}")
+    return count
+
+# ============================================================================
+# INCREMENTAL CROSS-SELL MAINTENANCE (single product upserts/deletes)
+# ============================================================================
+
+def make_product_record(product_key, data):
+    """
+    Build a CSSA product record from an admin payload.
+    Requires name, category and price; id/source default to the parts of the
+    key (e.g. "fakestore_21" -> source "fakestore", id 21).
+    
+    Raises:
+        ValueError: The payload is not an object, misses a required field or
+            has a field of the wrong type
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Product must be a JSON object")
+    missing = [field for field in ('name', 'category', 'price') if data.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing required product field(s): {', '.join(missing)}")
+    not_strings = [field for field in ('name', 'category', 'description', 'image', 'source')
+                   if data.get(field) is not None and not isinstance(data[field], str)]
+    if not_strings:
+        raise ValueError(f"Product field(s) must be strings: {', '.join(not_strings)}")
+    rating = data.get('rating', 0)
+    if isinstance(data['price'], bool) or (rating is not None and (isinstance(rating, bool)
+                                                                   or not isinstance(rating, (int, float)))):
+        raise ValueError("Product price and rating must be numbers")
+    try:
+        price = float(data['price'])
+    except (TypeError, ValueError):
+        raise ValueError("Product price must be a number")
+    
+    source, _, raw_id = product_key.rpartition('_')
+    return {
+        "id": data.get('id', int(raw_id) if raw_id.isdigit() else raw_id),
+        "name": data['name'],
+        "category": data['category'],
+        "price": price,
+        "description": (data.get('description') or '')[:150],
+        "image": data.get('image') or '',
+        "rating": rating,
+        "source": data.get('source') or source or 'custom',
+        "cross_sell": []
+    }
+
+class CrossSellIndex:
+    """
+    Keeps cross_sell lists up to date as single products are added, changed
+    or removed, without re-scoring the whole catalog.
+    
+    Products are bucketed by category, and a reverse index records which
+    cross_sell lists contain each product. An edit only re-scores the
+    buckets that can hold the product plus the lists that referenced it.
+    
+    An upsert still computes one affinity per product in those buckets, so
+    its cost grows with the size of the related categories. To keep that
+    bounded, the new product is offered to at most ``max_list_updates``
+    lists: the ones it has the highest affinity with. Other lists pick it
+    up the next time they are re-scored.
+    """
+    
+    def __init__(self, all_products, top_k=15, fill_pool_size=60, max_list_updates=1000):
+        self.products = all_products
+        self.top_k = top_k
+        self.fill_pool_size = fill_pool_size
+        self.max_list_updates = max_list_updates
+        self.by_category = defaultdict(set)
+        self.contained_in = defaultdict(set)
+        self._tokens = {}
+        self._scores = {}  # product key -> scores aligned with its cross_sell list
+        
+        for pid, product in all_products.items():
+            self.by_category[self._category(product)].add(pid)
+            for other in product.get('cross_sell', []):
+                self.contained_in[other].add(pid)
+        
+        # Categories whose candidate sets include a given category
+        self._reverse_related = defaultdict(set)
+        for cat, related in CATEGORY_MAP.items():
+            for other_cat in related:
+                self._reverse_related[other_cat].add(cat)
+        
+        self._fill_pool = heapq.nlargest(fill_pool_size, all_products, key=self._rating)
+    
+    @staticmethod
+    def _category(product):
+        return (product.get('category') or 'general').lower()
+    
+    def _rating(self, pid):
+        try:
+            return float(self.products[pid].get('rating') or 0)
+        except (TypeError, ValueError):
+            return 0.0
+    
+    def _product_tokens(self, pid):
+        tokens = self._tokens.get(pid)
+        if tokens is None:
+            tokens = self._tokens[pid] = product_tokens(self.products[pid])
+        return tokens
+    
+    def _affinity(self, pid, other):
+        return affinity(self.products[pid], self.products[other],
+                        self._product_tokens(pid), self._product_tokens(other))
+    
+    def _candidates(self, pid):
+        """Products that may appear in pid's cross_sell list"""
+        cat = self._category(self.products[pid])
+        candidates = set(self.by_category.get(cat, ()))
+        for related in CATEGORY_MAP.get(cat, ()):
+            candidates |= self.by_category.get(related, set())
+        if len(candidates) - 1 < self.top_k:
+            candidates.update(self._fill_pool)
+        candidates.discard(pid)
+        return candidates
+    
+    def _affected_by(self, pid):
+        """Products whose candidate sets contain pid's category"""
+        cat = self._category(self.products[pid])
+        affected = set(self.by_category.get(cat, ()))
+        for other_cat in self._reverse_related.get(cat, ()):
+            affected |= self.by_category.get(other_cat, set())
+        affected.discard(pid)
+        return affected
+    
+    def _set_list(self, pid, ranked):
+        """Replace pid's cross_sell list, keeping the reverse index in sync"""
+        product = self.products[pid]
+        for other in product.get('cross_sell', []):
+            self.contained_in[other].discard(pid)
+        # Copy on write: a published snapshot may share the old record with readers
+        product = self.products[pid] = dict(product, cross_sell=[other for _, other in ranked])
+        self._scores[pid] = [score for score, _ in ranked]
+        for other in product['cross_sell']:
+            self.contained_in[other].add(pid)
+    
+    def _rescore(self, pid):
+        ranked = heapq.nlargest(self.top_k, ((self._affinity(pid, other), other) for other in self._candidates(pid)),
+                                key=lambda item: item[0])
+        self._set_list(pid, ranked)
+    
+    def _list_scores(self, pid):
+        scores = self._scores.get(pid)
+        if scores is None:
+            scores = self._scores[pid] = [self._affinity(pid, other) for other in self.products[pid]['cross_sell']]
+        return scores
+    
+    def upsert(self, pid, record):
+        """
+        Add or replace one product and update only the affected cross_sell lists.
+        
+        Returns:
+            Set of product keys whose cross_sell lists changed
+        """
+        if pid in self.products:
+            changed = self.delete(pid)
+        else:
+            changed = set()
+        
+        record = dict(record, cross_sell=[])
+        self.products[pid] = record
+        self.by_category[self._category(record)].add(pid)
+        self._tokens.pop(pid, None)
+        self._rescore(pid)
+        changed.add(pid)
+        
+        if len(self._fill_pool) < self.fill_pool_size or self._rating(pid) > min(map(self._rating, self._fill_pool)):
+            self._fill_pool = heapq.nlargest(self.fill_pool_size, self._fill_pool + [pid], key=self._rating)
+        
+        # Offer the new product to the lists that could contain it, best matches first
+        offers = heapq.nlargest(self.max_list_updates, ((self._affinity(other, pid), other)
+                                                        for other in self._affected_by(pid)),
+                                key=lambda item: item[0])
+        for score, other in offers:
+            cross_sell = self.products[other]['cross_sell']
+            scores = self._list_scores(other)
+            if len(cross_sell) >= self.top_k and score <= min(scores):
+                continue
+            ranked = sorted(zip(scores + [score], cross_sell + [pid]), key=lambda item: item[0], reverse=True)
+            self._set_list(other, ranked[:self.top_k])
+            changed.add(other)
+        
+        return changed
+    
+    def delete(self, pid):
+        """
+        Remove one product and refill the cross_sell lists that referenced it.
+        
+        Returns:
+            Set of product keys whose cross_sell lists changed
+        """
+        product = self.products.get(pid)
+        if product is None:
+            raise KeyError(pid)
+        
+        for other in product.get('cross_sell', []):
+            self.contained_in[other].discard(pid)
+        self.by_category[self._category(product)].discard(pid)
+        del self.products[pid]
+        self._tokens.pop(pid, None)
+        self._scores.pop(pid, None)
+        if pid in self._fill_pool:
+            self._fill_pool = heapq.nlargest(self.fill_pool_size, self.products, key=self._rating)
+        
+        referencing = self.contained_in.pop(pid, set())
+        for other in referencing:
+            if other in self.products:
+                self._rescore(other)
+        return referencing
 
 def load_and_cache():
     """Main function: fetch from multiple APIs, merge, and cache locally"""
@@ -185,8 +666,11 @@ def load_and_cache():
         logger.info(f"✓ Added {len(mapped_dummyjson)} products from DummyJSON API")
     
     if all_products:
-        # Generate intelligent cross-sell mappings
-        all_products = generate_cross_sell_mappings(all_products)
+        # Collapse items that appear in both sources before spending cross-sell slots on them
+        all_products = deduplicate_products(all_products)
+        
+        # Score cross-sell candidates by affinity and keep the top 15 per product
+        all_products = score_cross_sell_mappings(all_products)
         save_to_file(all_products, 'products.json')
         logger.info(f"✓ Total {len(all_products)} products loaded and cached locally")
         return all_products
@@ -202,6 +686,29 @@ def load_and_cache():
     return {}
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Load and cache the CSSA product catalog")
+    parser.add_argument('--ingest', metavar='PATH', help="Stream a local NDJSON/CSV dump instead of calling the APIs")
+    parser.add_argument('--source', default='fakestore', choices=sorted(ROW_MAPPERS), help="Row layout of the dump")
+    parser.add_argument('--format', dest='fmt', choices=['ndjson', 'csv'], help="Dump format (default: from extension)")
+    parser.add_argument('--output', default='products.json', help="Output catalog file")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="Products written per chunk")
+    parser.add_argument('--score', action='store_true', help="Score cross-sell lists for the catalog at --output")
+    parser.add_argument('--workers', type=int, default=None, help="Scoring processes (default: CPU count)")
+    args = parser.parse_args()
+    
+    if args.ingest or args.score:
+        if args.ingest:
+            written = stream_ingest(args.ingest, args.output, args.source, args.fmt, args.chunk_size)
+            print(f"\nIngested {written} products into {args.output}")
+        if args.score:
+            catalog = load_from_file(args.output) or {}
+            score_cross_sell_mappings(catalog, workers=args.workers, min_parallel_products=0)
+            save_to_file(catalog, args.output)
+            print(f"\nScored cross-sell lists for {len(catalog)} products in {args.output}")
+        raise SystemExit(0)
+    
     products = load_and_cache()
     print(f"\nLoaded {len(products)} products:")
     
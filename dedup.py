@@ -0,0 +1,187 @@
+"""
+Cross-source duplicate detection for the CSSA catalog.
+
+The same physical item can arrive as both fakestore_N and dummyjson_M. This
+module finds such near-duplicates with MinHash signatures over normalized
+titles, bucketed by LSH bands and price bands, so the work stays roughly
+linear in catalog size instead of comparing every pair.
+"""
+
+import logging
+import math
+import random
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Mersenne prime used for the universal hash family (a * x + b) mod P
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_title(title: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    title = unicodedata.normalize('NFKD', title or '').encode('ascii', 'ignore').decode('ascii')
+    return _NON_ALNUM.sub(' ', title.lower()).strip()
+
+
+def title_shingles(title: str, size: int = 3) -> set:
+    """Character n-gram shingles of a normalized title, hashed to 32-bit ints"""
+    text = normalize_title(title)
+    if len(text) <= size:
+        return {zlib.crc32(text.encode('utf-8'))} if text else set()
+    return {zlib.crc32(text[i:i + size].encode('utf-8')) for i in range(len(text) - size + 1)}
+
+
+def price_band(price, tolerance: float = 0.15) -> int:
+    """Logarithmic price bucket; neighbouring bands differ by roughly ``tolerance``"""
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        return -1
+    if price <= 0:
+        return -1
+    return int(math.floor(math.log(price) / math.log1p(tolerance)))
+
+
+class MinHasher:
+    """MinHash signatures using a seeded universal hash family"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._coeffs = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, shingles: set) -> tuple:
+        """Signature of a shingle set (empty sets get an all-max signature)"""
+        if not shingles:
+            return (_MAX_HASH,) * self.num_perm
+        return tuple(
+            min(((a * x + b) % _MERSENNE_PRIME) & _MAX_HASH for x in shingles)
+            for a, b in self._coeffs
+        )
+
+    @staticmethod
+    def similarity(sig_a: tuple, sig_b: tuple) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+def find_duplicate_groups(products: Dict[str, Dict],
+                          threshold: float = 0.7,
+                          price_tolerance: float = 0.15,
+                          num_perm: int = 64,
+                          bands: int = 16) -> List[List[str]]:
+    """
+    Group product keys that look like the same physical item.
+
+    Candidates come from LSH buckets keyed by (band, band hash, price band),
+    checking the neighbouring price bands too; they are then confirmed by
+    estimated title similarity and actual price ratio.
+
+    Returns:
+        Groups of two or more keys, each in catalog order
+    """
+    rows = num_perm // bands
+    hasher = MinHasher(num_perm=bands * rows)
+    keys = list(products.keys())
+    signatures = []
+    prices = []
+    buckets = defaultdict(list)
+    parent = list(range(len(keys)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for idx, key in enumerate(keys):
+        product = products[key]
+        sig = hasher.signature(title_shingles(product.get('name', '')))
+        signatures.append(sig)
+        try:
+            price = float(product.get('price') or 0)
+        except (TypeError, ValueError):
+            price = 0.0
+        prices.append(price)
+        pband = price_band(price, price_tolerance)
+
+        checked = set()
+        for band in range(bands):
+            band_key = (band, hash(sig[band * rows:(band + 1) * rows]))
+            for neighbour in (pband - 1, pband, pband + 1):
+                for other in buckets.get(band_key + (neighbour,), ()):
+                    if other in checked:
+                        continue
+                    checked.add(other)
+                    if products[keys[other]].get('source') == product.get('source'):
+                        continue  # Duplicates are a cross-source problem
+                    if not _prices_match(price, prices[other], price_tolerance):
+                        continue
+                    if MinHasher.similarity(sig, signatures[other]) >= threshold:
+                        parent[find(idx)] = find(other)
+            buckets[band_key + (pband,)].append(idx)
+
+    groups = defaultdict(list)
+    for idx in range(len(keys)):
+        groups[find(idx)].append(keys[idx])
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def _prices_match(a: float, b: float, tolerance: float) -> bool:
+    """True if two prices are within ``tolerance`` of each other (relative)"""
+    if a <= 0 or b <= 0:
+        return a == b
+    return min(a, b) / max(a, b) >= 1 - tolerance
+
+
+def deduplicate_products(products: Dict[str, Dict],
+                         threshold: float = 0.7,
+                         price_tolerance: float = 0.15,
+                         alias_map: Optional[Dict[str, str]] = None) -> Dict[str, Dict]:
+    """
+    Collapse cross-source near-duplicates into one canonical record.
+
+    The first key of each group (catalog order) is kept; the others are
+    dropped from the catalog and listed in the canonical record's
+    ``aliases`` field. If ``alias_map`` is given it is filled with
+    alias -> canonical key entries.
+
+    Returns:
+        A new catalog dict without the duplicate records
+    """
+    groups = find_duplicate_groups(products, threshold, price_tolerance)
+    if not groups:
+        return products
+
+    dropped = set()
+    deduped_aliases = {}
+    for group in groups:
+        canonical, aliases = group[0], group[1:]
+        deduped_aliases[canonical] = aliases
+        dropped.update(aliases)
+        if alias_map is not None:
+            for alias in aliases:
+                alias_map[alias] = canonical
+
+    deduped = {}
+    for key, product in products.items():
+        if key in dropped:
+            continue
+        if key in deduped_aliases:
+            product = dict(product)
+            product['aliases'] = sorted(set(product.get('aliases', [])) | set(deduped_aliases[key]))
+        deduped[key] = product
+
+    logger.info(f"Deduplicated {len(dropped)} cross-source products into {len(groups)} canonical records")
+    return deduped
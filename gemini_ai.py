@@ -2,68 +2,225 @@
 Google Gemini AI Integration for Enhanced Product Recommendations
 """
 
-import os
 import logging
 import json
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Optional
 
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+from cross_sell_scoring import CATEGORY_MAP, affinity
+from llm_backend import BACKEND_GEMINI, GEMINI_AVAILABLE, backend_kind, llm_registry
+from rate_limiter import PRIORITY_INTERACTIVE, estimate_tokens, gemini_limiter
+from user_history import PURCHASED, VIEWED, UserHistoryStore, user_history
+
+if not GEMINI_AVAILABLE:
     logging.warning("google-generativeai not installed. AI recommendations disabled.")
 
 logger = logging.getLogger(__name__)
 
+# Use Gemini 2.0 Flash for faster, more efficient responses
+ENGINE_MODEL = 'gemini-2.0-flash-exp'
+
+# Catalog products offered to the model per request
+MAX_PROMPT_CATALOG = 70
+MAX_PROMPT_ITEMS_PER_CATEGORY = 15
+
+# Locally pre-ranked candidates sent to the model, and how many products per
+# category bucket are scanned when topping up a short cross_sell list
+MAX_RANKED_CANDIDATES = 20
+MAX_CATEGORY_SCAN = 200
+
+# Score added to a candidate the user viewed recently (newest view gets the full boost)
+HISTORY_VIEW_BOOST = 0.5
+
+# (main product, recommended product) reasons kept in memory
+REASON_CACHE_SIZE = 4096
+
+# Prompt templates. The catalog prefix only changes with the catalog version,
+# so it is rendered once and reused; per-request parts are filled in and joined.
+_CATALOG_PREFIX_TEMPLATE = """You are an expert e-commerce AI recommending complementary products.
+
+PRODUCT CATALOG:{catalog_text}
+"""
+
+_CATALOG_CATEGORY_TEMPLATE = "\n{category}:\n"
+_CATALOG_LINE_TEMPLATE = "  • {product_id}: {name} - ${price}\n"
+
+_RANKED_PROMPT_TEMPLATE = """You are an expert e-commerce recommendation system. A customer{user_context} is viewing the following product:
+
+Product: {name}
+Category: {category}
+Price: ${price}
+Description: {description}
+
+Based on this product, rank and select the top {limit} cross-sell recommendations from the following candidates. For each recommendation, provide:
+1. The product ID
+2. A brief, compelling reason why it complements the main product (max 15 words)
+3. A confidence score (0-1)
+
+Candidate Products (pre-ranked, best first):
+{candidate_lines}
+
+Return your response as a JSON array with exactly {limit} items in this format:
+[
+  {{
+    "product_id": "id_here",
+    "reason": "Brief compelling reason here",
+    "confidence_score": 0.85
+  }}
+]
+
+Important: Return ONLY the JSON array, no additional text."""
+
+_CANDIDATE_LINE_TEMPLATE = "{rank}. ID: {product_id}, Name: {name}, Category: {category}, Price: ${price}"
+
+_CURRENT_PRODUCT_TEMPLATE = """
+CURRENT PRODUCT{user_context}:
+Name: {name}
+Category: {category}
+Price: ${price}
+Description: {description}
+"""
+
+_TASK_TEMPLATE = """
+TASK: Recommend exactly {limit} products from the catalog that:
+1. Complement or enhance the current product
+2. Make logical sense together (e.g., accessories, related items, upgrades)
+3. Are relevant to the product category
+4. Provide real value to the customer
+
+RULES:
+- Use ONLY product_id values from the catalog above
+- Never recommend the current product itself
+- Provide compelling, specific reasons (10-15 words)
+- Confidence score: 0.70-0.95 (higher = stronger recommendation)
+- Prioritize different categories when logical
+
+OUTPUT FORMAT (JSON only, no markdown):
+[
+  {{
+    "product_id": "exact_id_from_catalog",
+    "reason": "Specific compelling reason why this complements the main product",
+    "confidence_score": 0.85
+  }}
+]
+
+Return ONLY valid JSON array with {limit} items. No markdown, no explanations."""
+
 
 class GeminiRecommendationEngine:
     """Enhanced recommendation engine using Google Gemini AI"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, history: Optional[UserHistoryStore] = None):
         """
         Initialize Gemini AI engine
         
         Args:
             api_key: Google Gemini API key. If None, will try to load from GEMINI_API_KEY env variable
+            history: Per-user history used for ranking (default: the shared store)
         """
         self.enabled = False
-        self.model = None
+        self._model = None
+        self.history = history if history is not None else user_history
+        
+        # Catalog indexes, rebuilt only when the catalog version changes
+        self._catalog_token = None
+        self._by_key = {}
+        self._by_source_id = {}
+        self._by_category = {}
+        self._prompt_candidates = []
+        self._catalog_lines = {}
+        self._catalog_prefix = None
         
-        if not GEMINI_AVAILABLE:
+        # LRU cache of generated reasons per (main, recommended) pair
+        self._reason_cache = OrderedDict()
+        self._reason_lock = threading.Lock()
+        
+        if backend_kind() == BACKEND_GEMINI and not GEMINI_AVAILABLE:
             logger.warning("Gemini AI not available - google-generativeai package not installed")
             return
         
-        # Get API key from parameter or environment
-        api_key = api_key or os.getenv('GEMINI_API_KEY')
-        
-        if not api_key:
+        if api_key:
+            llm_registry.api_key = api_key
+        if not llm_registry.available():
             logger.warning("Gemini API key not provided. Set GEMINI_API_KEY environment variable to enable AI recommendations")
             return
         
-        try:
-            genai.configure(api_key=api_key)
-            # Use Gemini 2.0 Flash for faster, more efficient responses
-            self.model = genai.GenerativeModel(
-                'gemini-2.0-flash-exp',
-                generation_config={
-                    'temperature': 0.7,
-                    'top_p': 0.95,
-                    'top_k': 40,
-                    'max_output_tokens': 2048,
-                }
-            )
-            self.enabled = True
-            logger.info("[OK] Gemini 2.0 Flash initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize Gemini AI: {e}")
-            self.enabled = False
+        # Shared with cssa_agent's router; the client is built on first use
+        llm_registry.register(ENGINE_MODEL)
+        self.enabled = True
+    
+    @property
+    def model(self):
+        """The engine's LLM backend, built lazily from the shared registry"""
+        if self._model is None and self.enabled:
+            self._model = llm_registry.get(ENGINE_MODEL)
+        return self._model
+    
+    @model.setter
+    def model(self, backend):
+        self._model = backend
+    
+    def _generate(self, prompt: str, priority: int = PRIORITY_INTERACTIVE):
+        """Query the model through the shared outbound rate limiter"""
+        return gemini_limiter.call(lambda: self.model.generate_content(prompt),
+                                   tokens=estimate_tokens(prompt), priority=priority)
+    
+    def build_indexes(self, all_products: Dict[str, Dict], catalog_version=None):
+        """
+        Index the catalog by key, by (source, id) and by category, and cache
+        the candidate items offered to the model.
+        
+        Args:
+            all_products: Complete product catalog dictionary
+            catalog_version: Version of the catalog (see data_loader.CatalogCache).
+                If None, the indexes are used for this call only and rebuilt on the next.
+        """
+        self._catalog_token = catalog_version
+        self._by_key = all_products
+        self._by_source_id = {}
+        self._by_category = {}
+        for pid, prod in all_products.items():
+            self._by_source_id[(prod.get('source'), prod.get('id'))] = pid
+            self._by_category.setdefault(prod.get('category'), []).append(pid)
+        
+        self._catalog_lines = {}
+        self._catalog_prefix = None
+        self._prompt_candidates = []
+        for pid, prod in all_products.items():
+            if len(self._prompt_candidates) >= MAX_PROMPT_CATALOG:
+                break
+            self._prompt_candidates.append({
+                'product_id': pid,
+                'name': prod['name'],
+                'category': prod['category'],
+                'price': prod['price'],
+                'description': prod.get('description', '')[:120]
+            })
+        logger.info(f"Indexed {len(all_products)} catalog products ({len(self._by_category)} categories)")
+    
+    def _ensure_indexes(self, all_products: Dict[str, Dict], catalog_version=None):
+        # Only a catalog version identifies a catalog; id() can be reused once a dict is freed
+        if catalog_version is None or catalog_version != self._catalog_token:
+            self.build_indexes(all_products, catalog_version)
+    
+    def find_product_key(self, product: Dict) -> Optional[str]:
+        """Catalog key of a product dict, matched on (source, id) so overlapping IDs don't collide"""
+        key = product.get('product_id')
+        if key in self._by_key:
+            return key
+        return self._by_source_id.get((product.get('source'), product.get('id')))
+    
+    def products_in_category(self, category: str) -> List[str]:
+        """Catalog keys of all products in a category"""
+        return self._by_category.get(category, [])
     
     def generate_recommendations_from_catalog(self, 
                                               product: Dict, 
                                               all_products: Dict[str, Dict],
                                               limit: int = 5,
-                                              user_id: Optional[str] = None) -> List[Dict]:
+                                              user_id: Optional[str] = None,
+                                              catalog_version=None) -> List[Dict]:
         """
         Pure Gemini 2.0 Flash recommendations - NO fallback, NO dummy data.
         
@@ -72,6 +229,8 @@ class GeminiRecommendationEngine:
             all_products: Complete product catalog dictionary
             limit: Number of recommendations (max 5)
             user_id: Optional user identifier for personalization
+            catalog_version: Catalog version from data_loader.CatalogCache, so indexes
+                are reused across requests (without it they are rebuilt every call)
             
         Returns:
             List of AI-generated recommendations with reasons
@@ -83,37 +242,34 @@ class GeminiRecommendationEngine:
         limit = min(limit, 5)
         
         try:
-            # Get current product ID to exclude
-            current_product_id = None
-            for pid, prod in all_products.items():
-                if prod.get('id') == product.get('id'):
-                    current_product_id = pid
-                    break
-            
-            # Build catalog excluding current product
-            catalog_items = []
-            for pid, prod in all_products.items():
-                if pid != current_product_id and len(catalog_items) < 70:
-                    catalog_items.append({
-                        'product_id': pid,
-                        'name': prod['name'],
-                        'category': prod['category'],
-                        'price': prod['price'],
-                        'description': prod.get('description', '')[:120]
-                    })
+            self._ensure_indexes(all_products, catalog_version)
             
-            if not catalog_items:
-                raise Exception("No products available in catalog for recommendations")
+            # Get current product key to exclude
+            current_product_id = self.find_product_key(product)
+            if user_id and current_product_id:
+                self.history.record(user_id, current_product_id, VIEWED)
             
-            # Build optimized prompt for Gemini 2.0 Flash
-            prompt = self._build_gemini_prompt(product, catalog_items, limit, user_id)
+            # Rank candidates locally from cross_sell lists, category affinity and
+            # the user's history; fall back to the cached catalog when nothing can be ranked
+            candidates = self.rank_candidates(product, current_product_id, user_id=user_id)
+            if candidates:
+                prompt = self._build_recommendation_prompt(product, candidates, limit, user_id)
+            else:
+                # Cached catalog; the current product is dropped from the model's answer instead
+                catalog_items = self._prompt_candidates
+                if not catalog_items or [item['product_id'] for item in catalog_items] == [current_product_id]:
+                    raise Exception("No products available in catalog for recommendations")
+                prompt = self._build_gemini_prompt(product, catalog_items, limit, user_id)
             
             # Query Gemini 2.0 Flash
             logger.info(f"Querying Gemini 2.0 Flash for {limit} recommendations (user: {user_id or 'anonymous'})")
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt)
             
             # Parse and validate JSON response
-            recommendations = self._parse_gemini_response(response.text, all_products)
+            recommendations = [
+                rec for rec in self._parse_gemini_response(response.text, all_products)
+                if rec['product_id'] != current_product_id
+            ]
             
             if not recommendations:
                 raise Exception("Gemini returned no valid recommendations")
@@ -125,58 +281,49 @@ class GeminiRecommendationEngine:
             logger.error(f"Gemini recommendation failed: {e}")
             raise
     
-    def _build_gemini_prompt(self, product: Dict, catalog: List[Dict], limit: int, user_id: Optional[str]) -> str:
-        """Build optimized prompt for Gemini 2.0 Flash"""
-        
-        # Group products by category for better context
-        from collections import defaultdict
-        by_category = defaultdict(list)
+    def _catalog_line(self, item: Dict) -> str:
+        """Rendered catalog line for one product, cached per catalog version"""
+        line = self._catalog_lines.get(item['product_id'])
+        if line is None:
+            line = self._catalog_lines[item['product_id']] = _CATALOG_LINE_TEMPLATE.format(
+                product_id=item['product_id'], name=item['name'][:55], price=item['price']
+            )
+        return line
+    
+    def _render_catalog_prefix(self, catalog: List[Dict]) -> str:
+        """Render the static prompt prefix: role plus the catalog grouped by category"""
+        by_category = {}
         for item in catalog:
-            by_category[item['category']].append(item)
+            by_category.setdefault(item['category'], []).append(item)
         
-        catalog_text = ""
-        for category in sorted(by_category.keys()):
-            items = by_category[category][:15]  # Limit per category
-            catalog_text += f"\n{category.upper()}:\n"
-            for item in items:
-                catalog_text += f"  • {item['product_id']}: {item['name'][:55]} - ${item['price']}\n"
+        parts = []
+        for category in sorted(by_category):
+            parts.append(_CATALOG_CATEGORY_TEMPLATE.format(category=category.upper()))
+            parts.extend(self._catalog_line(item) for item in by_category[category][:MAX_PROMPT_ITEMS_PER_CATEGORY])
+        return _CATALOG_PREFIX_TEMPLATE.format(catalog_text=''.join(parts))
+    
+    def _build_gemini_prompt(self, product: Dict, catalog: List[Dict], limit: int, user_id: Optional[str]) -> str:
+        """Build optimized prompt for Gemini 2.0 Flash"""
         
-        user_context = f" for user {user_id}" if user_id else ""
+        # The engine's own candidate list is rendered once per catalog version
+        if catalog is self._prompt_candidates:
+            if self._catalog_prefix is None:
+                self._catalog_prefix = self._render_catalog_prefix(catalog)
+            prefix = self._catalog_prefix
+        else:
+            prefix = self._render_catalog_prefix(catalog)
         
-        prompt = f"""You are an expert e-commerce AI recommending complementary products{user_context}.
-
-CURRENT PRODUCT:
-Name: {product['name']}
-Category: {product['category']}
-Price: ${product['price']}
-Description: {product.get('description', 'N/A')[:180]}
-
-PRODUCT CATALOG:{catalog_text}
-
-TASK: Recommend exactly {limit} products from the catalog that:
-1. Complement or enhance the current product
-2. Make logical sense together (e.g., accessories, related items, upgrades)
-3. Are relevant to the product category
-4. Provide real value to the customer
-
-RULES:
-- Use ONLY product_id values from the catalog above
-- Provide compelling, specific reasons (10-15 words)
-- Confidence score: 0.70-0.95 (higher = stronger recommendation)
-- Prioritize different categories when logical
-
-OUTPUT FORMAT (JSON only, no markdown):
-[
-  {{
-    "product_id": "exact_id_from_catalog",
-    "reason": "Specific compelling reason why this complements the main product",
-    "confidence_score": 0.85
-  }}
-]
-
-Return ONLY valid JSON array with {limit} items. No markdown, no explanations."""
-        
-        return prompt
+        return ''.join((
+            prefix,
+            _CURRENT_PRODUCT_TEMPLATE.format(
+                user_context=f" (viewed by user {user_id})" if user_id else "",
+                name=product['name'],
+                category=product['category'],
+                price=product['price'],
+                description=product.get('description', 'N/A')[:180]
+            ),
+            _TASK_TEMPLATE.format(limit=limit)
+        ))
     
     def _parse_gemini_response(self, response_text: str, all_products: Dict) -> List[Dict]:
         """Parse and validate Gemini JSON response"""
@@ -244,41 +391,80 @@ Return ONLY valid JSON array with {limit} items. No markdown, no explanations.""
             logger.error(f"Failed to process Gemini response: {e}")
             raise
     
-    def _build_recommendation_prompt(self, product: Dict, candidates: List[Dict], limit: int) -> str:
-        """Build a prompt for Gemini AI"""
+    def rank_candidates(self, product: Dict, current_product_id: Optional[str] = None,
+                        max_candidates: int = MAX_RANKED_CANDIDATES,
+                        user_id: Optional[str] = None) -> List[Dict]:
+        """
+        Rank cross-sell candidates locally, before any LLM call.
         
-        prompt = f"""You are an expert e-commerce recommendation system. A customer is viewing the following product:
-
-Product: {product['name']}
-Category: {product['category']}
-Price: ${product['price']}
-Description: {product.get('description', 'N/A')}
-
-Based on this product, rank and select the top {limit} cross-sell recommendations from the following candidates. For each recommendation, provide:
-1. The product ID
-2. A brief, compelling reason why it complements the main product (max 15 words)
-3. A confidence score (0-1)
-
-Candidate Products:
-"""
+        The product's precomputed cross_sell list (data_loader) comes first in
+        its stored order; if it is short, same and related category buckets
+        top it up, ordered by affinity. With a ``user_id``, products the user
+        already purchased are dropped and recently viewed ones are boosted.
+        Indexes must already be built.
+        
+        Returns:
+            Up to ``max_candidates`` candidate dicts (product_id, name, category,
+            price, score), best first
+        """
+        catalog = self._by_key
+        source = catalog.get(current_product_id, product)
+        scored = {}
         
-        for i, candidate in enumerate(candidates[:20], 1):  # Limit to first 20 to avoid token limits
-            prompt += f"\n{i}. ID: {candidate.get('product_id', 'unknown')}, Name: {candidate['name'][:50]}, Category: {candidate['category']}, Price: ${candidate['price']}"
+        cross_sell = [pid for pid in source.get('cross_sell', []) if pid in catalog and pid != current_product_id]
+        for pos, pid in enumerate(cross_sell):
+            # Precomputed lists always outrank bucket top-ups (affinity is < 1)
+            scored.setdefault(pid, 2.0 - pos / len(cross_sell))
         
-        prompt += f"""
-
-Return your response as a JSON array with exactly {limit} items in this format:
-[
-  {{
-    "product_id": "id_here",
-    "reason": "Brief compelling reason here",
-    "confidence_score": 0.85
-  }}
-]
-
-Important: Return ONLY the JSON array, no additional text."""
+        if len(scored) < max_candidates:
+            category = product.get('category')
+            related = CATEGORY_MAP.get((category or '').lower(), [])
+            categories = [category] + [c for c in self._by_category if c and c.lower() in related]
+            for cat in categories:
+                for pid in self._by_category.get(cat, [])[:MAX_CATEGORY_SCAN]:
+                    if pid != current_product_id and pid not in scored:
+                        scored[pid] = affinity(product, catalog[pid])
+        
+        if user_id:
+            for pid in self.history.recent(user_id, PURCHASED):
+                scored.pop(pid, None)
+            viewed = self.history.recent(user_id, VIEWED)
+            for pos, pid in enumerate(viewed):
+                if pid in scored:
+                    scored[pid] += HISTORY_VIEW_BOOST * (1 - pos / len(viewed))
         
-        return prompt
+        ranked = sorted(scored.items(), key=lambda item: item[1], reverse=True)[:max_candidates]
+        return [{
+            'product_id': pid,
+            'name': catalog[pid]['name'],
+            'category': catalog[pid]['category'],
+            'price': catalog[pid]['price'],
+            'score': round(score, 4)
+        } for pid, score in ranked]
+    
+    def _build_recommendation_prompt(self, product: Dict, candidates: List[Dict], limit: int,
+                                     user_id: Optional[str] = None) -> str:
+        """Build a prompt for Gemini AI over locally ranked candidates"""
+        
+        candidate_lines = '\n'.join(
+            _CANDIDATE_LINE_TEMPLATE.format(
+                rank=i,
+                product_id=candidate.get('product_id', 'unknown'),
+                name=candidate['name'][:50],
+                category=candidate['category'],
+                price=candidate['price']
+            )
+            for i, candidate in enumerate(candidates[:MAX_RANKED_CANDIDATES], 1)  # Limit to avoid token limits
+        )
+        return _RANKED_PROMPT_TEMPLATE.format(
+            user_context=f" (user {user_id})" if user_id else "",
+            name=product['name'],
+            category=product['category'],
+            price=product['price'],
+            description=product.get('description', 'N/A'),
+            limit=limit,
+            candidate_lines=candidate_lines
+        )
     
     def _parse_ai_response(self, response_text: str, candidates: List[Dict]) -> List[Dict]:
         """Parse Gemini AI response and merge with product data"""
@@ -322,6 +508,32 @@ Important: Return ONLY the JSON array, no additional text."""
             logger.debug(f"Response text: {response_text}")
             return candidates
     
+    def _product_ref(self, product: Dict) -> str:
+        """Stable identifier of a product for reason caching and bulk responses"""
+        return (product.get('product_id')
+                or self.find_product_key(product)
+                or (f"{product['source']}_{product['id']}" if product.get('source') and 'id' in product else None)
+                or product['name'])
+    
+    def _cached_reason(self, pair) -> Optional[str]:
+        with self._reason_lock:
+            reason = self._reason_cache.get(pair)
+            if reason is not None:
+                self._reason_cache.move_to_end(pair)
+            return reason
+    
+    def _cache_reason(self, pair, reason: str):
+        with self._reason_lock:
+            self._reason_cache[pair] = reason
+            self._reason_cache.move_to_end(pair)
+            while len(self._reason_cache) > REASON_CACHE_SIZE:
+                self._reason_cache.popitem(last=False)
+    
+    @staticmethod
+    def _trim_reason(reason: str) -> str:
+        reason = reason.strip().strip('"\'')
+        return reason if len(reason) <= 100 else reason[:97] + "..."
+    
     def generate_personalized_reason(self, main_product: Dict, recommended_product: Dict) -> str:
         """
         Generate a personalized recommendation reason using Gemini AI
@@ -336,20 +548,92 @@ Important: Return ONLY the JSON array, no additional text."""
         if not self.enabled:
             return f"Frequently bought with {main_product['name']}"
         
+        pair = (self._product_ref(main_product), self._product_ref(recommended_product))
+        cached = self._cached_reason(pair)
+        if cached is not None:
+            return cached
+        
         try:
             prompt = f"""Generate a brief (max 12 words), compelling reason why someone buying "{main_product['name']}" ({main_product['category']}, ${main_product['price']}) would want to buy "{recommended_product['name']}" ({recommended_product['category']}, ${recommended_product['price']}).
 
 Return only the reason text, no quotes or extra formatting."""
             
-            response = self.model.generate_content(prompt)
-            reason = response.text.strip().strip('"\'')
-            
-            return reason if len(reason) <= 100 else reason[:97] + "..."
+            response = self._generate(prompt)
+            reason = self._trim_reason(response.text)
+            self._cache_reason(pair, reason)
+            return reason
             
         except Exception as e:
             logger.error(f"Failed to generate personalized reason: {e}")
             return f"Complements {main_product['name']}"
     
+    def generate_personalized_reasons(self, main_product: Dict, recommended_products: List[Dict],
+                                      priority: int = PRIORITY_INTERACTIVE) -> Dict[str, str]:
+        """
+        Generate reasons for several recommended products in one Gemini call
+        
+        Pairs already in the reason cache are not sent again, so a repeated
+        carousel costs no LLM call at all.
+        
+        Args:
+            main_product: The product the user is viewing
+            recommended_products: The products being recommended
+            priority: Rate-limiter lane; pass rate_limiter.PRIORITY_BATCH when precomputing
+            
+        Returns:
+            Dict mapping each recommended product's ID to its reason
+        """
+        main_ref = self._product_ref(main_product)
+        refs = [self._product_ref(p) for p in recommended_products]
+        
+        if not self.enabled:
+            return {ref: f"Frequently bought with {main_product['name']}" for ref in refs}
+        
+        reasons = {}
+        missing = OrderedDict()
+        for ref, product in zip(refs, recommended_products):
+            cached = self._cached_reason((main_ref, ref))
+            if cached is not None:
+                reasons[ref] = cached
+            else:
+                missing.setdefault(ref, product)
+        
+        if missing:
+            items = '\n'.join(
+                f'- {ref}: "{p["name"]}" ({p["category"]}, ${p["price"]})' for ref, p in missing.items()
+            )
+            prompt = f"""Someone is buying "{main_product['name']}" ({main_product['category']}, ${main_product['price']}).
+
+For EACH product below, write a brief (max 12 words), compelling reason why they would also want it:
+{items}
+
+Return ONLY a JSON object mapping each product ID above to its reason, e.g. {{"{next(iter(missing))}": "reason"}}. No markdown, no explanations."""
+            
+            try:
+                response = self._generate(prompt, priority)
+                text = response.text.strip()
+                if text.startswith('```'):
+                    text = text.split('\n', 1)[1] if '\n' in text else text
+                    text = text.rsplit('```', 1)[0].strip()
+                generated = json.loads(text)
+                if not isinstance(generated, dict):
+                    raise ValueError("Response is not a JSON object")
+                
+                for ref in missing:
+                    reason = generated.get(ref)
+                    if isinstance(reason, str) and reason.strip():
+                        reason = self._trim_reason(reason)
+                        self._cache_reason((main_ref, ref), reason)
+                        reasons[ref] = reason
+                    else:
+                        logger.warning(f"No reason returned for {ref}")
+            except Exception as e:
+                logger.error(f"Failed to generate personalized reasons: {e}")
+        
+        for ref in refs:
+            reasons.setdefault(ref, f"Complements {main_product['name']}")
+        return reasons
+    
     def generate_generic_recommendations(self, product_name: str, limit: int = 5, user_id: Optional[str] = None) -> List[Dict]:
         """
         Generate recommendations for ANY product, even if not in catalog.
@@ -387,7 +671,7 @@ Return ONLY a JSON array in this exact format:
 Be creative, practical, and focus on genuine cross-sell value."""
 
             logger.info(f"Generating generic recommendations for: {product_name}")
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt)
             
             # Parse response
             text = response.text.strip()
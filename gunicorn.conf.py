@@ -0,0 +1,51 @@
+"""
+Production gunicorn profile for the CSSA agent.
+
+    gunicorn -c gunicorn.conf.py cssa_agent:app
+
+The app is preloaded in the master: the catalog is parsed once and frozen
+out of the garbage collector before forking, so every worker shares it
+copy-on-write instead of holding its own copy. Requests are I/O bound
+(they mostly wait on the LLM), so each worker serves them from a thread
+pool. LLM clients are built after the fork, one set per worker, since gRPC
+channels must not be shared across processes.
+
+Tunables (environment):
+    PORT                  listen port (default 5000)
+    CSSA_WORKERS          worker processes (default: CPU count)
+    CSSA_THREADS          threads per worker (default 16)
+    CSSA_WORKER_TIMEOUT   seconds before a silent worker is restarted (default 60)
+    CSSA_MAX_REQUESTS     requests before a worker is recycled, 0 = never (default 0)
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('CSSA_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.getenv('CSSA_THREADS', 16))
+timeout = int(os.getenv('CSSA_WORKER_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.getenv('CSSA_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+preload_app = True
+accesslog = '-'
+
+
+def on_starting(server):
+    """Runs in the master after the app is preloaded, before any worker is forked"""
+    import cssa_agent
+    cssa_agent.preload_catalog()
+    # Move everything loaded so far out of the collector's reach, so GC passes
+    # in the workers don't touch (and un-share) the preloaded pages
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    """Build this worker's LLM clients before it accepts requests"""
+    import cssa_agent
+    if cssa_agent.gemini_initialized:
+        cssa_agent.llm_registry.warm_up()
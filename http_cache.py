@@ -0,0 +1,60 @@
+"""
+HTTP caching helpers: content-hash ETags and per-endpoint Cache-Control.
+
+The ETag covers only the stable part of a response. Per-request metadata
+(request_id, session_id, timestamp) is left out, so two responses with the
+same recommendations get the same ETag even though their bodies differ in
+those fields. That is why the ETag is weak (``W/"..."``).
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Iterable
+
+# Response fields that change on every request and are not part of the content
+VOLATILE_FIELDS = ('request_id', 'session_id', 'timestamp')
+
+
+class CachePolicy:
+    """Cache-Control lifetimes for one endpoint (seconds)"""
+
+    def __init__(self, max_age: int, stale_while_revalidate: int = 0):
+        self.max_age = max_age
+        self.stale_while_revalidate = stale_while_revalidate
+
+    def header(self, private: bool = False) -> str:
+        """Cache-Control value; ``private`` for per-user responses shared caches must not store"""
+        if self.max_age <= 0:
+            return 'no-cache'
+        parts = ['private' if private else 'public', f'max-age={self.max_age}']
+        if self.stale_while_revalidate > 0:
+            parts.append(f'stale-while-revalidate={self.stale_while_revalidate}')
+        return ', '.join(parts)
+
+    def to_dict(self) -> Dict:
+        return {'max_age': self.max_age, 'stale_while_revalidate': self.stale_while_revalidate}
+
+
+def policies_from_env(defaults: Dict[str, CachePolicy]) -> Dict[str, CachePolicy]:
+    """
+    Per-endpoint policies, overridable with
+        CSSA_CACHE_<ENDPOINT>_MAX_AGE   max-age (0 disables caching)
+        CSSA_CACHE_<ENDPOINT>_SWR       stale-while-revalidate
+    """
+    policies = {}
+    for endpoint, policy in defaults.items():
+        prefix = f"CSSA_CACHE_{endpoint.upper()}"
+        policies[endpoint] = CachePolicy(
+            int(os.getenv(f"{prefix}_MAX_AGE", policy.max_age)),
+            int(os.getenv(f"{prefix}_SWR", policy.stale_while_revalidate)),
+        )
+    return policies
+
+
+def payload_etag(payload: Dict, exclude: Iterable[str] = VOLATILE_FIELDS) -> str:
+    """Hex content hash of ``payload`` without the ``exclude`` fields (key order matters)"""
+    exclude = set(exclude)
+    stable = [[key, value] for key, value in payload.items() if key not in exclude]
+    encoded = json.dumps(stable, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.blake2b(encoded.encode('utf-8'), digest_size=16).hexdigest()
@@ -0,0 +1,71 @@
+"""
+Response serializers for the Flask app.
+
+API responses are built as OrderedDicts whose field order is part of the
+API contract, so every provider here keeps insertion order (Flask's
+default provider sorts keys). orjson is used when installed; otherwise the
+stdlib json module does the same job more slowly.
+
+Selected with CSSA_JSON_SERIALIZER: auto (default), orjson or stdlib.
+"""
+
+import logging
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class OrderedJSONProvider(DefaultJSONProvider):
+    """Stdlib json provider that keeps the field order responses were built with"""
+
+    sort_keys = False
+
+
+class OrjsonProvider(OrderedJSONProvider):
+    """
+    orjson-backed provider. Output is compact UTF-8 in insertion order;
+    types orjson does not handle natively (and datetimes, so they keep
+    Flask's HTTP-date format) go through Flask's ``default`` hook.
+    """
+
+    def _options(self, indent: bool = False) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=self._options(bool(kwargs.get('indent')))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def json_provider_class():
+    """Provider class chosen by CSSA_JSON_SERIALIZER (orjson when available by default)"""
+    choice = os.getenv('CSSA_JSON_SERIALIZER', 'auto').strip().lower()
+    if choice == 'stdlib':
+        return OrderedJSONProvider
+    if choice in ('auto', 'orjson'):
+        if ORJSON_AVAILABLE:
+            return OrjsonProvider
+        if choice == 'orjson':
+            logger.warning("CSSA_JSON_SERIALIZER=orjson but orjson is not installed; using stdlib json")
+        return OrderedJSONProvider
+    raise ValueError(f"Unknown CSSA_JSON_SERIALIZER: {choice!r} (expected auto, orjson or stdlib)")
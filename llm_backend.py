@@ -0,0 +1,455 @@
+"""
+Pluggable LLM backends.
+
+Callers only rely on ``backend.generate_content(prompt).text``, the same
+surface as a google.generativeai GenerativeModel, so the Gemini SDK can be
+swapped for a deterministic local stub when load testing without a key or
+quota. The stub runs in-process or behind a small localhost HTTP server:
+
+    python llm_backend.py --serve --port 8765 --latency lognormal:800,2500 --malformed-rate 0.05
+    CSSA_LLM_BACKEND=http CSSA_STUB_URL=http://127.0.0.1:8765 python cssa_agent.py
+
+Backend selection (CSSA_LLM_BACKEND):
+    gemini   Google Gemini via google-generativeai (default)
+    stub     In-process StubBackend
+    http     StubBackend served by ``--serve`` at CSSA_STUB_URL
+
+Every caller in the process shares ``llm_registry``. Models are registered
+up front (cheap) and their clients are built on first use or by
+``warm_up()``; google.generativeai itself is only imported then, so tests,
+CLIs and worker boot do not pay for the SDK import.
+"""
+
+import hashlib
+import importlib.util
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import requests
+
+
+def _sdk_installed() -> bool:
+    try:
+        return importlib.util.find_spec('google.generativeai') is not None
+    except ImportError:
+        return False
+
+
+# Checked without importing the SDK, which takes about half a second
+GEMINI_AVAILABLE = _sdk_installed()
+
+logger = logging.getLogger(__name__)
+
+BACKEND_GEMINI = 'gemini'
+BACKEND_STUB = 'stub'
+BACKEND_HTTP = 'http'
+
+DEFAULT_STUB_URL = 'http://127.0.0.1:8765'
+
+# Generation settings for models registered without their own config
+DEFAULT_GENERATION_CONFIG = {
+    'temperature': 0.7,
+    'top_p': 0.95,
+    'top_k': 40,
+    'max_output_tokens': 2048,
+}
+
+
+class LLMResponse:
+    """Minimal response object: the generated ``text``"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class LLMBackend:
+    """Interface every backend implements"""
+
+    name = 'llm'
+
+    def generate_content(self, prompt: str) -> LLMResponse:
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini model via google-generativeai"""
+
+    def __init__(self, model_name: str, generation_config: Optional[Dict] = None,
+                 api_key: Optional[str] = None):
+        if not GEMINI_AVAILABLE:
+            raise RuntimeError("google-generativeai not installed. Run: pip install google-generativeai")
+        api_key = api_key or os.getenv('GEMINI_API_KEY')
+        if not api_key:
+            raise RuntimeError("GEMINI_API_KEY not found in environment variables")
+        import google.generativeai as genai  # Deferred: the SDK import dominates cold start
+        genai.configure(api_key=api_key)
+        self.name = model_name
+        self.model = genai.GenerativeModel(model_name, generation_config=generation_config or DEFAULT_GENERATION_CONFIG)
+
+    def generate_content(self, prompt: str):
+        return self.model.generate_content(prompt)
+
+
+class StubBackendError(Exception):
+    """Simulated upstream failure; ``code`` makes it retryable like a real 503"""
+
+    def __init__(self, message: str, code: int = 503):
+        super().__init__(message)
+        self.code = code
+
+
+def parse_latency_spec(spec: str):
+    """
+    Parse a latency distribution into a sampler ``fn(rng) -> ms``.
+
+    Supported specs:
+        fixed:MS                  constant latency
+        uniform:LO,HI             uniform between LO and HI ms
+        lognormal:P50,P95         log-normal with the given median and p95 (ms)
+    """
+    kind, _, args = (spec or 'fixed:0').partition(':')
+    values = [float(v) for v in args.split(',') if v.strip()]
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'lognormal' and len(values) == 2 and 0 < values[0] <= values[1]:
+        mu = math.log(values[0])
+        sigma = (math.log(values[1]) - mu) / 1.645  # z-score of the 95th percentile
+        return lambda rng: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"Invalid latency spec: {spec!r}")
+
+
+_LIMIT_RE = re.compile(r'(?:exactly|top|Generate) (\d+)')
+_CANDIDATE_ID_RE = re.compile(r'ID: ([^,\s]+),')
+_CATALOG_ID_RE = re.compile(r'• ([^:\s]+):')
+_REASON_ID_RE = re.compile(r'^- ([^:\s]+): "', re.MULTILINE)
+_QUERY_RE = re.compile(r'USER QUERY: "([^"]*)"')
+_PRODUCT_NAME_RE = re.compile(r'(?:buying|interested in buying): "([^"]*)"')
+
+_STUB_REASONS = [
+    "Completes the setup with a practical everyday upgrade",
+    "Pairs naturally and is often bought together",
+    "Adds comfort and convenience to daily use",
+    "A popular companion at a matching price point",
+    "Protects and extends the life of the purchase",
+]
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic local stand-in for Gemini.
+
+    The answer depends only on the prompt (and ``seed``): it recognises the
+    prompts this repo sends and answers in the expected JSON shape, using
+    product IDs taken from the prompt. Latency is sampled from
+    ``latency_ms``; a share of calls can return a malformed answer
+    (markdown fences, single quotes, trailing commas, leading prose), a
+    truncated one, or fail outright, to exercise the cleanup, repair and
+    retry paths. Latency and faults come from seeded streams of their own,
+    so a retried prompt can succeed where the first call failed.
+    """
+
+    def __init__(self, name: str = 'stub', latency_ms: str = 'fixed:0', malformed_rate: float = 0.0,
+                 truncate_rate: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.name = name
+        self.latency_spec = latency_ms
+        self._sample_latency = parse_latency_spec(latency_ms)
+        self.malformed_rate = malformed_rate
+        self.truncate_rate = truncate_rate
+        self.error_rate = error_rate
+        self.seed = seed
+        # Latency and faults are drawn from their own seeded streams so identical
+        # prompts still vary in timing and in whether a given call fails
+        self._latency_rng = random.Random(seed)
+        self._fault_rng = random.Random(f"{seed}:faults")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, name: str = 'stub') -> 'StubBackend':
+        """Stub configured from CSSA_STUB_LATENCY / _MALFORMED_RATE / _TRUNCATE_RATE / _ERROR_RATE / _SEED"""
+        return cls(
+            name=name,
+            latency_ms=os.getenv('CSSA_STUB_LATENCY', 'fixed:0'),
+            malformed_rate=float(os.getenv('CSSA_STUB_MALFORMED_RATE', 0)),
+            truncate_rate=float(os.getenv('CSSA_STUB_TRUNCATE_RATE', 0)),
+            error_rate=float(os.getenv('CSSA_STUB_ERROR_RATE', 0)),
+            seed=int(os.getenv('CSSA_STUB_SEED', 0)),
+        )
+
+    def _rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}:{prompt}".encode('utf-8')).digest()
+        return random.Random(int.from_bytes(digest[:8], 'big'))
+
+    def generate_content(self, prompt: str) -> LLMResponse:
+        with self._lock:
+            delay = max(0.0, self._sample_latency(self._latency_rng))
+            faults = random.Random(self._fault_rng.getrandbits(64))
+        if delay:
+            time.sleep(delay / 1000)
+
+        if faults.random() < self.error_rate:
+            raise StubBackendError("503 stub backend unavailable")
+        text = self.render(prompt, self._rng(prompt))
+        if faults.random() < self.malformed_rate:
+            text = self._malform(text, faults)
+        if faults.random() < self.truncate_rate and len(text) > 2:
+            text = text[:faults.randint(len(text) // 2, len(text) - 1)]
+        return LLMResponse(text)
+
+    def render(self, prompt: str, rng: random.Random) -> str:
+        """Well-formed answer in the shape the prompt asks for"""
+        match = _LIMIT_RE.search(prompt)
+        limit = int(match.group(1)) if match else 3
+
+        if 'JSON object mapping each product ID' in prompt:
+            ids = _REASON_ID_RE.findall(prompt)
+            return json.dumps({pid: rng.choice(_STUB_REASONS) for pid in ids})
+
+        if 'USER QUERY:' in prompt:
+            return json.dumps(self._search(prompt, limit))
+
+        if '"recommendations": [' in prompt:
+            return json.dumps({'recommendations': [
+                {'product_id': f"prod_UK{rng.randint(10000, 99999)}", 'name': f"Stub Product {i + 1}",
+                 'category': 'accessories', 'price': round(rng.uniform(5, 120), 2),
+                 'reason': rng.choice(_STUB_REASONS),
+                 'source': rng.choice(['ml_model', 'collaborative_filtering'])}
+                for i in range(limit)
+            ]}, indent=2)
+
+        if '"price": "$XX-$XX"' in prompt:
+            product = _PRODUCT_NAME_RE.search(prompt)
+            base = product.group(1) if product else 'item'
+            return json.dumps([
+                {'name': f"{base.title()} Accessory {i + 1}", 'reason': rng.choice(_STUB_REASONS),
+                 'confidence': round(rng.uniform(0.7, 0.95), 2), 'price': '$10-$40', 'category': 'accessories'}
+                for i in range(limit)
+            ], indent=2)
+
+        if '"confidence_score"' in prompt:
+            ids = _CANDIDATE_ID_RE.findall(prompt) or _CATALOG_ID_RE.findall(prompt)
+            if '• ' in prompt:
+                rng.shuffle(ids)  # Catalog order carries no ranking
+            return json.dumps([
+                {'product_id': pid, 'reason': rng.choice(_STUB_REASONS),
+                 'confidence_score': round(0.95 - 0.04 * position, 2)}
+                for position, pid in enumerate(ids[:limit])
+            ], indent=2)
+
+        return rng.choice(_STUB_REASONS)
+
+    @staticmethod
+    def _search(prompt: str, limit: int) -> List[str]:
+        """Catalog IDs whose line shares a word with the query, best overlap first"""
+        query = _QUERY_RE.search(prompt)
+        words = set(query.group(1).lower().split()) if query else set()
+        scored = []
+        for line in prompt.splitlines():
+            match = _CANDIDATE_ID_RE.search(line)
+            if match:
+                overlap = len(words & set(re.findall(r'[a-z0-9]+', line.lower())))
+                if overlap:
+                    scored.append((-overlap, len(scored), match.group(1)))
+        return [pid for _, _, pid in sorted(scored)[:limit]]
+
+    @staticmethod
+    def _malform(text: str, rng: random.Random) -> str:
+        """Apply one of the defects seen in real model output"""
+        defect = rng.randrange(4)
+        if defect == 0:
+            return f"```json\n{text}\n```"
+        if defect == 1:
+            return text.replace('"', "'")
+        if defect == 2:
+            return re.sub(r'([}\]"])(\s*[}\]])', r'\1,\2', text, count=1)
+        return f"Here are the results:\n{text}"
+
+
+class HttpBackend(LLMBackend):
+    """Client for a StubBackend served over localhost HTTP (``--serve``)"""
+
+    def __init__(self, url: str = DEFAULT_STUB_URL, name: str = 'http', timeout: float = 60.0):
+        self.url = url.rstrip('/')
+        self.name = name
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def generate_content(self, prompt: str) -> LLMResponse:
+        response = self._session.post(f"{self.url}/generate", json={'model': self.name, 'prompt': prompt},
+                                      timeout=self.timeout)
+        if response.status_code != 200:
+            raise StubBackendError(f"{response.status_code} {response.text[:200]}", code=response.status_code)
+        return LLMResponse(response.json()['text'])
+
+
+def backend_kind() -> str:
+    """Selected backend kind from CSSA_LLM_BACKEND"""
+    return os.getenv('CSSA_LLM_BACKEND', BACKEND_GEMINI).strip().lower()
+
+
+def create_backend(model_name: str, generation_config: Optional[Dict] = None,
+                   api_key: Optional[str] = None) -> LLMBackend:
+    """
+    Backend for ``model_name`` of the kind selected by CSSA_LLM_BACKEND.
+
+    Raises:
+        RuntimeError: Gemini selected but the SDK or API key is missing
+        ValueError: unknown backend kind
+    """
+    kind = backend_kind()
+    if kind == BACKEND_GEMINI:
+        return GeminiBackend(model_name, generation_config, api_key)
+    if kind == BACKEND_STUB:
+        return StubBackend.from_env(model_name)
+    if kind == BACKEND_HTTP:
+        return HttpBackend(os.getenv('CSSA_STUB_URL', DEFAULT_STUB_URL), model_name)
+    raise ValueError(f"Unknown CSSA_LLM_BACKEND: {kind!r} (expected gemini, stub or http)")
+
+
+class BackendRegistry:
+    """
+    One lazily built backend per model name, shared by every caller.
+
+    ``register`` only records the model and its generation config; the
+    client is constructed by the first ``get`` (or ``warm_up``) and reused.
+    """
+
+    def __init__(self):
+        self.api_key: Optional[str] = None
+        self._configs: Dict[str, Optional[Dict]] = {}
+        self._backends: Dict[str, LLMBackend] = {}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def register(self, model_name: str, generation_config: Optional[Dict] = None):
+        """Add a model; an existing registration keeps its config unless one is given"""
+        with self._lock:
+            if generation_config is not None or model_name not in self._configs:
+                self._configs[model_name] = generation_config
+                self._backends.pop(model_name, None)
+
+    def available(self) -> bool:
+        """Whether backends can be built, checked without building one"""
+        if backend_kind() != BACKEND_GEMINI:
+            return True
+        return GEMINI_AVAILABLE and bool(self.api_key or os.getenv('GEMINI_API_KEY'))
+
+    def get(self, model_name: str) -> LLMBackend:
+        """Backend for a registered model, built on first use"""
+        backend = self._backends.get(model_name)
+        if backend is not None:
+            return backend
+        with self._lock:
+            backend = self._backends.get(model_name)
+            if backend is None:
+                if model_name not in self._configs:
+                    raise KeyError(f"LLM model not registered: {model_name}")
+                started = time.perf_counter()
+                try:
+                    backend = create_backend(model_name, self._configs[model_name], self.api_key)
+                except Exception as e:
+                    self._errors[model_name] = str(e)
+                    raise
+                self._errors.pop(model_name, None)
+                self._backends[model_name] = backend
+                logger.info(f"[OK] {backend_kind()} backend initialized: {model_name} "
+                            f"({(time.perf_counter() - started) * 1000:.0f}ms)")
+            return backend
+
+    def warm_up(self) -> Dict[str, bool]:
+        """Build every registered backend now (e.g. at readiness); returns success per model"""
+        results = {}
+        for model_name in list(self._configs):
+            try:
+                self.get(model_name)
+                results[model_name] = True
+            except Exception as e:
+                logger.error(f"Failed to initialize {model_name}: {e}")
+                results[model_name] = False
+        return results
+
+    def stats(self) -> Dict:
+        """Registered models, which are built, and the last build error per model"""
+        with self._lock:
+            return {
+                'kind': backend_kind(),
+                'models': {name: name in self._backends for name in self._configs},
+                'errors': dict(self._errors),
+            }
+
+
+# Shared by cssa_agent and gemini_ai
+llm_registry = BackendRegistry()
+
+
+def make_stub_handler(backend: StubBackend):
+    """Request handler class serving ``backend`` at POST /generate"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != '/generate':
+                self.send_error(404)
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                payload = {'text': backend.generate_content(body['prompt']).text}
+                status = 200
+            except StubBackendError as e:
+                payload, status = {'error': str(e)}, e.code
+            except (ValueError, KeyError) as e:
+                payload, status = {'error': f"Bad request: {e}"}, 400
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return StubHandler
+
+
+def serve_stub(backend: StubBackend, host: str = '127.0.0.1', port: int = 8765) -> ThreadingHTTPServer:
+    """Threaded HTTP server for ``backend``; call ``serve_forever()`` on the result"""
+    server = ThreadingHTTPServer((host, port), make_stub_handler(backend))
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Serve the deterministic stub LLM over localhost HTTP")
+    parser.add_argument('--serve', action='store_true', help="Run the HTTP stub server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='fixed:0', help="fixed:MS, uniform:LO,HI or lognormal:P50,P95")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="Share of malformed JSON answers")
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help="Share of answers cut off mid-JSON")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of simulated 503 errors")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if not args.serve:
+        parser.error("nothing to do (use --serve)")
+
+    stub = StubBackend('stub', args.latency, args.malformed_rate, args.truncate_rate, args.error_rate, args.seed)
+    server = serve_stub(stub, args.host, args.port)
+    logger.info(f"Stub LLM listening on http://{args.host}:{args.port}/generate (latency {args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,164 @@
+"""
+Non-blocking, structured logging.
+
+Request threads only put records on an in-memory queue (QueueHandler); a
+background QueueListener formats them and does the file/console I/O. Each
+record is one JSON object per line by default, with any ``extra=`` fields
+kept as keys.
+
+Raw model output is large and rarely needed, so it goes through
+``log_payload``, which logs only a sampled fraction of calls.
+
+Tunables (environment):
+    CSSA_LOG_LEVEL                 root level (default INFO)
+    CSSA_LOG_FORMAT                json (default) or text
+    CSSA_LOG_FILE                  log file (default cssa_agent.log; empty for console only)
+    CSSA_LOG_PAYLOAD_SAMPLE_RATE   fraction of raw payloads logged (default 0.01)
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else came from ``extra=``
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_queue_handler = None
+_payload_sample_rate = float(os.getenv('CSSA_LOG_PAYLOAD_SAMPLE_RATE', 0.01))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, message, extras, exc_info"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _RecordQueueHandler(QueueHandler):
+    """
+    Enqueue records with the message and traceback already rendered (so
+    args and exc_info need not cross threads) but otherwise unformatted,
+    leaving formatting to the listener's handlers.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None,
+                      log_file: Optional[str] = None) -> QueueListener:
+    """
+    Replace the root handlers with a queue feeding a background listener
+    that writes to ``log_file`` (if any) and stderr. Arguments default to
+    the CSSA_LOG_* environment variables.
+
+    Returns:
+        The running listener (stopped, and the queue drained, at exit)
+    """
+    global _listener, _queue_handler
+    level = (level or os.getenv('CSSA_LOG_LEVEL', 'INFO')).upper()
+    fmt = (fmt or os.getenv('CSSA_LOG_FORMAT', 'json')).lower()
+    log_file = os.getenv('CSSA_LOG_FILE', 'cssa_agent.log') if log_file is None else log_file
+
+    formatter = JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.insert(0, logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    shutdown_logging()
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    _queue_handler = _RecordQueueHandler(records)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Stop the listener after it has written every queued record"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def _restart_listener_after_fork():
+    # The listener thread does not survive fork (gunicorn workers). The child
+    # gets a fresh queue, since the copied one may hold the parent's records
+    # or a lock the parent's listener thread had taken, and its own listener
+    global _listener
+    if _listener is not None:
+        records = queue.SimpleQueue()
+        _queue_handler.queue = records
+        _listener = QueueListener(records, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+
+
+atexit.register(shutdown_logging)
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
+def set_payload_sample_rate(rate: float):
+    """Fraction (0-1) of ``log_payload`` calls that are actually logged"""
+    global _payload_sample_rate
+    _payload_sample_rate = rate
+
+
+def log_payload(logger: logging.Logger, label: str, payload: str, level: int = logging.INFO,
+                max_chars: Optional[int] = None, **fields):
+    """
+    Log a raw payload (e.g. model output) for a sampled fraction of calls.
+    Nothing is built or enqueued for calls that are not sampled.
+
+    Args:
+        logger: Logger to write to
+        label: Short description used as the message
+        payload: Raw text; truncated to ``max_chars`` if given
+        level: Log level
+        **fields: Extra structured fields for the record
+    """
+    if _payload_sample_rate <= 0 or random.random() >= _payload_sample_rate or not logger.isEnabledFor(level):
+        return
+    payload_chars = len(payload)
+    if max_chars is not None:
+        payload = payload[:max_chars]
+    logger.log(level, label, extra=dict(fields, payload=payload, payload_chars=payload_chars))
@@ -0,0 +1,273 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+The hot path never takes a lock: every thread increments its own shard of
+each counter/histogram (a plain list only that thread writes), and a scrape
+sums the shards. Shards of threads that have exited are folded into a
+retired total, so thread-per-request servers do not grow the shard list.
+
+    REQUESTS = metrics.counter('cssa_http_requests_total', 'HTTP requests', ('endpoint', 'status'))
+    REQUESTS.labels('recommend', '200').inc()
+    with STAGE_SECONDS.labels('llm_call').time():
+        ...
+    metrics.render()  # text for /api/metrics
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans cheap in-process stages (sub-ms) up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _ThreadShards:
+    """A vector of floats, one private copy per writing thread"""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._live = []  # (thread, values)
+        self._retired = [0.0] * size
+
+    def shard(self) -> List[float]:
+        """The calling thread's values (created on first use)"""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = [0.0] * self._size
+            with self._lock:
+                # Thread-per-request servers register a shard per request; drop the finished ones here
+                self._retire_dead()
+                self._live.append((threading.current_thread(), values))
+            self._local.values = values
+            return values
+
+    def _retire_dead(self):
+        """Fold exited threads into the retired total (call with _lock held)"""
+        live = []
+        for thread, values in self._live:
+            if thread.is_alive():
+                live.append((thread, values))
+            else:
+                # Dead threads cannot write again, so their values are final
+                for i, value in enumerate(values):
+                    self._retired[i] += value
+        self._live = live
+
+    def totals(self) -> List[float]:
+        """Sum over every thread, folding exited threads into the retired total"""
+        with self._lock:
+            self._retire_dead()
+            totals = list(self._retired)
+            for _, values in self._live:
+                for i, value in enumerate(list(values)):
+                    totals[i] += value
+            return totals
+
+
+class _CounterChild:
+    __slots__ = ('_shards',)
+
+    def __init__(self):
+        self._shards = _ThreadShards(1)
+
+    def inc(self, amount: float = 1.0):
+        self._shards.shard()[0] += amount
+
+    def value(self) -> float:
+        return self._shards.totals()[0]
+
+
+class _Timer:
+    __slots__ = ('_histogram', '_started')
+
+    def __init__(self, histogram: '_HistogramChild'):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._started)
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ('_buckets', '_shards')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        # One slot per bucket, one for +Inf, then the sum
+        self._shards = _ThreadShards(len(buckets) + 2)
+
+    def observe(self, value: float):
+        values = self._shards.shard()
+        values[bisect_left(self._buckets, value)] += 1
+        values[-1] += value
+
+    def time(self) -> _Timer:
+        """Context manager observing the enclosed block's duration in seconds"""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        """(cumulative bucket counts incl. +Inf, sum, count)"""
+        totals = self._shards.totals()
+        cumulative, running = [], 0.0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-1], running
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Child metric for one combination of label values (strings; created on first use)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._children.items(), key=lambda item: item[0])
+        for values, child in items:
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        """Increment the unlabelled counter"""
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_label_str(self.labelnames, values)} {_number(child.value())}"]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, values, child):
+        cumulative, total, count = child.snapshot()
+        lines = []
+        for bound, running in zip(self.buckets + (float('inf'),), cumulative):
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            labels = _label_str(self.labelnames + ('le',), values + (le,))
+            lines.append(f"{self.name}_bucket{labels} {_number(running)}")
+        labels = _label_str(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_number(total)}")
+        lines.append(f"{self.name}_count{labels} {_number(count)}")
+        return lines
+
+
+class CallbackMetric:
+    """Counter or gauge whose values are read from ``fn`` at scrape time"""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 fn: Callable[[], Dict[Tuple[str, ...], float]]):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in sorted(self.fn().items()):
+            lines.append(f"{self.name}{_label_str(self.labelnames, values)} {_number(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics of one process, rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 fn: Callable[[], Dict[Tuple[str, ...], float]]) -> CallbackMetric:
+        """Register a ``kind`` ('counter' or 'gauge') metric read from ``fn`` on each scrape"""
+        return self._register(CallbackMetric(name, documentation, kind, labelnames, fn))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_str(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# Shared by every module in this process
+metrics = MetricsRegistry()
@@ -0,0 +1,100 @@
+"""
+Cleanup and parsing of JSON returned by the LLM.
+
+Model output often arrives wrapped in a markdown fence, surrounded by prose,
+with single quotes or trailing commas, or cut off mid-object.
+``clean_model_json`` fixes the cheap, common cases with string operations;
+``parse_model_json`` parses the result and falls back to json-repair only
+when that is not enough.
+"""
+
+import json
+import logging
+import re
+from contextlib import nullcontext
+from typing import Any, Callable, Tuple
+
+from json_repair import repair_json
+
+logger = logging.getLogger(__name__)
+
+_TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+_CLOSERS = {'{': '}', '[': ']'}
+
+
+def _no_stage(name: str):
+    return nullcontext()
+
+
+def clean_model_json(text: str, opener: str = '{') -> str:
+    """
+    Extract the JSON value from raw model output.
+
+    Args:
+        text: Raw model output
+        opener: '{' when an object is expected, '[' for an array
+
+    Returns:
+        Text from the first ``opener`` to its last closer, with fences and
+        surrounding prose removed, a truncated value closed, single quotes
+        turned into double quotes and trailing commas dropped
+    """
+    closer = _CLOSERS[opener]
+    text = text.strip()
+
+    # Remove markdown code blocks
+    if text.startswith('```json'):
+        text = text.split('```json', 1)[1].split('```', 1)[0].strip()
+    elif text.startswith('```'):
+        text = text.split('```', 1)[1].split('```', 1)[0].strip()
+
+    # Remove any trailing text after the JSON
+    if '```' in text:
+        text = text.split('```')[0].strip()
+
+    # Find JSON value boundaries
+    start_idx = text.find(opener)
+    if start_idx != -1:
+        end_idx = text.rfind(closer)
+        text = text[start_idx:end_idx + 1] if end_idx > start_idx else text[start_idx:]
+        open_braces = text.count('{') - text.count('}')
+        open_brackets = text.count('[') - text.count(']')
+        if open_braces > 0 or open_brackets > 0:
+            # Incomplete JSON (output cut off) - close whatever is still open
+            logger.warning("Detected incomplete JSON response - attempting auto-completion")
+            text = text.rstrip().rstrip(',')
+            # Inner structures first: arrays inside an object, objects inside an array
+            braces, brackets = '}' * max(open_braces, 0), ']' * max(open_brackets, 0)
+            text += brackets + braces if opener == '{' else braces + brackets
+
+    # Quick pre-fixes: double quotes only, no trailing commas
+    text = text.replace("'", '"')
+    return _TRAILING_COMMA.sub(r'\1', text)
+
+
+def parse_model_json(text: str, opener: str = '{',
+                     stage: Callable[[str], Any] = _no_stage) -> Tuple[Any, bool]:
+    """
+    Clean and parse model output, repairing it with json-repair if the
+    cleaned text is still not valid JSON.
+
+    Args:
+        text: Raw model output
+        opener: '{' when an object is expected, '[' for an array
+        stage: Context manager factory timing the 'json_clean' and
+            'json_repair' stages (e.g. cssa_agent.timed_stage)
+
+    Returns:
+        (parsed value, whether json-repair was needed)
+
+    Raises:
+        ValueError: Not even json-repair produced valid JSON
+    """
+    with stage('json_clean'):
+        cleaned = clean_model_json(text, opener)
+        try:
+            return json.loads(cleaned), False
+        except json.JSONDecodeError as e:
+            logger.warning(f"Standard JSON parse failed: {e.msg} at position {e.pos}; repairing")
+    with stage('json_repair'):
+        return json.loads(repair_json(cleaned)), True
@@ -0,0 +1,161 @@
+"""
+Latency-aware routing across LLM backends.
+
+Each backend keeps a rolling window of recent call latencies and outcomes.
+A request goes to the cheapest backend whose rolling p95 latency and error
+rate meet the endpoint's SLO; when none does, it degrades to the local
+(non-LLM) recommender. Samples age out of the window, so a backend that was
+skipped gets traffic again once its bad samples expire.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Name used when no LLM backend meets the SLO
+LOCAL_BACKEND = 'local'
+
+
+class SLO:
+    """Latency / error budget for one endpoint"""
+
+    def __init__(self, p95_ms: float, max_error_rate: float = 0.2):
+        self.p95_ms = p95_ms
+        self.max_error_rate = max_error_rate
+
+    def to_dict(self) -> Dict:
+        return {'p95_ms': self.p95_ms, 'max_error_rate': self.max_error_rate}
+
+
+class BackendStats:
+    """Rolling window of (timestamp, latency_ms, ok) samples for one backend"""
+
+    def __init__(self, window_size: int = 200, window_seconds: float = 300.0):
+        self.window_seconds = window_seconds
+        self._samples = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float, ok: bool):
+        with self._lock:
+            self._samples.append((time.monotonic(), latency_ms, ok))
+
+    def _recent(self) -> List[Tuple[float, float, bool]]:
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return list(self._samples)
+
+    def snapshot(self) -> Dict:
+        """Sample count, p50/p95 latency (ms) and error rate over the window"""
+        samples = self._recent()
+        if not samples:
+            return {'samples': 0, 'p50_ms': None, 'p95_ms': None, 'error_rate': 0.0}
+        latencies = sorted(latency for _, latency, _ in samples)
+        errors = sum(1 for _, _, ok in samples if not ok)
+        return {
+            'samples': len(samples),
+            'p50_ms': round(_percentile(latencies, 50), 1),
+            'p95_ms': round(_percentile(latencies, 95), 1),
+            'error_rate': round(errors / len(samples), 3),
+        }
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class ModelRouter:
+    """Pick the cheapest healthy backend per endpoint, or LOCAL_BACKEND"""
+
+    def __init__(self, slos: Dict[str, SLO], min_samples: int = 5,
+                 window_size: int = 200, window_seconds: float = 300.0):
+        self.slos = slos
+        self.min_samples = min_samples
+        self.window_size = window_size
+        self.window_seconds = window_seconds
+        self._backends = []  # (cost, name), kept sorted cheapest first
+        self._stats: Dict[str, BackendStats] = {}
+
+    def register(self, name: str, cost: float = 1.0):
+        """Add a backend; lower cost is preferred when it meets the SLO"""
+        self._backends = sorted(
+            [(c, n) for c, n in self._backends if n != name] + [(cost, name)]
+        )
+        self._stats.setdefault(name, BackendStats(self.window_size, self.window_seconds))
+
+    @property
+    def backends(self) -> List[str]:
+        return [name for _, name in self._backends]
+
+    def choose(self, endpoint: str) -> str:
+        """Cheapest backend meeting the endpoint's SLO, else LOCAL_BACKEND"""
+        slo = self.slos.get(endpoint)
+        for _, name in self._backends:
+            if slo is None:
+                return name
+            stats = self._stats[name].snapshot()
+            # Too few samples to judge: give it traffic so it can prove itself
+            if stats['samples'] < self.min_samples:
+                return name
+            if stats['p95_ms'] <= slo.p95_ms and stats['error_rate'] <= slo.max_error_rate:
+                return name
+        return LOCAL_BACKEND
+
+    def record(self, name: str, latency_ms: float, ok: bool):
+        """Record the outcome of one call to ``name``"""
+        stats = self._stats.get(name)
+        if stats is not None:
+            stats.record(latency_ms, ok)
+
+    def stats(self) -> Dict:
+        """Per-backend rolling stats plus the SLOs, for /api/status"""
+        return {
+            'backends': [
+                dict(name=name, cost=cost, **self._stats[name].snapshot())
+                for cost, name in self._backends
+            ],
+            'slos': {endpoint: slo.to_dict() for endpoint, slo in self.slos.items()},
+        }
+
+
+def parse_model_list(spec: str) -> List[Tuple[str, float]]:
+    """
+    Parse "model:cost,model:cost" (cost optional, defaults to list position).
+
+    >>> parse_model_list("gemini-2.0-flash-exp:1,gemini-2.5-flash:3")
+    [('gemini-2.0-flash-exp', 1.0), ('gemini-2.5-flash', 3.0)]
+    """
+    models = []
+    for position, entry in enumerate(filter(None, (e.strip() for e in spec.split(','))), 1):
+        name, _, cost = entry.partition(':')
+        models.append((name.strip(), float(cost) if cost else float(position)))
+    return models
+
+
+def router_from_env(default_models: str, default_slos: Dict[str, SLO]) -> Tuple[ModelRouter, List[Tuple[str, float]]]:
+    """
+    Build a router from environment variables:
+        CSSA_MODELS                      model list for parse_model_list
+        CSSA_SLO_<ENDPOINT>_P95_MS       p95 latency budget per endpoint
+        CSSA_SLO_<ENDPOINT>_ERROR_RATE   error-rate budget per endpoint
+    """
+    slos = {}
+    for endpoint, slo in default_slos.items():
+        prefix = f"CSSA_SLO_{endpoint.upper()}"
+        slos[endpoint] = SLO(
+            float(os.getenv(f"{prefix}_P95_MS", slo.p95_ms)),
+            float(os.getenv(f"{prefix}_ERROR_RATE", slo.max_error_rate)),
+        )
+    router = ModelRouter(slos)
+    models = parse_model_list(os.getenv('CSSA_MODELS', default_models))
+    for name, cost in models:
+        router.register(name, cost)
+    return router, models
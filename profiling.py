@@ -0,0 +1,116 @@
+"""
+Opt-in per-request tracing and profiling.
+
+An admin request sent with ``X-CSSA-Profile: trace`` (or ``?profile=trace``)
+records a span for every pipeline stage it runs: prompt build, LLM call and
+each attempt, JSON clean/repair and serialization. ``cprofile`` also runs
+cProfile over the request. Both can be combined (``trace,cprofile``).
+
+When no trace is active, instrumented code pays one ContextVar lookup.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional
+
+PROFILE_HEADER = 'X-CSSA-Profile'
+PROFILE_PARAM = 'profile'
+MODE_TRACE = 'trace'
+MODE_CPROFILE = 'cprofile'
+
+# Trace of the request being handled in this context, if it asked for one
+current_trace = ContextVar('current_trace', default=None)
+
+
+def parse_modes(value: Optional[str]) -> frozenset:
+    """``"trace,cprofile"`` -> the known modes it names (empty if none)"""
+    if not value:
+        return frozenset()
+    return frozenset(mode.strip().lower() for mode in value.split(',')) & {MODE_TRACE, MODE_CPROFILE}
+
+
+class RequestTrace:
+    """Spans (and optionally a cProfile run) of one request"""
+
+    def __init__(self, modes: Iterable[str], label: str = ''):
+        self.modes = frozenset(modes)
+        self.label = label
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.spans: List[Dict] = []
+        self.profiler = cProfile.Profile() if MODE_CPROFILE in self.modes else None
+        self.profiler_error = None
+        self.started = None
+        self.total_ms = None
+        self._token = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._token = current_trace.set(self)
+        if self.profiler is not None:
+            try:
+                self.profiler.enable()
+            except ValueError as e:  # Another profiler already owns the interpreter
+                self.profiler, self.profiler_error = None, str(e)
+
+    def stop(self):
+        """End the trace (idempotent)"""
+        if self._token is None:
+            return
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.total_ms = round((time.perf_counter() - self.started) * 1000, 3)
+        current_trace.reset(self._token)
+        self._token = None
+
+    def add(self, name: str, started: float, elapsed: float):
+        """Record a span that began at ``started`` (perf_counter) and took ``elapsed`` seconds"""
+        self.spans.append({
+            'name': name,
+            'start_ms': round((started - self.started) * 1000, 3),
+            'duration_ms': round(elapsed * 1000, 3),
+        })
+
+    def profile_text(self, limit: int = 25) -> Optional[str]:
+        """Top ``limit`` functions by cumulative time"""
+        if self.profiler is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+    def to_dict(self) -> Dict:
+        result = {'trace_id': self.trace_id, 'total_ms': self.total_ms}
+        if MODE_TRACE in self.modes:
+            result['spans'] = sorted(self.spans, key=lambda span: span['start_ms'])
+        if MODE_CPROFILE in self.modes:
+            result['cprofile'] = self.profile_text() if self.profiler is not None else self.profiler_error
+        return result
+
+    def dump(self, directory: str) -> str:
+        """
+        Write the trace as JSON (and the raw cProfile stats as .prof, for
+        pstats/snakeviz) into ``directory``.
+
+        Returns:
+            Path of the JSON file
+        """
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, f"{time.strftime('%Y%m%dT%H%M%S')}_{self.label}_{self.trace_id}")
+        if self.profiler is not None:
+            self.profiler.dump_stats(stem + '.prof')
+        with open(stem + '.json', 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return stem + '.json'
+
+
+def record_span(name: str, started: float, elapsed: float):
+    """Add a span to the current request's trace, if it has one"""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(name, started, elapsed)
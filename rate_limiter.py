@@ -0,0 +1,201 @@
+"""
+Client-side pacing for outbound LLM calls.
+
+One limiter is shared by every Gemini caller in the process. It enforces
+requests-per-minute and tokens-per-minute with token buckets, queues callers
+in priority lanes (interactive traffic goes ahead of batch/precompute work),
+bounds how many may wait, and retries retryable errors with jittered
+exponential backoff.
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes: lower value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+_LANE_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_BATCH: 'batch'}
+
+# Exception class names / status codes worth retrying (google.api_core and HTTP-style errors)
+_RETRYABLE_NAMES = frozenset([
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable',
+    'DeadlineExceeded', 'InternalServerError', 'GatewayTimeout',
+])
+_RETRYABLE_CODES = frozenset([429, 500, 502, 503, 504])
+
+
+class RateLimitExceeded(Exception):
+    """Raised when the wait queue is full or a caller waited past its timeout"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for quota, overload and timeout errors from the LLM API"""
+    if type(error).__name__ in _RETRYABLE_NAMES:
+        return True
+    code = getattr(error, 'code', None)
+    if isinstance(code, int) and code in _RETRYABLE_CODES:
+        return True
+    return '429' in str(error) or 'quota' in str(error).lower()
+
+
+def estimate_tokens(prompt: str) -> int:
+    """Rough input token count (about 4 characters per token)"""
+    return max(1, len(prompt) // 4)
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate_per_minute``"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 if available now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class OutboundLimiter:
+    """Shared RPM/TPM limiter with priority lanes, a bounded queue and retries"""
+
+    def __init__(self, requests_per_minute: float = 60, tokens_per_minute: float = 250000,
+                 max_queue: int = 100, max_wait: float = 30.0,
+                 max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._wait_ms = deque(maxlen=500)
+        self._counters = {'admitted': 0, 'rejected': 0, 'timeouts': 0, 'retries': 0, 'failures': 0}
+
+    @classmethod
+    def from_env(cls) -> 'OutboundLimiter':
+        """Limiter configured from CSSA_LLM_RPM / _TPM / _MAX_QUEUE / _MAX_WAIT / _MAX_RETRIES"""
+        return cls(
+            requests_per_minute=float(os.getenv('CSSA_LLM_RPM', 60)),
+            tokens_per_minute=float(os.getenv('CSSA_LLM_TPM', 250000)),
+            max_queue=int(os.getenv('CSSA_LLM_MAX_QUEUE', 100)),
+            max_wait=float(os.getenv('CSSA_LLM_MAX_WAIT', 30)),
+            max_retries=int(os.getenv('CSSA_LLM_MAX_RETRIES', 3)),
+        )
+
+    def acquire(self, tokens: int = 1, priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None):
+        """
+        Block until one request and ``tokens`` tokens may be spent.
+
+        Raises:
+            RateLimitExceeded: queue full, or not admitted within ``timeout``
+        """
+        timeout = self.max_wait if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._cond:
+            if len(self._waiters) >= self.max_queue:
+                self._counters['rejected'] += 1
+                raise RateLimitExceeded(f"LLM request queue full ({self.max_queue} waiting)")
+
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._waiters[0] == ticket:
+                        wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                        if wait == 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            heapq.heappop(self._waiters)
+                            self._counters['admitted'] += 1
+                            self._wait_ms.append((now - started) * 1000)
+                            self._cond.notify_all()
+                            return
+                    else:
+                        wait = deadline - now  # Woken when the head of the queue changes
+                    if now >= deadline:
+                        self._counters['timeouts'] += 1
+                        raise RateLimitExceeded(f"Waited {timeout:.1f}s for LLM rate limit")
+                    self._cond.wait(min(wait, deadline - now))
+            except BaseException:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                raise
+
+    def call(self, fn: Callable, tokens: int = 1, priority: int = PRIORITY_INTERACTIVE,
+             timeout: Optional[float] = None):
+        """
+        Run ``fn()`` under the limiter, retrying retryable errors with jittered
+        exponential backoff (each retry waits for the limiter again).
+        """
+        attempt = 0
+        while True:
+            self.acquire(tokens, priority, timeout)
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    with self._cond:
+                        self._counters['failures'] += 1
+                    raise
+                # Full jitter: sleep a random fraction of the exponential step
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                attempt += 1
+                with self._cond:
+                    self._counters['retries'] += 1
+                logger.warning(f"Retryable LLM error ({e}); retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+
+    def queue_depth(self) -> int:
+        """Callers currently waiting for a slot (lock-free read, may be momentarily stale)"""
+        return len(self._waiters)
+
+    def stats(self) -> Dict:
+        """Queue depth per lane, counters and recent wait times (ms)"""
+        with self._cond:
+            lanes = {name: 0 for name in _LANE_NAMES.values()}
+            for priority, _ in self._waiters:
+                lane = _LANE_NAMES.get(priority, str(priority))
+                lanes[lane] = lanes.get(lane, 0) + 1
+            waits = sorted(self._wait_ms)
+            return dict(
+                queue_depth=len(self._waiters),
+                queue_depth_by_lane=lanes,
+                max_queue=self.max_queue,
+                wait_ms_avg=round(sum(waits) / len(waits), 1) if waits else 0.0,
+                wait_ms_p95=round(waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0.0,
+                **self._counters
+            )
+
+
+# Shared by every Gemini caller in this process
+gemini_limiter = OutboundLimiter.from_env()
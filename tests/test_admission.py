@@ -0,0 +1,68 @@
+import threading
+import time
+
+from admission import SHED_LOCAL, AdmissionController, ResultCache
+
+
+def test_admits_until_in_flight_or_queue_threshold():
+    queued = [0]
+    controller = AdmissionController(lambda: queued[0], max_in_flight=1, max_queued=2)
+
+    assert controller.admit()
+    assert controller.in_flight == 1
+    assert not controller.admit()
+    controller.release()
+    assert controller.admit()
+    controller.release()
+    queued[0] = 2
+    assert not controller.admit()
+
+    controller.record_shed(SHED_LOCAL)
+    stats = controller.stats()
+    assert stats["admitted"] == 2 and stats["local"] == 1 and stats["queued"] == 2 and stats["in_flight"] == 0
+
+
+def test_a_burst_cannot_overshoot_max_in_flight():
+    controller = AdmissionController(lambda: 0, max_in_flight=3)
+    start = threading.Barrier(8)
+    admitted = []
+
+    def request():
+        start.wait()
+        admitted.append(controller.admit())
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert admitted.count(True) == 3 and controller.in_flight == 3
+
+
+def test_in_flight_count_is_thread_safe():
+    controller = AdmissionController(lambda: 0, max_in_flight=4)
+
+    def work():
+        for _ in range(1000):
+            if controller.admit():
+                controller.release()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert controller.in_flight == 0
+
+
+def test_result_cache_is_lru_with_ttl(monkeypatch):
+    cache = ResultCache(max_entries=2, ttl=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None and len(cache) == 2
+    now = time.monotonic()
+    monkeypatch.setattr("admission.time.monotonic", lambda: now + 11)
+    assert cache.get("a") is None
@@ -0,0 +1,41 @@
+import gzip
+
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from compression import negotiate_encoding
+from ui_assets import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, build_assets, resolve_asset
+
+
+def _accept(value):
+    return parse_accept_header(value, Accept)
+
+
+def test_negotiate_encoding_uses_q_values():
+    assert negotiate_encoding(_accept("gzip, deflate"), ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding(_accept("br;q=0.5, gzip"), ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding(_accept("br, gzip"), ["br", "gzip"]) == "br"
+    assert negotiate_encoding(_accept("gzip;q=0"), ["gzip"]) is None
+    assert negotiate_encoding(_accept(""), ["gzip"]) is None
+
+
+def test_build_fingerprints_rewrites_and_precompresses(tmp_path):
+    src, out = tmp_path / "ui", tmp_path / "ui" / "dist"
+    src.mkdir()
+    (src / "app.js").write_text("console.log('hi');")
+    (src / "index.html").write_text('<script src="/ui/app.js"></script>')
+
+    manifest = build_assets(str(src), str(out))
+    served = manifest["app.js"]
+
+    assert served.startswith("app.") and served != "app.js"
+    assert served in (out / "index.html").read_text()
+    assert gzip.decompress((out / (served + ".gz")).read_bytes()) == b"console.log('hi');"
+
+    directory, name, encoding, cache_control, mimetype = resolve_asset(served, _accept("gzip"), manifest,
+                                                                       str(src), str(out))
+    assert (name, encoding, cache_control) == (served + ".gz", "gzip", IMMUTABLE_CACHE_CONTROL)
+    assert mimetype in ("application/javascript", "text/javascript")
+    assert resolve_asset("app.js", _accept(""), manifest, str(src), str(out))[1:4] == \
+        (served, None, REVALIDATE_CACHE_CONTROL)
+    assert resolve_asset("index.html", _accept(""), None, str(src), str(out))[0] == str(src)
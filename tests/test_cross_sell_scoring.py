@@ -0,0 +1,54 @@
+from cross_sell_scoring import (CONFIDENCE_RANGE, CatalogArrays, category_relation, confidence_scores, score_catalog,
+                                score_cross_sell_mappings)
+
+
+def _catalog():
+    def product(name, category, price, rating):
+        return {"name": name, "category": category, "price": price, "rating": rating,
+                "description": "", "cross_sell": []}
+
+    return {
+        "fakestore_1": product("Gaming Laptop 15", "laptops", 999.0, 4.5),
+        "fakestore_2": product("Laptop Sleeve 15", "accessories", 25.0, 4.0),
+        "fakestore_3": product("Office Laptop 14", "laptops", 650.0, 3.9),
+        "dummyjson_1": product("Rose Perfume", "fragrances", 60.0, 4.8),
+        "dummyjson_2": product("Wireless Mouse", "electronics", 20.0, 4.2),
+    }
+
+
+def test_category_relation():
+    assert category_relation("Laptops", "laptops") == 1.0
+    assert category_relation("laptops", "accessories") == 0.6
+    assert category_relation("laptops", "fragrances") == 0.0
+
+
+def test_same_and_related_categories_rank_first():
+    catalog = score_cross_sell_mappings(_catalog(), top_k=3)
+
+    assert catalog["fakestore_1"]["cross_sell"][0] == "fakestore_3"
+    assert set(catalog["fakestore_1"]["cross_sell"][1:]) == {"fakestore_2", "dummyjson_2"}
+    assert all(len(p["cross_sell"]) == 3 for p in catalog.values())
+    assert all(key not in p["cross_sell"] for key, p in catalog.items())
+
+
+def test_pool_matches_in_process_scoring():
+    arrays = CatalogArrays(_catalog())
+    serial, serial_pairs = score_catalog(arrays, top_k=3, workers=1)
+    pooled, pooled_pairs = score_catalog(arrays, top_k=3, workers=2, chunk_size=2)
+
+    assert pooled == serial
+    assert pooled_pairs == serial_pairs
+
+
+def test_confidence_scores_are_deterministic_and_ranked():
+    catalog = _catalog()
+    anchor = catalog["fakestore_1"]
+    candidates = [catalog["fakestore_2"], catalog["dummyjson_2"], catalog["dummyjson_1"]]
+
+    scores = confidence_scores(anchor, candidates)
+
+    assert scores == confidence_scores(anchor, candidates)
+    assert scores[0] > scores[2]  # Related category and higher rank beat an unrelated one
+    assert all(CONFIDENCE_RANGE[0] <= s <= CONFIDENCE_RANGE[1] for s in scores)
+    assert confidence_scores(None, [{"name": "Mystery", "price": "N/A"}]) == [0.84]
+    assert confidence_scores(anchor, []) == []
@@ -0,0 +1,304 @@
+import pytest
+
+import cssa_agent
+from data_loader import CatalogCache, save_to_file
+
+
+@pytest.fixture
+def catalog_file(tmp_path, monkeypatch):
+    def product(i, name, category, price, cross_sell):
+        return {"id": i, "name": name, "category": category, "price": price, "description": "",
+                "rating": 4.0, "source": "fakestore", "cross_sell": cross_sell}
+
+    path = str(tmp_path / "products.json")
+    save_to_file({
+        "fakestore_1": product(1, "Gaming Laptop", "laptops", 999.0, ["fakestore_2", "fakestore_3"]),
+        "fakestore_2": product(2, "Laptop Sleeve", "accessories", 25.0, ["fakestore_1"]),
+        "fakestore_3": product(3, "Wireless Mouse", "electronics", 20.0, ["fakestore_1"]),
+    }, path)
+    monkeypatch.setattr(cssa_agent, "PRODUCTS_FILE", path)
+    monkeypatch.setattr(cssa_agent, "catalog_cache", CatalogCache(path))
+    return path
+
+
+@pytest.fixture
+def client(catalog_file, monkeypatch):
+    monkeypatch.setattr(cssa_agent, "gemini_initialized", False)
+    return cssa_agent.app.test_client()
+
+
+def test_recommend_degrades_to_local_cross_sell(client):
+    response = client.post("/api/recommend", json={"product_id": "laptop", "limit": 2})
+
+    assert response.status_code == 200
+    assert response.headers["X-CSSA-Backend"] == "local"
+    body = response.get_json()
+    assert [r["product_id"] for r in body["recommendations"]] == ["fakestore_2", "fakestore_3"]
+    assert body["recommendations"][0]["source"] == "local_cross_sell"
+
+
+def test_recommend_without_catalog_match_still_errors(client):
+    response = client.post("/api/recommend", json={"product_id": "submarine", "limit": 2})
+
+    assert response.status_code == 500
+    assert "not initialized" in response.get_json()["message"]
+
+
+def test_ready_warms_up_catalog(client):
+    response = client.get("/api/ready")
+
+    assert response.status_code == 200
+    assert response.get_json()["catalog_products"] == 3
+
+
+def test_ready_is_unavailable_without_catalog(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(cssa_agent, "catalog_cache", CatalogCache(str(tmp_path / "missing.json")))
+
+    assert client.get("/api/ready").status_code == 503
+
+
+def test_llm_recommendations_are_reproducible(catalog_file, monkeypatch):
+    monkeypatch.setenv("CSSA_LLM_BACKEND", "stub")
+    registry = cssa_agent.llm_registry.__class__()
+    registry.register("stub")
+    monkeypatch.setattr(cssa_agent, "llm_registry", registry)
+
+    first = cssa_agent.generate_llm_recommendations("stub", "laptop", 3)
+    second = cssa_agent.generate_llm_recommendations("stub", "laptop", 3)
+
+    assert first == second
+    assert all(0.65 <= r["confidence_score"] <= 0.95 for r in first["recommendations"])
+
+
+def test_history_personalizes_local_recommendations(client, monkeypatch):
+    from user_history import UserHistoryStore
+    monkeypatch.setattr(cssa_agent, "user_history", UserHistoryStore())
+
+    client.post("/api/history", json={"user_id": "u1", "product_id": "fakestore_2", "event": "purchased"})
+    response = client.post("/api/recommend", json={"product_id": "laptop", "limit": 2, "user_id": "u1"})
+
+    assert [r["product_id"] for r in response.get_json()["recommendations"]] == ["fakestore_3"]
+    assert cssa_agent.user_history.recent("u1") == ["fakestore_1"]
+    assert client.post("/api/history", json={"user_id": "u1", "event": "liked"}).status_code == 400
+
+
+def test_recommend_etag_ignores_request_metadata_and_honors_if_none_match(client):
+    first = client.post("/api/recommend", json={"product_id": "laptop", "limit": 2, "session_id": "a"})
+    second = client.get("/api/recommend?product_id=laptop&limit=2&session_id=b")
+
+    assert first.get_json()["request_id"] != second.get_json()["request_id"]
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert first.headers["Cache-Control"] == "public, max-age=60, stale-while-revalidate=300"
+
+    cached = client.get("/api/recommend?product_id=laptop&limit=2",
+                        headers={"If-None-Match": first.headers["ETag"]})
+    assert cached.status_code == 304 and cached.data == b""
+    assert cached.headers["ETag"] == first.headers["ETag"]
+
+    changed = client.get("/api/recommend?product_id=laptop&limit=1",
+                         headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+
+    posted = client.post("/api/recommend", json={"product_id": "laptop", "limit": 2},
+                         headers={"If-None-Match": first.headers["ETag"]})
+    assert posted.status_code == 200 and posted.get_json()["recommendations"]
+
+
+def test_personalized_and_search_cache_policies(client, monkeypatch):
+    from http_cache import CachePolicy
+    from user_history import UserHistoryStore
+    monkeypatch.setitem(cssa_agent.CACHE_POLICIES, "search", CachePolicy(0))
+    monkeypatch.setattr(cssa_agent, "user_history", UserHistoryStore())
+
+    personalized = client.post("/api/recommend", json={"product_id": "laptop", "limit": 2, "user_id": "u9"})
+    search = client.get("/api/search?query=mouse")
+
+    assert personalized.headers["Cache-Control"].startswith("private")
+    assert search.status_code == 200 and search.get_json()["results"][0]["product_id"] == "fakestore_3"
+    assert search.headers["Cache-Control"] == "no-cache"
+
+
+def test_responses_keep_documented_field_order(client):
+    body = client.post("/api/recommend", json={"product_id": "laptop", "limit": 1}).get_data(as_text=True)
+
+    assert body.index('"status"') < body.index('"request_id"') < body.index('"recommendations"')
+    assert body.index('"product_id":"fakestore_2"') < body.index('"confidence_score"')
+
+
+def test_large_json_responses_are_gzipped_when_accepted(client, monkeypatch):
+    import gzip
+    import json
+    from compression import ResponseCompressor
+    monkeypatch.setattr(cssa_agent, "response_compressor", ResponseCompressor(min_bytes=200))
+
+    plain = client.get("/api/search?query=laptop")
+    packed = client.get("/api/search?query=laptop", headers={"Accept-Encoding": "gzip"})
+    small = client.get("/api/ready", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in plain.headers and "Accept-Encoding" in plain.headers["Vary"]
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(packed.data))["results"] == plain.get_json()["results"]
+    assert small.status_code == 200 and len(small.data) < 200
+    assert "Content-Encoding" not in small.headers
+
+
+def test_overloaded_requests_are_shed_to_cache_local_or_503(client, monkeypatch):
+    from admission import AdmissionController, ResultCache
+    monkeypatch.setattr(cssa_agent, "gemini_initialized", True)
+    monkeypatch.setattr(cssa_agent.model_router, "choose", lambda endpoint: "gemini-2.0-flash-exp")
+    admission = AdmissionController(lambda: 50, max_queued=8, retry_after=7)
+    monkeypatch.setattr(cssa_agent, "admission", admission)
+    cache = ResultCache()
+    monkeypatch.setattr(cssa_agent, "recent_recommendations", cache)
+    cache.put(("mouse", 1), [{"product_id": "fakestore_1"}])
+
+    cached = client.get("/api/recommend?product_id=Mouse&limit=1")
+    local = client.get("/api/recommend?product_id=laptop&limit=2")
+    rejected = client.get("/api/recommend?product_id=submarine&limit=2")
+    searched = client.get("/api/search?query=laptop")
+
+    assert cached.headers["X-CSSA-Backend"] == "cache"
+    assert local.status_code == 200 and local.headers["X-CSSA-Backend"] == "local"
+    assert rejected.status_code == 503 and rejected.headers["Retry-After"] == "7"
+    assert searched.status_code == 200 and searched.headers["X-CSSA-Backend"] == "local"
+    stats = client.get("/api/status").get_json()["admission"]
+    assert (stats["admitted"], stats["cached"], stats["local"], stats["rejected"]) == (0, 1, 2, 1)
+
+
+def test_metrics_endpoint_reports_requests_stages_and_cache(client):
+    etag = client.get("/api/search?query=laptop").headers["ETag"]
+    client.get("/api/search?query=laptop", headers={"If-None-Match": etag})
+
+    response = client.get("/api/metrics")
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200 and response.mimetype == "text/plain"
+    assert 'cssa_http_requests_total{endpoint="search",method="GET",status="304"}' in text
+    assert 'cssa_stage_duration_seconds_count{stage="serialization"}' in text
+    assert 'cssa_cache_lookups_total{cache="http_etag",result="hit"}' in text
+    assert "# TYPE cssa_llm_tokens_total counter" in text and "cssa_llm_queue_depth 0" in text
+
+
+def test_admins_can_profile_a_request(client, tmp_path, monkeypatch):
+    monkeypatch.setenv("CSSA_ADMIN_TOKEN", "secret")
+    monkeypatch.setenv("CSSA_LLM_BACKEND", "stub")
+    registry = cssa_agent.llm_registry.__class__()
+    registry.register("stub")
+    monkeypatch.setattr(cssa_agent, "llm_registry", registry)
+    monkeypatch.setattr(cssa_agent, "gemini_initialized", True)
+    monkeypatch.setattr(cssa_agent.model_router, "choose", lambda endpoint: "stub")
+    monkeypatch.setattr(cssa_agent, "PROFILE_DIR", str(tmp_path / "profiles"))
+    url = "/api/recommend?product_id=laptop&limit=2"
+
+    plain = client.get(url, headers={"X-CSSA-Profile": "trace"})
+    profiled = client.get(url + "&profile=trace,cprofile", headers={"X-Admin-Token": "secret"})
+
+    assert "debug" not in plain.get_json()
+    debug = profiled.get_json()["debug"]
+    spans = [span["name"] for span in debug["spans"]]
+    assert spans[:3] == ["prompt_build", "llm_call", "llm_attempt:stub"] and "serialization" in spans
+    assert "cumulative" in debug["cprofile"]
+    assert profiled.headers["Cache-Control"] == "no-store" and "ETag" not in profiled.headers
+    assert sorted(p.suffix for p in (tmp_path / "profiles").iterdir()) == [".json", ".prof"]
+    assert cssa_agent.current_trace.get() is None
+
+
+def test_search_rejects_non_integer_limit(client):
+    assert client.get("/api/search?query=laptop&limit=abc").status_code == 400
+    assert client.post("/api/search", json={"query": "laptop", "limit": "5"}).status_code == 400
+    assert client.get("/api/search?query=laptop&limit=50").status_code == 200
+
+
+def test_admin_edits_never_change_a_published_catalog(client, monkeypatch):
+    import copy
+    monkeypatch.setenv("CSSA_ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(cssa_agent, "_catalog_index", None)
+    published = cssa_agent.catalog_cache.get()[1]
+    before = copy.deepcopy(published)
+    lamp = {"name": "Laptop Lamp", "category": "laptops", "price": 30}
+    headers = {"X-Admin-Token": "secret"}
+
+    monkeypatch.setattr(cssa_agent, "save_to_file", lambda products, path: None)
+    failed = client.put("/api/admin/products/fakestore_4", json=lamp, headers=headers)
+    assert failed.status_code == 500
+    assert cssa_agent.catalog_cache.get()[1] == before and "fakestore_4" not in cssa_agent.get_catalog_index().products
+
+    monkeypatch.setattr(cssa_agent, "save_to_file", save_to_file)
+    saved = client.put("/api/admin/products/fakestore_4", json=lamp, headers=headers)
+    assert saved.status_code == 200 and "fakestore_4" in cssa_agent.catalog_cache.get()[1]
+    assert published == before
+
+
+def test_admitted_requests_release_their_slot_on_llm_failure(client, monkeypatch):
+    from admission import AdmissionController
+    monkeypatch.setattr(cssa_agent, "gemini_initialized", True)
+    monkeypatch.setattr(cssa_agent.model_router, "choose", lambda endpoint: "gemini-2.0-flash-exp")
+    admission = AdmissionController(lambda: 0)
+    monkeypatch.setattr(cssa_agent, "admission", admission)
+
+    seen = []
+
+    def boom(*args):
+        seen.append(admission.in_flight)
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(cssa_agent, "generate_llm_recommendations", boom)
+    response = client.get("/api/recommend?product_id=laptop&limit=2")
+
+    assert response.headers["X-CSSA-Backend"] == "local"
+    assert seen == [1] and admission.stats()["admitted"] == 1 and admission.in_flight == 0
+
+
+def test_history_rejects_non_string_and_unknown_products(client, monkeypatch):
+    from user_history import UserHistoryStore
+    monkeypatch.setattr(cssa_agent, "user_history", UserHistoryStore())
+
+    assert client.post("/api/history", json={"user_id": "u1", "product_id": {"a": 1}}).status_code == 400
+    assert client.post("/api/history", json={"user_id": ["u1"], "product_id": "fakestore_1"}).status_code == 400
+    assert client.post("/api/history", json=["u1"]).status_code == 400
+    assert client.post("/api/history", json={"user_id": "u1", "product_id": "made_up_1"}).status_code == 404
+    assert cssa_agent.user_history.stats()["interned_products"] == 0
+
+
+def test_history_post_does_not_reveal_a_users_history(client, monkeypatch):
+    from user_history import UserHistoryStore
+    monkeypatch.setattr(cssa_agent, "user_history", UserHistoryStore())
+    client.post("/api/history", json={"user_id": "victim", "product_id": "fakestore_2", "event": "purchased"})
+
+    response = client.post("/api/history", json={"user_id": "victim", "product_id": "fakestore_1"})
+    body = response.get_json()
+
+    assert response.status_code == 200 and "fakestore_2" not in response.get_data(as_text=True)
+    assert "viewed" not in body and "purchased" not in body
+    assert (body["recorded"], body["viewed_count"], body["purchased_count"]) == (True, 1, 1)
+
+
+def test_llm_recommendations_search_the_catalog_once(client, monkeypatch):
+    monkeypatch.setenv("CSSA_LLM_BACKEND", "stub")
+    registry = cssa_agent.llm_registry.__class__()
+    registry.register("stub")
+    monkeypatch.setattr(cssa_agent, "llm_registry", registry)
+    monkeypatch.setattr(cssa_agent, "gemini_initialized", True)
+    monkeypatch.setattr(cssa_agent.model_router, "choose", lambda endpoint: "stub")
+    searches = []
+    search = cssa_agent.basic_search_products
+    monkeypatch.setattr(cssa_agent, "basic_search_products", lambda *args: searches.append(args) or search(*args))
+
+    response = client.get("/api/recommend?product_id=laptop&limit=2")
+
+    assert response.headers["X-CSSA-Backend"] == "stub" and len(searches) == 1
+
+
+def test_recommend_rejects_non_string_product_or_user_id(client):
+    assert client.post("/api/recommend", json={"product_id": 12345}).status_code == 400
+    assert client.post("/api/recommend", json={"product_id": "laptop", "user_id": ["u1"]}).status_code == 400
+    assert client.post("/api/recommend", json={"product_id": "laptop", "user_id": None}).status_code == 200
+
+
+def test_admin_put_rejects_malformed_products(client, monkeypatch):
+    monkeypatch.setenv("CSSA_ADMIN_TOKEN", "secret")
+    headers = {"X-Admin-Token": "secret"}
+
+    assert client.put("/api/admin/products/custom_1", json=["Lamp"], headers=headers).status_code == 400
+    assert client.put("/api/admin/products/custom_1", headers=headers, json={
+        "name": "Lamp", "category": "lighting", "price": 9, "description": {"long": "text"}}).status_code == 400
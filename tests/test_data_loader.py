@@ -0,0 +1,138 @@
+import json
+
+import pytest
+
+from cross_sell_scoring import score_cross_sell_mappings
+from data_loader import (CatalogCache, CrossSellIndex, make_product_record, map_fake_store_to_cssa,
+                         read_catalog_version, save_to_file, stream_ingest)
+
+
+def test_stream_ingest_ndjson_matches_api_mapper(tmp_path):
+    rows = [
+        {"id": i, "title": f"Item {i}", "price": 10.0 + i, "category": "electronics",
+         "description": "desc", "image": "", "rating": {"rate": 4.1, "count": 3}}
+        for i in range(1, 6)
+    ]
+    dump = tmp_path / "dump.ndjson"
+    dump.write_text("\n".join(json.dumps(r) for r in rows) + "\n\nnot json\n")
+    out = tmp_path / "products.json"
+
+    written = stream_ingest(str(dump), str(out), source="fakestore", chunk_size=2)
+
+    assert written == 5
+    assert json.loads(out.read_text()) == map_fake_store_to_cssa(rows)
+
+
+def test_stream_ingest_csv_coerces_numbers(tmp_path):
+    dump = tmp_path / "dump.csv"
+    dump.write_text(
+        "id,title,price,category,description,thumbnail,rating\n"
+        "7,Desk Lamp,19.5,lighting,Warm light,,4.5\n"
+        "8,Sofa,499,furniture,,,\n"
+    )
+    out = tmp_path / "products.json"
+
+    assert stream_ingest(str(dump), str(out), source="dummyjson") == 2
+
+    products = json.loads(out.read_text())
+    assert products["dummyjson_7"]["price"] == 19.5
+    assert products["dummyjson_7"]["rating"] == 4.5
+    assert products["dummyjson_8"]["description"] == ""
+    assert products["dummyjson_8"]["cross_sell"] == []
+
+
+def test_stream_ingest_empty_dump(tmp_path):
+    dump = tmp_path / "empty.ndjson"
+    dump.write_text("")
+    out = tmp_path / "products.json"
+
+    assert stream_ingest(str(dump), str(out)) == 0
+    assert json.loads(out.read_text()) == {}
+
+
+def _small_catalog():
+    def product(i, name, category, price, rating):
+        return f"fakestore_{i}", {"id": i, "name": name, "category": category, "price": price,
+                                  "rating": rating, "description": "", "source": "fakestore", "cross_sell": []}
+
+    catalog = dict([
+        product(1, "Gaming Laptop", "laptops", 999.0, 4.5),
+        product(2, "Laptop Sleeve", "accessories", 25.0, 4.0),
+        product(3, "Office Laptop", "laptops", 650.0, 3.9),
+        product(4, "Rose Perfume", "fragrances", 60.0, 4.8),
+        product(5, "Wireless Mouse", "electronics", 20.0, 4.2),
+        product(6, "Face Cream", "skincare", 15.0, 3.0),
+    ])
+    return score_cross_sell_mappings(catalog, top_k=3)
+
+
+def test_cross_sell_index_upsert_updates_affected_lists():
+    catalog = _small_catalog()
+    index = CrossSellIndex(catalog, top_k=3)
+
+    changed = index.upsert("fakestore_7", make_product_record("fakestore_7", {
+        "name": "Gaming Laptop Pro", "category": "laptops", "price": 1099, "rating": 5}))
+
+    assert "fakestore_7" in catalog and catalog["fakestore_7"]["id"] == 7
+    assert "fakestore_1" in changed
+    assert catalog["fakestore_1"]["cross_sell"][0] == "fakestore_7"
+    assert "fakestore_7" not in catalog["fakestore_6"]["cross_sell"]
+    assert "fakestore_1" in index.contained_in["fakestore_7"]
+
+
+def test_cross_sell_index_delete_refills_referencing_lists():
+    catalog = _small_catalog()
+    index = CrossSellIndex(catalog, top_k=3)
+    referencing = {pid for pid, p in catalog.items() if "fakestore_3" in p["cross_sell"]}
+
+    assert index.delete("fakestore_3") == referencing
+    assert "fakestore_3" not in catalog
+    assert all("fakestore_3" not in p["cross_sell"] for p in catalog.values())
+    assert all(len(p["cross_sell"]) == 3 for p in catalog.values())
+
+
+def test_make_product_record_requires_fields():
+    with pytest.raises(ValueError):
+        make_product_record("custom_1", {"name": "Lamp"})
+    for payload in (["Lamp"], {"name": {"en": "Lamp"}, "category": "lighting", "price": 9},
+                    {"name": "Lamp", "category": "lighting", "price": 9, "description": 5},
+                    {"name": "Lamp", "category": "lighting", "price": True},
+                    {"name": "Lamp", "category": "lighting", "price": 9, "rating": "good"}):
+        with pytest.raises(ValueError):
+            make_product_record("custom_1", payload)
+
+
+def test_cross_sell_index_upsert_updates_a_bounded_number_of_lists():
+    catalog = _small_catalog()
+    index = CrossSellIndex(catalog, top_k=3, max_list_updates=1)
+
+    changed = index.upsert("fakestore_7", make_product_record("fakestore_7", {
+        "name": "Gaming Laptop Pro", "category": "laptops", "price": 1099, "rating": 5}))
+
+    assert changed == {"fakestore_7", "fakestore_1"}
+
+
+def test_save_to_file_is_atomic_and_versioned(tmp_path):
+    path = str(tmp_path / "products.json")
+
+    assert read_catalog_version(path) == 0
+    assert save_to_file({"a_1": {"name": "A"}}, path) == 1
+    assert save_to_file({"a_1": {"name": "A"}, "a_2": {"name": "B"}}, path) == 2
+
+    assert json.loads(open(path).read()) == {"a_1": {"name": "A"}, "a_2": {"name": "B"}}
+    assert read_catalog_version(path) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["products.json", "products.json.lock", "products.json.version"]
+
+
+def test_catalog_cache_reloads_only_on_new_version(tmp_path):
+    path = str(tmp_path / "products.json")
+    cache = CatalogCache(path)
+    assert cache.get() == (0, None)
+
+    save_to_file({"a_1": {"name": "A"}}, path)
+    version, first = cache.get()
+    assert version == 1
+    assert cache.get()[1] is first
+
+    save_to_file({"a_2": {"name": "B"}}, path)
+    assert cache.get() == (2, {"a_2": {"name": "B"}})
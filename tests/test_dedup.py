@@ -0,0 +1,34 @@
+from dedup import deduplicate_products, find_duplicate_groups, normalize_title
+
+
+def _product(name, price, source):
+    return {"name": name, "price": price, "category": "electronics", "source": source, "cross_sell": []}
+
+
+def test_normalize_title():
+    assert normalize_title("  Café  Backpack, Fits 15\" Laptops!") == "cafe backpack fits 15 laptops"
+
+
+def test_cross_source_near_duplicates_are_merged():
+    products = {
+        "fakestore_1": _product("Fjallraven - Foldsack No. 1 Backpack, Fits 15 Laptops", 109.95, "fakestore"),
+        "fakestore_2": _product("Mens Casual Premium Slim Fit T-Shirts", 22.3, "fakestore"),
+        "dummyjson_9": _product("Fjallraven Foldsack No 1 Backpack fits 15 laptops", 104.99, "dummyjson"),
+        "dummyjson_10": _product("Fjallraven Foldsack No 1 Backpack fits 15 laptops", 300.0, "dummyjson"),
+    }
+    aliases = {}
+
+    deduped = deduplicate_products(products, alias_map=aliases)
+
+    assert list(deduped) == ["fakestore_1", "fakestore_2", "dummyjson_10"]
+    assert deduped["fakestore_1"]["aliases"] == ["dummyjson_9"]
+    assert aliases == {"dummyjson_9": "fakestore_1"}
+    assert "aliases" not in products["fakestore_1"]
+
+
+def test_same_source_items_are_not_grouped():
+    products = {
+        "fakestore_1": _product("USB-C Charging Cable", 9.99, "fakestore"),
+        "fakestore_2": _product("USB-C Charging Cable", 9.99, "fakestore"),
+    }
+    assert find_duplicate_groups(products) == []
@@ -0,0 +1,143 @@
+import json
+
+import pytest
+
+from gemini_ai import GeminiRecommendationEngine
+
+
+class FakeModel:
+    """Records prompts and answers with a canned response"""
+
+    def __init__(self, text):
+        self.text = text
+        self.prompts = []
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        return self
+
+
+def _product(source, pid, name, category, price):
+    return {"id": pid, "name": name, "category": category, "price": price, "description": "",
+            "rating": 4.0, "source": source, "cross_sell": []}
+
+
+@pytest.fixture
+def catalog():
+    return {
+        "fakestore_1": _product("fakestore", 1, "Backpack", "men's clothing", 109.95),
+        "fakestore_2": _product("fakestore", 2, "Slim Fit T-Shirt", "men's clothing", 22.3),
+        "dummyjson_1": _product("dummyjson", 1, "Essence Mascara", "beauty", 9.99),
+        "dummyjson_2": _product("dummyjson", 2, "Eyeshadow Palette", "beauty", 19.99),
+    }
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    engine = GeminiRecommendationEngine()
+    engine.enabled = True
+    return engine
+
+
+def test_find_product_key_uses_source_and_id(engine, catalog):
+    engine.build_indexes(catalog, catalog_version=1)
+
+    assert engine.find_product_key(catalog["dummyjson_1"]) == "dummyjson_1"
+    assert engine.find_product_key(catalog["fakestore_1"]) == "fakestore_1"
+    assert engine.products_in_category("beauty") == ["dummyjson_1", "dummyjson_2"]
+
+
+def test_ranked_candidates_put_cross_sell_first(engine, catalog):
+    catalog["fakestore_1"]["cross_sell"] = ["dummyjson_2", "fakestore_2"]
+    engine.build_indexes(catalog, catalog_version=1)
+
+    ranked = engine.rank_candidates(catalog["fakestore_1"], "fakestore_1")
+
+    assert [c["product_id"] for c in ranked] == ["dummyjson_2", "fakestore_2"]
+    assert ranked[0]["score"] > ranked[1]["score"]
+
+
+def test_recommendations_use_ranked_candidates_and_reuse_indexes(engine, catalog):
+    engine.model = FakeModel(json.dumps([
+        {"product_id": "dummyjson_1", "reason": "Same item"},
+        {"product_id": "dummyjson_2", "reason": "Pairs well"},
+    ]))
+
+    recs = engine.generate_recommendations_from_catalog(catalog["dummyjson_1"], catalog, limit=2, catalog_version=7)
+    indexes = engine._by_source_id
+    engine.generate_recommendations_from_catalog(catalog["dummyjson_1"], catalog, limit=2, catalog_version=7)
+
+    assert [r["product_id"] for r in recs] == ["dummyjson_2"]
+    assert engine._by_source_id is indexes
+    assert "ID: dummyjson_2," in engine.model.prompts[0]
+    assert "ID: dummyjson_1," not in engine.model.prompts[0]
+    assert "ID: fakestore_1," not in engine.model.prompts[0]
+
+
+def test_unversioned_catalogs_are_never_reused(engine, catalog):
+    engine.model = FakeModel(json.dumps([{"product_id": "dummyjson_2", "reason": "Pairs well"}]))
+
+    engine.generate_recommendations_from_catalog(catalog["dummyjson_1"], catalog, limit=1)
+    replacement = {"dummyjson_9": _product("dummyjson", 9, "Lip Gloss", "beauty", 5.0)}
+    engine.model.text = json.dumps([{"product_id": "dummyjson_9", "reason": "Pairs well"}])
+    engine.generate_recommendations_from_catalog(catalog["dummyjson_1"], replacement, limit=1)
+
+    assert engine._by_key is replacement
+
+
+def test_unrankable_products_use_cached_catalog_prefix(engine, catalog):
+    engine.model = FakeModel(json.dumps([{"product_id": "fakestore_2", "reason": "Pairs well"}]))
+    toy = _product("custom", 1, "Toy Robot", "toys", 30.0)
+
+    engine.generate_recommendations_from_catalog(toy, catalog, limit=1, catalog_version=1)
+    prefix = engine._catalog_prefix
+    engine.generate_recommendations_from_catalog(dict(toy, name="Toy Car"), catalog, limit=1, catalog_version=1)
+    catalog["fakestore_2"]["name"] = "Relaxed Fit T-Shirt"
+    engine.generate_recommendations_from_catalog(toy, catalog, limit=1, catalog_version=2)
+
+    first, second, third = engine.model.prompts
+    assert first.startswith(prefix) and second.startswith(prefix)
+    assert "Name: Toy Robot" in first and "Name: Toy Car" in second
+    assert "Slim Fit T-Shirt" in first and "Relaxed Fit T-Shirt" in third
+
+
+def test_bulk_reasons_use_one_call_and_cache_pairs(engine, catalog):
+    engine.build_indexes(catalog, catalog_version=1)
+    engine.model = FakeModel("```json\n" + json.dumps({
+        "fakestore_2": "Completes the outfit", "dummyjson_2": "Finish the look"}) + "\n```")
+    main, recs = catalog["fakestore_1"], [catalog["fakestore_2"], catalog["dummyjson_2"]]
+
+    reasons = engine.generate_personalized_reasons(main, recs)
+    again = engine.generate_personalized_reasons(main, recs)
+
+    assert reasons == {"fakestore_2": "Completes the outfit", "dummyjson_2": "Finish the look"}
+    assert again == reasons
+    assert len(engine.model.prompts) == 1
+    assert engine.generate_personalized_reason(main, catalog["fakestore_2"]) == "Completes the outfit"
+    assert len(engine.model.prompts) == 1
+
+
+def test_bulk_reasons_fall_back_for_missing_ids(engine, catalog):
+    engine.build_indexes(catalog, catalog_version=1)
+    engine.model = FakeModel(json.dumps({"fakestore_2": "Completes the outfit"}))
+
+    reasons = engine.generate_personalized_reasons(catalog["fakestore_1"], [catalog["fakestore_2"], catalog["dummyjson_2"]])
+
+    assert reasons["dummyjson_2"] == "Complements Backpack"
+    assert ("fakestore_1", "dummyjson_2") not in engine._reason_cache
+
+
+def test_history_boosts_viewed_and_drops_purchased(catalog):
+    from user_history import PURCHASED, UserHistoryStore
+
+    engine = GeminiRecommendationEngine(history=UserHistoryStore())
+    catalog["dummyjson_1"]["cross_sell"] = ["dummyjson_2", "fakestore_1", "fakestore_2"]
+    engine.build_indexes(catalog, catalog_version=1)
+    engine.history.record("u1", "fakestore_2")
+    engine.history.record("u1", "dummyjson_2", PURCHASED)
+
+    ranked = [c["product_id"] for c in engine.rank_candidates(catalog["dummyjson_1"], "dummyjson_1", user_id="u1")]
+
+    assert ranked == ["fakestore_2", "fakestore_1"]
+    assert [c["product_id"] for c in engine.rank_candidates(catalog["dummyjson_1"], "dummyjson_1")][0] == "dummyjson_2"
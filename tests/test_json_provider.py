@@ -0,0 +1,48 @@
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from json_provider import ORJSON_AVAILABLE, OrderedJSONProvider, OrjsonProvider, json_provider_class
+
+PAYLOAD = OrderedDict([
+    ("status", "success"),
+    ("query", "café"),
+    ("count", 1),
+    ("results", [OrderedDict([("product_id", "fakestore_1"), ("name", "Backpack"), ("price", 109.95)])]),
+    ("timestamp", datetime(2024, 1, 2, 3, 4, 5)),
+])
+
+
+def _body(provider_class):
+    app = Flask(__name__)
+    app.json = provider_class(app)
+    with app.app_context():
+        return app.json.response(PAYLOAD).get_data()
+
+
+@pytest.mark.parametrize("provider_class", [OrderedJSONProvider, OrjsonProvider])
+def test_providers_keep_field_order_and_flask_types(provider_class):
+    if provider_class is OrjsonProvider and not ORJSON_AVAILABLE:
+        pytest.skip("orjson not installed")
+
+    body = _body(provider_class)
+
+    assert list(json.loads(body)) == ["status", "query", "count", "results", "timestamp"]
+    assert json.loads(body) == json.loads(_body(OrderedJSONProvider))
+    assert json.loads(body)["timestamp"] == "Tue, 02 Jan 2024 03:04:05 GMT"
+    assert body.endswith(b"\n")
+
+
+def test_provider_selection(monkeypatch):
+    monkeypatch.setenv("CSSA_JSON_SERIALIZER", "stdlib")
+    assert json_provider_class() is OrderedJSONProvider
+
+    monkeypatch.setenv("CSSA_JSON_SERIALIZER", "auto")
+    assert json_provider_class() is (OrjsonProvider if ORJSON_AVAILABLE else OrderedJSONProvider)
+
+    monkeypatch.setenv("CSSA_JSON_SERIALIZER", "yaml")
+    with pytest.raises(ValueError):
+        json_provider_class()
@@ -0,0 +1,140 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import cssa_agent
+from gemini_ai import GeminiRecommendationEngine
+from llm_backend import (BackendRegistry, HttpBackend, StubBackend, StubBackendError, create_backend,
+                         parse_latency_spec, serve_stub)
+
+
+@pytest.fixture
+def catalog():
+    def product(i, name, category, price, cross_sell):
+        return {"id": i, "name": name, "category": category, "price": price, "description": "",
+                "rating": 4.0, "source": "fakestore", "cross_sell": cross_sell}
+
+    return {
+        "fakestore_1": product(1, "Gaming Laptop", "laptops", 999.0, ["fakestore_2", "fakestore_3"]),
+        "fakestore_2": product(2, "Laptop Sleeve", "accessories", 25.0, ["fakestore_1"]),
+        "fakestore_3": product(3, "Wireless Mouse", "electronics", 20.0, ["fakestore_1"]),
+    }
+
+
+def test_create_backend_follows_env(monkeypatch):
+    monkeypatch.setenv("CSSA_LLM_BACKEND", "stub")
+    monkeypatch.setenv("CSSA_STUB_MALFORMED_RATE", "0.25")
+
+    backend = create_backend("gemini-2.5-flash")
+
+    assert isinstance(backend, StubBackend)
+    assert backend.name == "gemini-2.5-flash" and backend.malformed_rate == 0.25
+
+    monkeypatch.setenv("CSSA_LLM_BACKEND", "carrier-pigeon")
+    with pytest.raises(ValueError):
+        create_backend("gemini-2.5-flash")
+
+
+def test_latency_specs():
+    import random
+    rng = random.Random(1)
+
+    assert parse_latency_spec("fixed:12")(rng) == 12
+    assert 5 <= parse_latency_spec("uniform:5,10")(rng) <= 10
+    samples = sorted(parse_latency_spec("lognormal:100,400")(rng) for _ in range(2000))
+    assert 80 < samples[1000] < 125 and 300 < samples[1900] < 520
+    with pytest.raises(ValueError):
+        parse_latency_spec("lognormal:400,100")
+
+
+def test_stub_answers_engine_prompts_deterministically(monkeypatch, catalog):
+    monkeypatch.setenv("CSSA_LLM_BACKEND", "stub")
+    engine = GeminiRecommendationEngine()
+
+    first = engine.generate_recommendations_from_catalog(catalog["fakestore_1"], catalog, limit=2, catalog_version=1)
+    second = engine.generate_recommendations_from_catalog(catalog["fakestore_1"], catalog, limit=2, catalog_version=1)
+    reasons = engine.generate_personalized_reasons(catalog["fakestore_1"], [catalog["fakestore_2"]])
+
+    assert engine.enabled
+    assert [r["product_id"] for r in first] == ["fakestore_2", "fakestore_3"]
+    assert first == second
+    assert not reasons["fakestore_2"].startswith("Complements")
+
+
+def test_malformed_and_truncated_answers_go_through_repair(monkeypatch, catalog):
+    monkeypatch.setenv("CSSA_LLM_BACKEND", "stub")
+    stub = StubBackend(malformed_rate=1.0, truncate_rate=1.0, seed=3)
+    registry = BackendRegistry()
+    registry.register("stub")
+    registry._backends["stub"] = stub
+    monkeypatch.setattr(cssa_agent, "llm_registry", registry)
+
+    text = stub.generate_content('Generate 2 product recommendations "recommendations": [').text
+    with pytest.raises(ValueError):
+        json.loads(text)
+
+    data = cssa_agent.generate_llm_recommendations("stub", "laptop", 2)
+    assert 1 <= len(data["recommendations"]) <= 2
+
+
+def test_http_stub_round_trip():
+    stub = StubBackend(seed=5)
+    server = serve_stub(stub, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = HttpBackend(f"http://127.0.0.1:{server.server_address[1]}")
+        prompt = 'USER QUERY: "mouse"\n- ID: fakestore_3, Name: Wireless Mouse, Category: electronics, Price: $20'
+        assert client.generate_content(prompt).text == stub.generate_content(prompt).text == '["fakestore_3"]'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_registry_builds_each_backend_once_on_first_use(monkeypatch):
+    monkeypatch.setenv("CSSA_LLM_BACKEND", "stub")
+    registry = BackendRegistry()
+    registry.register("gemini-2.5-flash")
+
+    assert registry.stats()["models"] == {"gemini-2.5-flash": False}
+    assert registry.get("gemini-2.5-flash") is registry.get("gemini-2.5-flash")
+    assert registry.warm_up() == {"gemini-2.5-flash": True}
+    with pytest.raises(KeyError):
+        registry.get("unregistered")
+
+
+def test_registry_reports_build_errors(monkeypatch):
+    monkeypatch.setenv("CSSA_LLM_BACKEND", "gemini")
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    registry = BackendRegistry()
+    registry.register("gemini-2.5-flash")
+
+    assert not registry.available()
+    assert registry.warm_up() == {"gemini-2.5-flash": False}
+    assert "GEMINI_API_KEY" in registry.stats()["errors"]["gemini-2.5-flash"]
+
+
+def test_importing_the_app_does_not_import_the_sdk():
+    code = "import sys, cssa_agent; print('google.generativeai' in sys.modules)"
+    env = dict(os.environ, GEMINI_API_KEY="test-key", CSSA_LLM_BACKEND="gemini")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(cssa_agent.__file__)), env=env)
+
+    assert result.stdout.strip() == "False"
+
+
+def test_stub_faults_vary_between_calls_of_one_prompt():
+    stub = StubBackend(error_rate=0.5, seed=1)
+    prompt = 'USER QUERY: "laptop" top 1 ["fakestore_1"]'
+    outcomes = set()
+    for _ in range(20):
+        try:
+            outcomes.add(stub.generate_content(prompt).text)
+        except StubBackendError:
+            outcomes.add("error")
+
+    assert len(outcomes) == 2 and "error" in outcomes
@@ -0,0 +1,52 @@
+import json
+import logging
+import os
+
+import pytest
+
+import log_config
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = str(tmp_path / "app.log")
+    log_config.configure_logging(level="INFO", fmt="json", log_file=path)
+    yield path
+    log_config.set_payload_sample_rate(float(os.getenv("CSSA_LOG_PAYLOAD_SAMPLE_RATE", 0.01)))
+    log_config.configure_logging()
+
+
+def read_records(path):
+    log_config.shutdown_logging()  # Drains the queue
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_written_as_json_lines_by_the_listener(log_file):
+    logger = logging.getLogger("cssa.test")
+    logger.info("Recommendation for %s", "laptop", extra={"backend": "stub"})
+    try:
+        raise ValueError("bad json")
+    except ValueError:
+        logger.exception("Parse failed")
+
+    first, second = read_records(log_file)
+
+    assert first["level"] == "INFO" and first["logger"] == "cssa.test"
+    assert first["message"] == "Recommendation for laptop" and first["backend"] == "stub"
+    assert second["message"] == "Parse failed" and "ValueError: bad json" in second["exc_info"]
+
+
+def test_raw_payloads_are_sampled(log_file):
+    logger = logging.getLogger("cssa.test")
+    log_config.set_payload_sample_rate(0)
+    for _ in range(20):
+        log_config.log_payload(logger, "Model output", "x" * 500)
+    log_config.set_payload_sample_rate(1)
+    log_config.log_payload(logger, "Model output", "x" * 500, max_chars=300, backend="stub")
+
+    records = read_records(log_file)
+
+    assert len(records) == 1
+    assert len(records[0]["payload"]) == 300 and records[0]["payload_chars"] == 500
+    assert records[0]["backend"] == "stub"
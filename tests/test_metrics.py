@@ -0,0 +1,61 @@
+import threading
+
+from metrics import MetricsRegistry
+
+
+def test_counter_sums_per_thread_shards_including_exited_threads():
+    registry = MetricsRegistry()
+    counter = registry.counter("jobs_total", "Jobs", ("kind",))
+
+    def work():
+        for _ in range(1000):
+            counter.labels("a").inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.labels("b").inc(2.5)
+
+    assert counter.labels("a").value() == 4000
+    assert 'jobs_total{kind="a"} 4000' in registry.render()
+    assert 'jobs_total{kind="b"} 2.5' in registry.render()
+
+
+def test_exited_thread_shards_are_retired_without_a_scrape():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests").labels()
+
+    for _ in range(50):
+        thread = threading.Thread(target=counter.inc)
+        thread.start()
+        thread.join()
+
+    assert len(counter._shards._live) == 1
+    assert counter.value() == 50
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "Stage", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.labels("llm_call").observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert 'stage_seconds_bucket{stage="llm_call",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="llm_call",le="1.0"} 3' in lines
+    assert 'stage_seconds_bucket{stage="llm_call",le="+Inf"} 4' in lines
+    assert 'stage_seconds_sum{stage="llm_call"} 4.05' in lines
+    assert 'stage_seconds_count{stage="llm_call"} 4' in lines
+
+
+def test_callback_metrics_are_read_at_scrape_time():
+    registry = MetricsRegistry()
+    depth = [3]
+    registry.callback("queue_depth", "Queue", "gauge", (), lambda: {(): depth[0]})
+
+    assert "queue_depth 3" in registry.render()
+    depth[0] = 0
+    assert "queue_depth 0" in registry.render()
@@ -0,0 +1,41 @@
+import pytest
+
+from model_output import clean_model_json, parse_model_json
+
+EXPECTED = {"recommendations": [{"product_id": "p1", "price": 9.5}]}
+
+
+@pytest.mark.parametrize("raw", [
+    '{"recommendations": [{"product_id": "p1", "price": 9.5}]}',
+    '```json\n{"recommendations": [{"product_id": "p1", "price": 9.5}]}\n```',
+    'Here are the results:\n{"recommendations": [{"product_id": "p1", "price": 9.5}]} Enjoy!',
+    "{'recommendations': [{'product_id': 'p1', 'price': 9.5}]}",
+    '{"recommendations": [{"product_id": "p1", "price": 9.5},],}',
+    '{"recommendations": [{"product_id": "p1", "price": 9.5}',
+])
+def test_common_defects_are_cleaned_without_repair(raw):
+    assert parse_model_json(raw) == (EXPECTED, False)
+
+
+def test_arrays_are_cleaned_too():
+    assert clean_model_json("```\n['p1', 'p2',]\n```", "[") == '["p1", "p2"]'
+    assert parse_model_json('Results: ["p1", "p2"', "[") == (["p1", "p2"], False)
+
+
+def test_json_repair_is_the_fallback_and_stages_are_reported():
+    stages = []
+
+    class Stage:
+        def __init__(self, name):
+            stages.append(name)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+    data, repaired = parse_model_json('{"recommendations": [{"product_id": "p1" "price": 9.5}]}', stage=Stage)
+
+    assert repaired and data == EXPECTED
+    assert stages == ["json_clean", "json_repair"]
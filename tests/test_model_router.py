@@ -0,0 +1,40 @@
+from model_router import LOCAL_BACKEND, SLO, ModelRouter, parse_model_list
+
+
+def _router(**kwargs):
+    router = ModelRouter({"recommend": SLO(p95_ms=1000, max_error_rate=0.2)}, min_samples=3, **kwargs)
+    router.register("gemini-2.5-flash", cost=3)
+    router.register("gemini-2.0-flash-exp", cost=1)
+    return router
+
+
+def test_cheapest_backend_wins_until_it_breaches_slo():
+    router = _router()
+    assert router.choose("recommend") == "gemini-2.0-flash-exp"
+
+    for _ in range(3):
+        router.record("gemini-2.0-flash-exp", 2500, True)
+    assert router.choose("recommend") == "gemini-2.5-flash"
+
+
+def test_degrades_to_local_when_no_backend_is_healthy():
+    router = _router()
+    for name in router.backends:
+        for _ in range(3):
+            router.record(name, 100, False)
+
+    assert router.choose("recommend") == LOCAL_BACKEND
+    stats = {b["name"]: b for b in router.stats()["backends"]}
+    assert stats["gemini-2.5-flash"]["error_rate"] == 1.0
+
+
+def test_old_samples_expire():
+    router = _router(window_seconds=0)
+    for _ in range(3):
+        router.record("gemini-2.0-flash-exp", 5000, False)
+
+    assert router.choose("recommend") == "gemini-2.0-flash-exp"
+
+
+def test_parse_model_list_defaults_cost_to_position():
+    assert parse_model_list("a, b:0.5,") == [("a", 1.0), ("b", 0.5)]
@@ -0,0 +1,35 @@
+import os
+import time
+
+from profiling import RequestTrace, current_trace, parse_modes, record_span
+
+
+def test_parse_modes_keeps_known_modes_only():
+    assert parse_modes("Trace, cprofile,bogus") == {"trace", "cprofile"}
+    assert parse_modes("") == frozenset() and parse_modes(None) == frozenset()
+
+
+def test_spans_are_recorded_only_while_a_trace_is_active():
+    record_span("ignored", time.perf_counter(), 0.001)
+    trace = RequestTrace({"trace"}, "recommend")
+    trace.start()
+    record_span("llm_call", time.perf_counter(), 0.25)
+    trace.stop()
+    record_span("after", time.perf_counter(), 0.001)
+
+    result = trace.to_dict()
+    assert [span["name"] for span in result["spans"]] == ["llm_call"]
+    assert result["spans"][0]["duration_ms"] == 250.0
+    assert "cprofile" not in result and current_trace.get() is None
+
+
+def test_cprofile_output_and_dump(tmp_path):
+    trace = RequestTrace({"cprofile"}, "search")
+    trace.start()
+    sorted(range(1000), key=lambda i: -i)
+    trace.stop()
+    trace.stop()  # Idempotent
+
+    path = trace.dump(str(tmp_path))
+    assert "cumulative" in trace.to_dict()["cprofile"]
+    assert path.endswith(".json") and os.path.exists(path[:-len(".json")] + ".prof")
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+from rate_limiter import (PRIORITY_BATCH, PRIORITY_INTERACTIVE, OutboundLimiter, RateLimitExceeded,
+                          is_retryable)
+
+
+class ResourceExhausted(Exception):
+    """Stand-in with the same class name as google.api_core's 429 error"""
+
+
+def test_bucket_paces_requests_per_minute():
+    limiter = OutboundLimiter(requests_per_minute=600, max_wait=1)
+    started = time.monotonic()
+    for _ in range(601):
+        limiter.acquire()
+
+    assert time.monotonic() - started >= 0.09  # 601st request waits ~0.1s for a refill
+
+
+def test_queue_bound_and_timeout():
+    limiter = OutboundLimiter(requests_per_minute=1, max_queue=1)
+    limiter.acquire()  # Drains the bucket
+
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(timeout=0.05)
+    assert limiter.stats()["timeouts"] == 1
+
+    waiter = threading.Thread(target=lambda: pytest.raises(RateLimitExceeded, limiter.acquire, timeout=0.3))
+    waiter.start()
+    time.sleep(0.05)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(timeout=0.05)
+    waiter.join()
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_interactive_lane_jumps_ahead_of_batch():
+    limiter = OutboundLimiter(requests_per_minute=600, max_wait=2)
+    for _ in range(600):
+        limiter.acquire()
+    order = []
+
+    def worker(priority, name):
+        limiter.acquire(priority=priority)
+        order.append(name)
+
+    batch = threading.Thread(target=worker, args=(PRIORITY_BATCH, "batch"))
+    batch.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=worker, args=(PRIORITY_INTERACTIVE, "interactive"))
+    interactive.start()
+    batch.join()
+    interactive.join()
+
+    assert order == ["interactive", "batch"]
+
+
+def test_call_retries_retryable_errors_only():
+    limiter = OutboundLimiter(base_delay=0.001, max_retries=2)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ResourceExhausted("429 quota exceeded")
+        return "ok"
+
+    assert limiter.call(flaky) == "ok"
+    assert limiter.stats()["retries"] == 2
+
+    with pytest.raises(ValueError):
+        limiter.call(lambda: (_ for _ in ()).throw(ValueError("bad prompt")))
+    assert not is_retryable(ValueError("bad prompt"))
@@ -0,0 +1,52 @@
+from user_history import PURCHASED, VIEWED, UserHistoryStore
+
+
+def test_ring_buffer_keeps_newest_without_duplicates():
+    store = UserHistoryStore(history_size=3)
+    for key in ["a", "b", "c", "b", "d"]:
+        store.record("u1", key)
+
+    assert store.recent("u1") == ["d", "b", "c"]
+    assert store.recent("u1", PURCHASED) == []
+    assert store.recent("nobody") == [] and store.recent(None) == []
+
+
+def test_least_recently_active_user_is_evicted():
+    store = UserHistoryStore(max_users=2)
+    store.record("u1", "a")
+    store.record("u2", "a")
+    store.record("u1", "b", PURCHASED)
+    store.record("u3", "c")
+
+    assert store.recent("u2") == []
+    assert store.recent("u1", PURCHASED) == ["b"]
+    stats = store.stats()
+    assert stats["users"] == 2 and stats["evictions"] == 1 and stats["interned_products"] == 3
+    assert stats["bytes_total"] == 2 * stats["bytes_per_user"] + stats["bytes_interned"]
+
+
+def test_memory_per_user_is_bounded_by_history_size():
+    store = UserHistoryStore(history_size=16)
+    before = store.bytes_per_user()
+    for i in range(1000):
+        store.record("u1", f"product_{i}", VIEWED)
+
+    assert store.bytes_per_user() == before
+    assert len(store.recent("u1")) == 16
+
+
+def test_interned_keys_are_reference_counted_and_bounded():
+    store = UserHistoryStore(max_users=1, history_size=2, max_products=3)
+    for key in ["a", "b", "c", "d"]:
+        store.record("u1", key)
+    assert store.recent("u1") == ["d", "c"] and store.stats()["interned_products"] == 2
+
+    store.record("u2", "e")  # Evicts u1, freeing "c" and "d"
+    assert store.stats()["interned_products"] == 1
+    assert store.record("u2", "f", PURCHASED) and store.record("u2", "g")
+    assert not store.record("u2", "h", PURCHASED)  # "e", "f" and "g" are all still in use
+    assert store.record("u2", "e")  # Already interned, so never dropped
+
+    assert store.recent("u2") == ["e", "g"] and store.recent("u2", PURCHASED) == ["f"]
+    stats = store.stats()
+    assert stats["interned_products"] == 3 and stats["dropped_events"] == 1
@@ -0,0 +1,132 @@
+"""
+Build-time processing of the demo UI (ui/).
+
+``python ui_assets.py`` writes ui/dist/:
+  * app.js / styles.css as content-fingerprinted copies (app.<hash>.js),
+    safe to cache for a year since any change gets a new name
+  * the HTML pages, with references rewritten to the fingerprinted names
+  * a .gz (and .br, if brotli is installed) next to every file
+  * manifest.json mapping logical names to fingerprinted ones
+
+The app serves ui/dist/ when it exists (see ``resolve_asset``) and falls back
+to the plain ui/ sources otherwise, so a checkout works without a build step.
+"""
+
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import shutil
+from typing import Dict, Optional, Tuple
+
+from compression import BROTLI_AVAILABLE, compress, negotiate_encoding
+
+logger = logging.getLogger(__name__)
+
+UI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ui')
+DIST_DIR = os.path.join(UI_DIR, 'dist')
+MANIFEST_NAME = 'manifest.json'
+
+FINGERPRINTED_EXTENSIONS = ('.js', '.css')
+PAGE_EXTENSIONS = ('.html',)
+
+# Fingerprinted files never change under the same name; pages must be revalidated
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+_ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def fingerprint(filename: str, data: bytes) -> str:
+    """``app.js`` -> ``app.<8 hex of sha256>.js``"""
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:8]}{ext}"
+
+
+def _write_with_variants(path: str, data: bytes):
+    with open(path, 'wb') as f:
+        f.write(data)
+    encodings = ['gzip'] + (['br'] if BROTLI_AVAILABLE else [])
+    for encoding in encodings:
+        with open(path + _ENCODING_SUFFIXES[encoding], 'wb') as f:
+            f.write(compress(data, encoding))
+
+
+def build_assets(src_dir: str = UI_DIR, out_dir: str = DIST_DIR) -> Dict[str, str]:
+    """
+    Fingerprint, rewrite and precompress the UI into ``out_dir`` (replaced).
+
+    Returns:
+        Manifest of logical name -> served name
+    """
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+
+    files = sorted(name for name in os.listdir(src_dir) if os.path.isfile(os.path.join(src_dir, name)))
+    manifest = {}
+    for name in files:
+        if name.endswith(FINGERPRINTED_EXTENSIONS):
+            with open(os.path.join(src_dir, name), 'rb') as f:
+                data = f.read()
+            manifest[name] = fingerprint(name, data)
+            _write_with_variants(os.path.join(out_dir, manifest[name]), data)
+
+    for name in files:
+        if name.endswith(PAGE_EXTENSIONS):
+            with open(os.path.join(src_dir, name), encoding='utf-8') as f:
+                page = f.read()
+            for logical, served in manifest.items():
+                page = page.replace(f"/ui/{logical}", f"/ui/{served}")
+            manifest[name] = name
+            _write_with_variants(os.path.join(out_dir, name), page.encode('utf-8'))
+
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Built {len(manifest)} UI assets into {out_dir}")
+    return manifest
+
+
+def load_manifest(out_dir: str = DIST_DIR) -> Optional[Dict[str, str]]:
+    """Manifest of a previous build, or None if the UI was not built"""
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def resolve_asset(filename: str, accept_encodings, manifest: Optional[Dict[str, str]],
+                  src_dir: str = UI_DIR, out_dir: str = DIST_DIR) -> Tuple[str, str, Optional[str], str, str]:
+    """
+    Where to serve ``filename`` from.
+
+    Returns:
+        (directory, file to send, Content-Encoding or None, Cache-Control, mimetype)
+    """
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if manifest is None:
+        return src_dir, filename, None, REVALIDATE_CACHE_CONTROL, mimetype
+
+    if filename in manifest:
+        served = manifest[filename]
+    elif filename in manifest.values():
+        served = filename
+    else:
+        # Not part of the build: serve the source
+        return src_dir, filename, None, REVALIDATE_CACHE_CONTROL, mimetype
+    # Only a fingerprinted URL is immutable; logical names (/ui/app.js, pages) keep revalidating
+    cache_control = REVALIDATE_CACHE_CONTROL if filename in manifest else IMMUTABLE_CACHE_CONTROL
+
+    available = [e for e in _ENCODING_SUFFIXES if os.path.exists(os.path.join(out_dir, served + _ENCODING_SUFFIXES[e]))]
+    encoding = negotiate_encoding(accept_encodings, available)
+    if encoding is not None:
+        return out_dir, served + _ENCODING_SUFFIXES[encoding], encoding, cache_control, mimetype
+    return out_dir, served, None, cache_control, mimetype
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    for logical, served in build_assets().items():
+        print(f"{logical} -> {served}")
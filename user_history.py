@@ -0,0 +1,197 @@
+"""
+Per-user recent history for local personalization.
+
+Each user keeps two fixed-size ring buffers (recently viewed and recently
+purchased) of interned integer product IDs, so memory per user is bounded
+and independent of key length. Users are evicted least-recently-active
+first once ``max_users`` is reached. Interned IDs are reference counted, so
+a key is forgotten as soon as no buffer holds it, and at most
+``max_products`` keys are interned at once. The ranking stage reads the
+history to boost recently viewed items and drop already purchased ones,
+without any extra LLM call.
+"""
+
+import os
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+VIEWED = 'viewed'
+PURCHASED = 'purchased'
+# Longest user ID the API accepts (user IDs are kept as dict keys)
+MAX_USER_ID_LENGTH = 128
+
+_EMPTY = -1
+
+
+class _RingBuffer:
+    """Fixed-size buffer of int IDs; the oldest entry is overwritten when full"""
+
+    __slots__ = ('ids', 'head', 'size')
+
+    def __init__(self, capacity: int):
+        self.ids = array('i', [_EMPTY]) * capacity
+        self.head = 0  # Next slot to write
+        self.size = 0
+
+    def push(self, product_id: int) -> Tuple[bool, int]:
+        """
+        Put ``product_id`` at the front.
+
+        Returns:
+            (whether it was added rather than moved up, ID overwritten to make room or _EMPTY)
+        """
+        capacity = len(self.ids)
+        # Move an already present ID to the front instead of storing it twice
+        for offset in range(self.size):
+            slot = (self.head - 1 - offset) % capacity
+            if self.ids[slot] == product_id:
+                for k in range(offset, 0, -1):
+                    self.ids[(self.head - 1 - k) % capacity] = self.ids[(self.head - k) % capacity]
+                self.ids[(self.head - 1) % capacity] = product_id
+                return False, _EMPTY
+        evicted = self.ids[self.head]
+        self.ids[self.head] = product_id
+        self.head = (self.head + 1) % capacity
+        self.size = min(self.size + 1, capacity)
+        return True, evicted
+
+    def newest_first(self) -> List[int]:
+        capacity = len(self.ids)
+        return [self.ids[(self.head - 1 - offset) % capacity] for offset in range(self.size)]
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.ids)
+
+
+class UserHistoryStore:
+    """Bounded, thread-safe store of recent views and purchases per user"""
+
+    def __init__(self, max_users: int = 10000, history_size: int = 32, max_products: int = 100000):
+        self.max_users = max_users
+        self.history_size = history_size
+        self.max_products = max_products
+        self._users: 'OrderedDict[str, Dict[str, _RingBuffer]]' = OrderedDict()
+        self._ids: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = []  # None marks a freed ID
+        self._refs = array('i')  # Buffer slots holding each ID
+        self._free: List[int] = []
+        self._key_bytes = 0
+        self._evictions = 0
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'UserHistoryStore':
+        """Store sized from CSSA_HISTORY_MAX_USERS / CSSA_HISTORY_SIZE / CSSA_HISTORY_MAX_PRODUCTS"""
+        return cls(
+            max_users=int(os.getenv('CSSA_HISTORY_MAX_USERS', 10000)),
+            history_size=int(os.getenv('CSSA_HISTORY_SIZE', 32)),
+            max_products=int(os.getenv('CSSA_HISTORY_MAX_PRODUCTS', 100000)),
+        )
+
+    def _acquire(self, product_key: str) -> Optional[int]:
+        """Take a reference to a product key's ID, or None if ``max_products`` keys are in use (call with _lock held)"""
+        product_id = self._ids.get(product_key)
+        if product_id is None:
+            if len(self._ids) >= self.max_products:
+                return None
+            if self._free:
+                product_id = self._free.pop()
+                self._keys[product_id] = product_key
+            else:
+                product_id = len(self._keys)
+                self._keys.append(product_key)
+                self._refs.append(0)
+            self._ids[product_key] = product_id
+            self._key_bytes += sys.getsizeof(product_key)
+        self._refs[product_id] += 1
+        return product_id
+
+    def _release(self, product_id: int):
+        """Drop a reference, freeing the ID once no buffer holds it (call with _lock held)"""
+        self._refs[product_id] -= 1
+        if self._refs[product_id] == 0:
+            product_key = self._keys[product_id]
+            del self._ids[product_key]
+            self._key_bytes -= sys.getsizeof(product_key)
+            self._keys[product_id] = None
+            self._free.append(product_id)
+
+    def record(self, user_id: str, product_key: str, kind: str = VIEWED) -> bool:
+        """
+        Add a view or purchase to the front of the user's history.
+
+        Returns:
+            False if the event was dropped because ``max_products`` keys are in use
+        """
+        if kind not in (VIEWED, PURCHASED):
+            raise ValueError(f"Unknown history kind: {kind}")
+        with self._lock:
+            # Held across the push, so evicting a user cannot free the ID being recorded
+            product_id = self._acquire(product_key)
+            if product_id is None:
+                self._dropped += 1
+                return False
+            history = self._users.get(user_id)
+            if history is None:
+                history = self._users[user_id] = {
+                    VIEWED: _RingBuffer(self.history_size),
+                    PURCHASED: _RingBuffer(self.history_size),
+                }
+                if len(self._users) > self.max_users:
+                    _, evicted = self._users.popitem(last=False)
+                    for buffer in evicted.values():
+                        for old_id in buffer.newest_first():
+                            self._release(old_id)
+                    self._evictions += 1
+            else:
+                self._users.move_to_end(user_id)
+            added, overwritten = history[kind].push(product_id)
+            if not added:
+                self._release(product_id)
+            if overwritten != _EMPTY:
+                self._release(overwritten)
+        return True
+
+    def recent(self, user_id: Optional[str], kind: str = VIEWED) -> List[str]:
+        """Product keys of the user's history, newest first ([] for unknown users)"""
+        if not user_id:
+            return []
+        with self._lock:
+            history = self._users.get(user_id)
+            if history is None:
+                return []
+            return [self._keys[i] for i in history[kind].newest_first()]
+
+    def bytes_per_user(self) -> int:
+        """Memory held by one user's buffers (fixed by ``history_size``)"""
+        return 2 * _RingBuffer(self.history_size).nbytes() + sys.getsizeof({VIEWED: None, PURCHASED: None})
+
+    def stats(self) -> Dict:
+        """User count, evictions and memory use (buffers plus interned keys), for /api/status"""
+        with self._lock:
+            users = len(self._users)
+            interned = len(self._ids)
+            # Keys are shared by the list and the dict, so each string is counted once
+            interned_bytes = (sys.getsizeof(self._ids) + sys.getsizeof(self._keys) + sys.getsizeof(self._refs)
+                              + sys.getsizeof(self._free) + self._key_bytes)
+        per_user = self.bytes_per_user()
+        return {
+            'users': users,
+            'max_users': self.max_users,
+            'history_size': self.history_size,
+            'evictions': self._evictions,
+            'interned_products': interned,
+            'max_products': self.max_products,
+            'dropped_events': self._dropped,
+            'bytes_per_user': per_user,
+            'bytes_interned': interned_bytes,
+            'bytes_total': per_user * users + interned_bytes,
+        }
+
+
+# Shared by the API and the Gemini engine
+user_history = UserHistoryStore.from_env()